@@ -1,14 +1,33 @@
+import atexit
+import copy
+from contextvars import ContextVar
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from typing import Any, TextIO
+import uuid
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+ENV_FILE = ".env"
+
+logger = logging.getLogger(__name__)
+
 
 class Settings(BaseSettings):
     """Application settings loaded from environment variables."""
 
     model_config = SettingsConfigDict(
-        env_file=".env",
+        env_file=ENV_FILE,
         env_file_encoding="utf-8",
         case_sensitive=True,
+        frozen=True,
     )
 
     SMALLEST_API_KEY: str
@@ -17,21 +36,339 @@ class Settings(BaseSettings):
 
     APP_ENV: str = "development"
     PORT: int = 8000
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    GEMINI_MODEL_URL: str = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash"
+    PULSE_API_URL: str = "https://waves-api.smallest.ai/api/v1/pulse/get_text"
+    PULSE_WS_URL: str = "wss://waves-api.smallest.ai/api/v1/pulse/get_text"
     LIGHTNING_API_URL: str = "https://waves-api.smallest.ai/api/v1/lightning-v3.1/stream"
     LIGHTNING_MODEL: str = "lightning"
     LIGHTNING_SAMPLE_RATE: int = 24000
     LIGHTNING_OUTPUT_FORMAT: str = "pcm"
+    # Loudness normalization, limiting and edge-silence trimming; needs numpy, else audio is unprocessed.
+    LIGHTNING_DSP_ENABLED: bool = True
+    LIGHTNING_DSP_TARGET_DBFS: float = -20.0
+    LIGHTNING_DSP_CEILING_DBFS: float = -1.0
+    LIGHTNING_DSP_SILENCE_DBFS: float = -50.0
+    LIGHTNING_DSP_EDGE_PAD_MS: float = 40.0
+
+    LIVE_NOTES_BATCH_CHARS: int = 600
+    LIVE_NOTES_OVERLAP_SEGMENTS: int = 2
+    LIVE_NOTES_MAX_SESSIONS: int = 50
+
+    PULSE_LIVE_FRAME_MS: int = 100
+    PULSE_LIVE_MAX_QUEUE_FRAMES: int = 50
+    PULSE_LIVE_OVERFLOW_POLICY: str = "drop_oldest"
+    PULSE_LIVE_LAG_WARN_MS: int = 1000
+
+    CACHE_BACKEND: str = "memory"
+    CACHE_SQLITE_PATH: str = ".cache/pocketprof-cache.sqlite3"
+    CACHE_REDIS_URL: str = "redis://127.0.0.1:6379/0"
+    CACHE_MAX_ENTRIES: int = 2048
+    CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    CACHE_MAX_VALUE_BYTES: int = 16 * 1024 * 1024
+    CACHE_DEFAULT_TTL_S: float = 3600.0
+    TRANSCRIPTION_CACHE_TTL_S: float = 3600.0
+    TTS_CACHE_TTL_S: float = 86400.0
+
+    SETTINGS_RELOAD_INTERVAL_S: float = 0.0
+    STARTUP_MODE: str = "eager"
+    COMPRESSION_MIN_BYTES: int = 1024
+
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_IN_FLIGHT: int = 96
+    ADMISSION_MAX_WAIT_S: float = 10.0
+    # Per-class overrides, e.g. ADMISSION_CONCURRENCY='{"bulk": 4}'.
+    ADMISSION_CONCURRENCY: dict[str, int] = {}
+    ADMISSION_QUEUE: dict[str, int] = {}
+
+    JOBS_MAX_CONCURRENT: int = 2
+    JOBS_MAX_PENDING: int = 32
+    JOBS_TTL_S: float = 3600.0
+    LESSON_ARTIFACT_DIR: str = ".cache/lessons"
+
+    ASK_BATCH_CONCURRENCY: int = 8
+
+    CHAT_HISTORY_TOKEN_BUDGET: int = 2000
+    CHAT_HISTORY_KEEP_MESSAGES: int = 6
+    CHAT_HISTORY_SUMMARY_TOKENS: int = 400
+    CHAT_REUSE_ENABLED: bool = True
+    CHAT_REUSE_THRESHOLD: float = 0.85
+    CHAT_REUSE_TTL_S: float = 900.0
+    CHAT_REUSE_MAX_ENTRIES: int = 256
+    # Per-call prompt budgets in tokens, e.g. PROMPT_BUDGETS='{"align": 48000}'.
+    PROMPT_BUDGETS: dict[str, int] = {}
+
+    VOICE_SPECULATIVE: bool = False
+    VOICE_SPECULATION_STABLE_MS: int = 400
+    VOICE_SPECULATION_MIN_WORDS: int = 3
+    VOICE_SPECULATION_MAX_ATTEMPTS: int = 3
+
+    UPSTREAM_MAX_ATTEMPTS: int = 3
+    UPSTREAM_BREAKER_FAILURES: int = 5
+    UPSTREAM_BREAKER_RESET_S: float = 30.0
+    UPSTREAM_DEFAULT_DEADLINE_S: float = 0.0
+    GEMINI_MAX_CONCURRENCY: int = 8
+    GEMINI_RATE_PER_S: float = 0.0
+    GEMINI_BURST: int = 4
+    GEMINI_TOKENS_PER_MIN: float = 0.0
+    GEMINI_VISION_RATE_PER_S: float = 0.25
+    LIGHTNING_MAX_CONCURRENCY: int = 8
+    PULSE_MAX_CONCURRENCY: int = 4
+    QA_HEDGE_AFTER_S: float = 2.0
+
+
+_settings: Settings | None = None
+_settings_mtime: float | None = None
+_reload_lock = threading.Lock()
+_reload_requested = threading.Event()
+_watcher: threading.Thread | None = None
 
 
 def get_settings() -> Settings:
-    """Load and validate settings. Raises ValidationError if required vars are missing."""
-    return Settings()
+    """Return the shared settings snapshot, loading and validating it on first use.
 
+    Raises ValidationError if required vars are missing. The snapshot is frozen;
+    callers that hold on to it keep a consistent view across a reload.
+    """
+    settings = _settings
+    if settings is None:
+        settings = reload_settings()
+    return settings
 
-def setup_logging(level: str = "INFO") -> None:
-    """Configure application-wide logging."""
-    logging.basicConfig(
-        level=getattr(logging, level.upper(), logging.INFO),
-        format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    )
+
+def reload_settings() -> Settings:
+    """Re-read the environment and ``.env`` and atomically swap in the new snapshot.
+
+    If validation fails the previous snapshot stays in place and the error propagates.
+    """
+    global _settings, _settings_mtime
+    with _reload_lock:
+        mtime = _env_file_mtime()
+        settings = Settings()
+        _settings, _settings_mtime = settings, mtime
+    return settings
+
+
+def reload_settings_if_changed() -> bool:
+    """Reload when ``.env`` has been modified since the last load."""
+    if _settings is not None and _env_file_mtime() == _settings_mtime:
+        return False
+    return _reload_logged()
+
+
+def install_settings_reload(interval_s: float = 0.0) -> None:
+    """Reload settings on SIGHUP and, if ``interval_s`` > 0, whenever ``.env`` changes.
+
+    Anything that calls ``get_settings()`` per request sees the new values,
+    as do ``LOG_LEVEL``, the admission limits, ``COMPRESSION_MIN_BYTES``,
+    ``UPSTREAM_DEFAULT_DEADLINE_S`` and the upstream policies (concurrency,
+    rates, retries, breaker, hedging). Built once and kept until restart:
+    ``ADMISSION_ENABLED``, ``LOG_FORMAT``, ``SETTINGS_RELOAD_INTERVAL_S``,
+    ``PORT``, the cache backend and TTLs (``CACHE_*``, ``TTS_CACHE_TTL_S``,
+    ``TRANSCRIPTION_CACHE_TTL_S``), the job manager (``JOBS_*``), the
+    chat history compactor (``CHAT_HISTORY_*``) and the question index sizing
+    (``CHAT_REUSE_THRESHOLD``, ``CHAT_REUSE_TTL_S``, ``CHAT_REUSE_MAX_ENTRIES``).
+
+    Both reloads run on the watcher thread. The signal handler only wakes it:
+    a handler that took ``_reload_lock`` itself would deadlock when the signal
+    interrupts a reload already holding the lock on the main thread.
+    """
+    global _watcher
+    watch = interval_s > 0
+    if hasattr(signal, "SIGHUP"):
+        try:
+            signal.signal(signal.SIGHUP, lambda signum, frame: _reload_requested.set())
+            watch = True
+        except ValueError:
+            # Not the main thread (e.g. some test runners); file polling still works.
+            pass
+    if watch and _watcher is None:
+        _watcher = threading.Thread(target=_watch_env_file, args=(interval_s,), name="settings-watcher", daemon=True)
+        _watcher.start()
+
+
+def _reload_logged() -> bool:
+    try:
+        settings = reload_settings()
+    except Exception:
+        logger.exception("Settings reload failed; keeping the previous configuration")
+        return False
+    logging.getLogger().setLevel(_log_level(settings.LOG_LEVEL))
+    logger.info("Settings reloaded")
+    return True
+
+
+def _watch_env_file(interval_s: float) -> None:
+    while True:
+        requested = _reload_requested.wait(interval_s if interval_s > 0 else None)
+        _reload_requested.clear()
+        if requested:
+            _reload_logged()
+        elif interval_s > 0:
+            reload_settings_if_changed()
+
+
+def _env_file_mtime() -> float | None:
+    try:
+        return os.stat(ENV_FILE).st_mtime
+    except OSError:
+        return None
+
+
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+TEXT_FORMAT = "%(asctime)s | %(levelname)-8s | %(name)s | %(message)s"
+REQUEST_ID_HEADER = b"x-request-id"
+
+# Attributes every LogRecord has; anything else came in through ``extra=``.
+_RECORD_FIELDS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+_listener: logging.handlers.QueueListener | None = None
+_queue_handler: logging.Handler | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request id and extras."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    """Captures the request id on the calling task, then hands the record to the writer thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.request_id = request_id_var.get()
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        # Args and tracebacks are rendered now; drop references the writer thread must not touch.
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+class LogRateLimiter:
+    """Token bucket for high-frequency log events (per chunk, per anchor).
+
+    Call ``allow()`` before logging; ``take_suppressed()`` reports how many
+    events were skipped since the last one that got through.
+    """
+
+    def __init__(self, per_second: float = 1.0, burst: int = 5) -> None:
+        self._rate = per_second
+        self._capacity = float(max(burst, 1))
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._suppressed = 0
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        self._suppressed += 1
+        return False
+
+    def take_suppressed(self) -> int:
+        suppressed, self._suppressed = self._suppressed, 0
+        return suppressed
+
+
+class RequestIdMiddleware:
+    """ASGI middleware that tags every log record with the request's ``X-Request-ID``."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        request_id = next(
+            (value.decode("latin-1") for name, value in scope.get("headers", ()) if name == REQUEST_ID_HEADER),
+            None,
+        ) or uuid.uuid4().hex
+
+        async def send_with_id(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (REQUEST_ID_HEADER, request_id.encode("latin-1"))]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
+
+
+def setup_logging(level: str = "INFO", fmt: str = "json", stream: TextIO | None = None) -> None:
+    """Route all logging through a queue to a background writer thread.
+
+    Loggers only format the message and enqueue it, so no console or file I/O
+    runs on the event loop. ``fmt`` is ``json`` (one object per line) or ``text``.
+    """
+    global _listener, _queue_handler
+    shutdown_logging()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    if fmt == "text":
+        output.setFormatter(logging.Formatter(TEXT_FORMAT, datefmt="%Y-%m-%d %H:%M:%S"))
+    else:
+        output.setFormatter(JsonFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler = _ContextQueueHandler(log_queue)
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(_log_level(level))
+    # uvicorn installs its own synchronous stream handlers; send its records through the queue too.
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+    # Per-request INFO lines from httpx would double the log volume of every upstream call.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def _log_level(name: str) -> int:
+    return getattr(logging, name.upper(), logging.INFO)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
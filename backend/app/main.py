@@ -1,22 +1,70 @@
+from contextlib import asynccontextmanager
 import logging
+import time
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
-from app.config import get_settings, setup_logging
-from app.routes import ask, electron, health, hydra, lightning, parse, pulse
+from app.config import RequestIdMiddleware, get_settings, install_settings_reload, setup_logging
+from app.routes import ask, electron, health, hydra, jobs, lessons, lightning, metrics, parse, pulse, voice
+from app.services.admission import AdmissionMiddleware, build_admission_controller
+from app.services.jobs import close_jobs
+from app.services.shared_cache import close_shared_caches, get_cache_backend
+from app.services.upstream import DeadlineMiddleware, UpstreamError, tls_context
+from app.utils.compression import CompressionMiddleware
+from app.utils.lazy import lazy_import, warm_imports
+from app.utils.metrics import MetricsMiddleware
+from app.utils.pcm_dsp import numpy_available
 
-setup_logging()
-logger = logging.getLogger(__name__)
+httpx = lazy_import("httpx")
 
 settings = get_settings()
+setup_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+install_settings_reload(settings.SETTINGS_RELOAD_INTERVAL_S)
+if settings.LIGHTNING_DSP_ENABLED and not numpy_available():
+    logger.warning("LIGHTNING_DSP_ENABLED is set but numpy is not installed; Lightning audio streams unprocessed")
+
+
+async def warm_up() -> None:
+    """Load deferred modules and build shared clients before a request needs them."""
+    started = time.perf_counter()
+    loaded = warm_imports()
+    # The first client construction imports httpcore, h11 and their backends.
+    async with httpx.AsyncClient(verify=tls_context()):
+        pass
+    get_cache_backend()
+    logger.info("Warmup finished in %.1f ms (loaded %s)", (time.perf_counter() - started) * 1000.0, loaded)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up unless ``STARTUP_MODE`` is ``lazy``; cancel jobs and release shared cache connections on shutdown.
+
+    ``eager`` finishes warmup before the worker accepts connections, so a
+    readiness probe only passes once the first request will be fast. ``lazy``
+    starts listening sooner and each dependency loads on first use.
+    """
+    if get_settings().STARTUP_MODE != "lazy":
+        await warm_up()
+    yield
+    await close_jobs()
+    await close_shared_caches()
+
 
 app = FastAPI(
+    lifespan=lifespan,
     title="PocketProf AI Voice Backend",
     description="Modular AI voice learning engine",
     version="0.1.0",
 )
 
+# Innermost: CORS answers preflights without taking a slot and decorates shed 503s.
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware, controller=build_admission_controller(settings))
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -32,6 +80,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Read per request so a settings reload applies; see config.py for what else reloads.
+app.add_middleware(CompressionMiddleware, minimum_size=lambda: get_settings().COMPRESSION_MIN_BYTES)
+app.add_middleware(DeadlineMiddleware, default_timeout_s=lambda: get_settings().UPSTREAM_DEFAULT_DEADLINE_S)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
+
+
+@app.exception_handler(UpstreamError)
+async def upstream_error_handler(request: Request, exc: UpstreamError) -> JSONResponse:
+    """Map circuit-open and deadline errors that routes do not handle themselves."""
+    return JSONResponse({"detail": str(exc)}, status_code=exc.status_code, headers=exc.headers())
+
+
 @app.get("/")
 async def root() -> dict:
     """Root endpoint; use /health for status and /docs for API docs."""
@@ -43,11 +104,15 @@ async def root() -> dict:
 
 
 app.include_router(health.router)
+app.include_router(metrics.router)
 app.include_router(ask.router)
+app.include_router(jobs.router)
+app.include_router(lessons.router)
 app.include_router(pulse.router)
 app.include_router(parse.router)
 app.include_router(electron.router)
 app.include_router(lightning.router)
 app.include_router(hydra.router)
+app.include_router(voice.router)
 
 logger.info("PocketProf backend started — env=%s, port=%s", settings.APP_ENV, settings.PORT)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class ServiceResponse(BaseModel):
@@ -39,6 +39,18 @@ class ParseResponse(BaseModel):
     formatted: str
 
 
+class LiveNotesResponse(BaseModel):
+    """Notes built incrementally from a /pulse/live session."""
+
+    session_id: str
+    version: int
+    formatted: str
+    sections: int
+    finalized_segments: int
+    pending_segments: int
+    closed: bool
+
+
 class AskRequest(BaseModel):
     """Request body for ask (Q&A) endpoint."""
 
@@ -52,6 +64,22 @@ class AskResponse(BaseModel):
     answer: str
 
 
+class AskBatchRequest(BaseModel):
+    """Many questions sharing one lesson context, e.g. a course FAQ."""
+
+    questions: list[str] = Field(..., min_length=1, max_length=1000)
+    context: str | None = None
+    concurrency: int | None = Field(None, ge=1)  # capped at ASK_BATCH_CONCURRENCY
+
+
+class AskSpeakRequest(BaseModel):
+    """Request body for the spoken ask endpoint."""
+
+    question: str
+    context: str | None = None
+    voice_id: str | None = "sophia"
+
+
 class SlideContext(BaseModel):
     """Context for a single slide."""
     slide_number: int
@@ -70,12 +98,14 @@ class SlideChatRequest(BaseModel):
     context: list[SlideContext]
     current_slide: int
     history: list[dict] = []
+    session_id: str | None = None  # lets the server reuse this conversation's compacted history
 
 
 class SlideChatResponse(BaseModel):
     """Response from slide chat."""
     answer: str
     suggested_slide: int | None = None
+    reused: bool = False  # answered from a near-duplicate recent question
 
 
 class ScriptAlignmentRequest(BaseModel):
@@ -87,3 +117,33 @@ class ScriptAlignmentRequest(BaseModel):
 class ScriptAlignmentResponse(BaseModel):
     """Response from script alignment."""
     segments: list[dict]  # [{"text": "...", "slide_number": 1}, ...]
+
+
+class JobResponse(BaseModel):
+    """State of a background analysis or alignment job."""
+    job_id: str
+    kind: str
+    status: str  # queued | running | succeeded | failed | cancelled
+    version: int
+    completed: int
+    total: int
+    attempts: int
+    created_at: float
+    updated_at: float
+    error: str | None = None
+    results: list[dict] = []  # checkpointed so far; complete once succeeded
+
+
+class LessonBuildRequest(BaseModel):
+    """Request to package an aligned script as a lesson artifact."""
+    segments: list[dict]  # /ask/align output: [{"text": "...", "slide_number": 1}, ...]
+    voice_id: str | None = None
+
+
+class LessonBuildResponse(BaseModel):
+    """A lesson artifact and, while it is being built, the job building it."""
+    lesson_id: str
+    ready: bool
+    index_url: str
+    audio_url: str
+    job: JobResponse | None = None
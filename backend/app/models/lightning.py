@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from dataclasses import dataclass, field
 from typing import Any, Literal
 
 from pydantic import BaseModel, Field
@@ -18,11 +19,48 @@ class SemanticAnchor(BaseModel):
     text: str
 
 
-class TeachingScript(BaseModel):
+@dataclass(slots=True)
+class AnchorSpan:
+    """Compact anchor used inside the pipeline; converted to SemanticAnchor only for responses."""
+
+    anchor_id: str
+    anchor_type: AnchorType
+    span_start: int
+    span_end: int
+    label: str
+    text: str
+
+    def to_model(self) -> SemanticAnchor:
+        return SemanticAnchor.model_construct(
+            anchor_id=self.anchor_id,
+            anchor_type=self.anchor_type,
+            span_start=self.span_start,
+            span_end=self.span_end,
+            label=self.label,
+            text=self.text,
+        )
+
+
+@dataclass(slots=True)
+class ScriptSentence:
+    """One speakable piece of a teaching script produced by the incremental parser.
+
+    ``span_start``/``span_end`` and anchor spans are offsets into the full
+    script, i.e. all sentences so far joined by single spaces.
+    """
+
+    text: str
+    span_start: int
+    span_end: int
+    anchors: list[AnchorSpan] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class TeachingScript:
     """Parsed teaching script generated from LaTeX summary source."""
 
     text: str
-    anchors: list[SemanticAnchor] = Field(default_factory=list)
+    anchors: list[AnchorSpan] = field(default_factory=list)
 
 
 class LightningSpeakRequest(BaseModel):
@@ -41,3 +79,18 @@ class LightningSpeakResponse(BaseModel):
     message: str
     teaching_script_preview: str
     anchors: list[SemanticAnchor] = Field(default_factory=list)
+
+
+class LightningBatchSpeakRequest(BaseModel):
+    """Many lesson summaries to parse in one call, e.g. a whole course module."""
+
+    latex_summaries: list[str] = Field(..., min_length=1, max_length=1000)
+    anchors_enabled: bool = True
+
+
+class LightningBatchSpeakResponse(BaseModel):
+    """Parsed scripts for every summary in a batch, in request order."""
+
+    results: list[LightningSpeakResponse]
+    cached: int
+    parse_ms: float
@@ -1,11 +1,26 @@
-import httpx
-from fastapi import APIRouter, HTTPException
+import json
+import time
 
-from app.models.base import AskRequest, AskResponse, SlideAnalysisRequest, SlideContext, SlideChatRequest, SlideChatResponse, ScriptAlignmentRequest, ScriptAlignmentResponse
-from app.services.ask_service import answer_question, analyze_slides, chat_with_slides, align_script_with_slides
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from pydantic import TypeAdapter
+
+from app.config import Settings, get_settings
+from app.models.base import AskBatchRequest, AskRequest, AskResponse, AskSpeakRequest, SlideAnalysisRequest, SlideContext, SlideChatRequest, SlideChatResponse, ScriptAlignmentRequest, ScriptAlignmentResponse
+from app.services.ask_service import answer_question, answer_questions, analyze_slides, chat_with_slides, align_script_with_slides, stream_answer_text
+from app.services.lightning_service import stream_lightning_chunks
+from app.services.question_index import get_question_index
+from app.services.upstream import UpstreamError
+from app.utils.lazy import lazy_import
+
+httpx = lazy_import("httpx")
 
 router = APIRouter(prefix="/ask", tags=["Ask"])
 
+# Large bodies the services have already validated are serialized once here
+# rather than re-validated against response_model (which still drives the docs).
+_SLIDE_LIST = TypeAdapter(list[SlideContext])
+
 
 @router.post("", response_model=AskResponse)
 async def ask(payload: AskRequest) -> AskResponse:
@@ -27,10 +42,73 @@ async def ask(payload: AskRequest) -> AskResponse:
         raise HTTPException(502, f"Gemini API error: {e.response.status_code}")
     except ValueError as e:
         raise HTTPException(400, str(e))
+    except UpstreamError as e:
+        raise HTTPException(e.status_code, str(e), headers=e.headers())
     except Exception as e:
         raise HTTPException(500, str(e))
 
 
+@router.post("/batch")
+async def ask_batch(
+    payload: AskBatchRequest,
+    settings: Settings = Depends(get_settings),
+) -> StreamingResponse:
+    """Answer many questions with a shared context, streamed as NDJSON in completion order.
+
+    Duplicate questions (ignoring case, spacing and trailing punctuation) are
+    asked once. Each line carries the question's original ``indices`` and either
+    an ``answer`` or an ``error`` with the status ``/ask`` would have returned.
+    A final ``{"done": true, ...}`` line summarizes the batch.
+    """
+    concurrency = min(payload.concurrency or settings.ASK_BATCH_CONCURRENCY, settings.ASK_BATCH_CONCURRENCY)
+
+    async def lines():
+        started = time.perf_counter()
+        unique = failed = 0
+        async for item in answer_questions(payload.questions, payload.context, concurrency):
+            unique += 1
+            failed += len(item["indices"]) if "error" in item else 0
+            yield json.dumps(item) + "\n"
+        yield json.dumps({
+            "done": True,
+            "questions": len(payload.questions),
+            "unique": unique,
+            "failed": failed,
+            "concurrency": concurrency,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 1),
+        }) + "\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/speak")
+async def ask_speak(
+    payload: AskSpeakRequest,
+    settings: Settings = Depends(get_settings),
+) -> StreamingResponse:
+    """Stream the spoken answer as PCM, starting TTS while Gemini is still writing it."""
+    if not payload.question or not payload.question.strip():
+        raise HTTPException(400, "Question cannot be empty")
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no",
+    }
+    return StreamingResponse(
+        stream_lightning_chunks(
+            stream_answer_text(payload.question, payload.context),
+            settings=settings,
+            voice_id=payload.voice_id,
+        ),
+        media_type="audio/pcm",
+        headers=headers,
+    )
+
+
 @router.post("/analyze", response_model=list[SlideContext])
 async def analyze_endpoint(payload: SlideAnalysisRequest):
     """
@@ -41,7 +119,7 @@ async def analyze_endpoint(payload: SlideAnalysisRequest):
     
     try:
         results = await analyze_slides(payload.images)
-        return results
+        return Response(_SLIDE_LIST.dump_json(results), media_type="application/json")
     except httpx.HTTPStatusError as e:
         if e.response.status_code == 429:
             raise HTTPException(
@@ -49,6 +127,8 @@ async def analyze_endpoint(payload: SlideAnalysisRequest):
                 detail="Gemini API rate limit exceeded. Your PDF might be too large or you're sending too many requests."
             )
         raise HTTPException(status_code=502, detail=f"Gemini API error: {e.response.status_code}")
+    except UpstreamError as e:
+        raise HTTPException(e.status_code, str(e), headers=e.headers())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -63,13 +143,22 @@ async def chat_endpoint(payload: SlideChatRequest):
             payload.query, 
             payload.context, 
             payload.current_slide,
-            payload.history
+            payload.history,
+            session_id=payload.session_id,
         )
         return SlideChatResponse(**result)
+    except UpstreamError as e:
+        raise HTTPException(e.status_code, str(e), headers=e.headers())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/slides/reuse")
+async def chat_reuse_stats() -> dict:
+    """Near-duplicate reuse for slide chat: hits, joins, misses and the hit ratio."""
+    return get_question_index().stats()
+
+
 @router.post("/align", response_model=ScriptAlignmentResponse)
 async def align_endpoint(payload: ScriptAlignmentRequest):
     """
@@ -77,6 +166,8 @@ async def align_endpoint(payload: ScriptAlignmentRequest):
     """
     try:
         segments = await align_script_with_slides(payload.script, payload.context)
-        return ScriptAlignmentResponse(segments=segments)
+        return Response(ScriptAlignmentResponse(segments=segments).model_dump_json(), media_type="application/json")
+    except UpstreamError as e:
+        raise HTTPException(e.status_code, str(e), headers=e.headers())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,105 @@
+import json
+import math
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.models.base import JobResponse, ScriptAlignmentRequest, SlideAnalysisRequest
+from app.services.ask_service import SLIDE_BATCH_SIZE, align_script_with_slides, analyze_slide_batches
+from app.services.jobs import Job, JobLimitError, Runner, get_job_manager
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+@router.post("/analyze", response_model=JobResponse, status_code=202)
+async def submit_analysis(payload: SlideAnalysisRequest) -> JobResponse:
+    """Analyze slides in the background; each finished batch is checkpointed into the job's results."""
+    if not payload.images:
+        raise HTTPException(status_code=400, detail="No images provided")
+    images = payload.images
+
+    async def run(job: Job) -> None:
+        async for start, slides in analyze_slide_batches(images, skip=job.checkpoints):
+            await job.checkpoint(start, [slide.model_dump() for slide in slides])
+
+    total = math.ceil(len(images) / SLIDE_BATCH_SIZE)
+    return _submit("analyze", run, payload.model_dump(), total)
+
+
+@router.post("/align", response_model=JobResponse, status_code=202)
+async def submit_alignment(payload: ScriptAlignmentRequest) -> JobResponse:
+    """Align a script with slides in the background."""
+
+    async def run(job: Job) -> None:
+        await job.checkpoint(0, await align_script_with_slides(payload.script, payload.context))
+
+    return _submit("align", run, payload.model_dump(), total=1)
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str) -> JobResponse:
+    """Poll a job's status, progress and the results checkpointed so far."""
+    return JobResponse(**_job(job_id).snapshot())
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str) -> StreamingResponse:
+    """Subscribe to a job as server-sent events.
+
+    Each ``progress`` event carries the results checkpointed since the previous
+    one; ``done`` carries the final snapshot with every result.
+    """
+    job = _job(job_id)
+
+    async def events():
+        version = -1
+        sent: set[int] = set()
+        while True:
+            if job.version > version:
+                version = job.version
+                snapshot = job.snapshot(include_results=False)
+                snapshot["results"] = [
+                    item for key in sorted(job.checkpoints.keys() - sent) for item in job.checkpoints[key]
+                ]
+                sent.update(job.checkpoints)
+                yield f"event: progress\ndata: {json.dumps(snapshot)}\n\n"
+            if job.finished:
+                yield f"event: done\ndata: {json.dumps(job.snapshot())}\n\n"
+                return
+            if not await job.wait_for_update(version):
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/{job_id}/retry", response_model=JobResponse, status_code=202)
+async def retry_job(job_id: str) -> JobResponse:
+    """Resume a failed or cancelled job after its last checkpoint."""
+    _job(job_id)
+    return JobResponse(**get_job_manager().retry(job_id).snapshot())
+
+
+@router.delete("/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: str) -> JobResponse:
+    """Cancel a queued or running job; its checkpoints are kept for a retry."""
+    _job(job_id)
+    return JobResponse(**get_job_manager().cancel(job_id).snapshot())
+
+
+def _submit(kind: str, run: Runner, payload: dict, total: int) -> JobResponse:
+    try:
+        job = get_job_manager().submit(kind, run, payload, total)
+    except JobLimitError as e:
+        raise HTTPException(e.status_code, str(e), headers=e.headers())
+    return JobResponse(**job.snapshot())
+
+
+def _job(job_id: str) -> Job:
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(404, "Unknown job")
+    return job
@@ -0,0 +1,77 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+from app.config import get_settings
+from app.models.base import JobResponse, LessonBuildRequest, LessonBuildResponse
+from app.services.jobs import Job, JobLimitError, get_job_manager
+from app.services.lesson_artifacts import audio_path, build_lesson, lesson_id, load_index
+
+router = APIRouter(prefix="/lessons", tags=["Lessons"])
+
+# Artifacts are content-addressed: a lesson ID never names different bytes.
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+@router.post("", response_model=LessonBuildResponse)
+async def build(payload: LessonBuildRequest, response: Response) -> LessonBuildResponse:
+    """Package an aligned script as one seekable WAV plus a segment, slide and anchor index.
+
+    Returns 200 if the artifact already exists. Otherwise returns 202 with the
+    job building it; follow it on ``/jobs/{job_id}``.
+    """
+    segments = [segment for segment in payload.segments if str(segment.get("text", "")).strip()]
+    if not segments:
+        raise HTTPException(status_code=400, detail="No segments provided")
+    settings = get_settings()
+    lesson = lesson_id(segments, payload.voice_id, settings)
+    result = LessonBuildResponse(
+        lesson_id=lesson,
+        ready=False,
+        index_url=f"/lessons/{lesson}",
+        audio_url=f"/lessons/{lesson}/audio",
+    )
+    if load_index(lesson, settings) is not None:
+        result.ready = True
+        return result
+
+    async def run(job: Job) -> None:
+        await build_lesson(job, lesson, segments, payload.voice_id, settings)
+
+    try:
+        job = get_job_manager().submit("lesson", run, {"lesson_id": lesson}, total=len(segments))
+    except JobLimitError as e:
+        raise HTTPException(e.status_code, str(e), headers=e.headers())
+    response.status_code = 202
+    result.job = JobResponse(**job.snapshot(include_results=False))
+    return result
+
+
+@router.get("/{lesson_id}")
+async def get_index(lesson_id: str, request: Request) -> Response:
+    """The lesson's offset table: byte and millisecond offsets for every segment, slide and anchor."""
+    index = load_index(lesson_id, get_settings())
+    if index is None:
+        raise HTTPException(404, "Unknown lesson")
+    headers = {"ETag": f'"{lesson_id}-index"', "Cache-Control": IMMUTABLE}
+    if _not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(index, media_type="application/json", headers=headers)
+
+
+@router.api_route("/{lesson_id}/audio", methods=["GET", "HEAD"])
+async def get_audio(lesson_id: str, request: Request) -> Response:
+    """Serve the lesson WAV from disk with Range, If-Range and conditional GET support."""
+    settings = get_settings()
+    if load_index(lesson_id, settings) is None:
+        raise HTTPException(404, "Unknown lesson")
+    headers = {"ETag": f'"{lesson_id}"', "Cache-Control": IMMUTABLE}
+    if _not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    # FileResponse handles Range and If-Range, and hands the path to the server
+    # (``http.response.pathsend``) when it can send the file itself.
+    return FileResponse(audio_path(lesson_id, settings), media_type="audio/wav", headers=headers)
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match", "")
+    return if_none_match.strip() == "*" or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
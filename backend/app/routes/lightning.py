@@ -2,8 +2,13 @@ from fastapi import APIRouter, Depends
 from fastapi.responses import StreamingResponse
 
 from app.config import Settings, get_settings
-from app.models.lightning import LightningSpeakRequest, LightningSpeakResponse
-from app.services.lightning_service import speak_lightning, stream_lightning
+from app.models.lightning import (
+    LightningBatchSpeakRequest,
+    LightningBatchSpeakResponse,
+    LightningSpeakRequest,
+    LightningSpeakResponse,
+)
+from app.services.lightning_service import speak_lightning, speak_lightning_batch, stream_lightning
 
 router = APIRouter(prefix="/lightning", tags=["Lightning"])
 
@@ -14,6 +19,12 @@ async def lightning_speak(payload: LightningSpeakRequest) -> LightningSpeakRespo
     return await speak_lightning(payload)
 
 
+@router.post("/speak/batch", response_model=LightningBatchSpeakResponse)
+async def lightning_speak_batch(payload: LightningBatchSpeakRequest) -> LightningBatchSpeakResponse:
+    """Parse many lesson summaries concurrently and return scripts and anchors for all of them."""
+    return await speak_lightning_batch(payload)
+
+
 @router.post("/speak/stream")
 async def lightning_speak_stream(
     payload: LightningSpeakRequest,
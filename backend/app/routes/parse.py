@@ -1,8 +1,15 @@
-import httpx
+import json
+
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 
-from app.models.base import ParseRequest, ParseResponse
+from app.models.base import LiveNotesResponse, ParseRequest, ParseResponse
+from app.services.live_notes import get_live_session
 from app.services.parse_service import parse_transcript
+from app.services.upstream import UpstreamError
+from app.utils.lazy import lazy_import
+
+httpx = lazy_import("httpx")
 
 router = APIRouter(prefix="/parse", tags=["Parse"])
 
@@ -22,5 +29,51 @@ async def parse(payload: ParseRequest) -> ParseResponse:
                 "Rate limit exceeded. Try again in a few minutes or check your Gemini API quota.",
             )
         raise HTTPException(502, f"Gemini API error: {e.response.status_code}")
+    except UpstreamError as e:
+        raise HTTPException(e.status_code, str(e), headers=e.headers())
     except Exception as e:
         raise HTTPException(500, str(e))
+
+
+@router.get("/live/{session_id}", response_model=LiveNotesResponse)
+async def live_notes(session_id: str) -> LiveNotesResponse:
+    """Return the notes built so far for a /pulse/live session."""
+    session = get_live_session(session_id)
+    if session is None:
+        raise HTTPException(404, "Unknown live session")
+    return LiveNotesResponse(**session.snapshot())
+
+
+@router.get("/live/{session_id}/events")
+async def live_notes_events(session_id: str) -> StreamingResponse:
+    """Subscribe to notes updates for a /pulse/live session as server-sent events.
+
+    The first ``notes`` event is the full snapshot. Each later one has ``added``,
+    the sections appended since the previous event, starting at index ``start``.
+    """
+    session = get_live_session(session_id)
+    if session is None:
+        raise HTTPException(404, "Unknown live session")
+
+    async def events():
+        # The first event carries the whole document; later ones only the new sections.
+        version = session.version
+        sent = len(session.sections)
+        yield f"event: notes\ndata: {json.dumps(session.snapshot())}\n\n"
+        while True:
+            if session.version > version:
+                version = session.version
+                update = session.changes(sent)
+                sent += len(update["added"])
+                yield f"event: notes\ndata: {json.dumps(update)}\n\n"
+            if session.closed:
+                yield f"event: done\ndata: {json.dumps(session.changes(sent))}\n\n"
+                return
+            if not await session.wait_for_update(version):
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
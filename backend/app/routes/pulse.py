@@ -1,15 +1,24 @@
 import json
 import logging
 
-from fastapi import APIRouter, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, File, UploadFile, HTTPException, WebSocket
 
+from app.config import get_settings
 from app.models.base import (
+    ParseResponse,
     PulseTranscriptionLatexResponse,
     PulseTranscriptionResponse,
     ServiceResponse,
 )
-from app.services.pulse_realtime import create_pulse_connection
-from app.services.pulse_service import stream_pulse, transcribe_audio, transcribe_to_latex
+from app.services.live_notes import create_live_session
+from app.services.pulse_realtime import PulseLiveProxy, create_pulse_connection, live_proxy_metrics
+from app.services.pulse_service import (
+    read_audio_upload,
+    stream_pulse,
+    transcribe_audio,
+    transcribe_to_latex,
+    transcribe_to_notes,
+)
 
 router = APIRouter(prefix="/pulse", tags=["Pulse"])
 log = logging.getLogger(__name__)
@@ -22,8 +31,11 @@ async def pulse_stream(payload: dict) -> ServiceResponse:
 
 
 @router.websocket("/live")
-async def pulse_live(websocket: WebSocket) -> None:
-    """Proxy WebSocket to Pulse real-time STT. Client sends binary audio chunks, receives transcript JSON."""
+async def pulse_live(websocket: WebSocket, session_id: str | None = None) -> None:
+    """Proxy WebSocket to Pulse real-time STT. Client sends binary audio chunks, receives transcript JSON.
+
+    Finalized segments also feed an incremental notes session, readable at /parse/live/{session_id}.
+    """
     await websocket.accept()
     try:
         pulse_ws = await create_pulse_connection()
@@ -32,45 +44,35 @@ async def pulse_live(websocket: WebSocket) -> None:
         await websocket.close(code=1011, reason=str(e))
         return
 
-    import asyncio
-
-    client_done = asyncio.Event()
-
-    async def forward_client_to_pulse():
-        try:
-            while True:
-                msg = await websocket.receive()
-                if "bytes" in msg:
-                    await pulse_ws.send(msg["bytes"])
-                elif "text" in msg:
-                    try:
-                        obj = json.loads(msg["text"])
-                        if obj.get("type") == "end":
-                            await pulse_ws.send(json.dumps({"type": "end"}))
-                            client_done.set()
-                            return
-                    except (json.JSONDecodeError, TypeError):
-                        pass
-        except WebSocketDisconnect:
-            client_done.set()
-
-    async def forward_pulse_to_client():
-        try:
-            async for raw in pulse_ws:
-                await websocket.send_text(raw)
-                try:
-                    obj = json.loads(raw)
-                    if obj.get("is_last"):
-                        break
-                except json.JSONDecodeError:
-                    pass
-        except Exception as e:
-            log.exception("Error forwarding from Pulse: %s", e)
-        finally:
-            await pulse_ws.close()
-            client_done.set()
-
-    await asyncio.gather(forward_client_to_pulse(), forward_pulse_to_client())
+    settings = get_settings()
+    notes = create_live_session(
+        session_id,
+        batch_chars=settings.LIVE_NOTES_BATCH_CHARS,
+        overlap_segments=settings.LIVE_NOTES_OVERLAP_SEGMENTS,
+        max_sessions=settings.LIVE_NOTES_MAX_SESSIONS,
+    )
+    await websocket.send_text(json.dumps({"type": "session", "session_id": notes.session_id}))
+
+    proxy = PulseLiveProxy(
+        websocket,
+        pulse_ws,
+        session_id=notes.session_id,
+        on_final=notes.add_final,
+        frame_ms=settings.PULSE_LIVE_FRAME_MS,
+        max_queue_frames=settings.PULSE_LIVE_MAX_QUEUE_FRAMES,
+        overflow_policy=settings.PULSE_LIVE_OVERFLOW_POLICY,
+        lag_warn_ms=settings.PULSE_LIVE_LAG_WARN_MS,
+    )
+    try:
+        await proxy.run()
+    finally:
+        await notes.close()
+
+
+@router.get("/live/metrics")
+async def pulse_live_metrics() -> dict:
+    """Per-session lag, queue depth and throughput for active live proxies."""
+    return {"sessions": live_proxy_metrics()}
 
 
 @router.post("/transcribe", response_model=PulseTranscriptionResponse)
@@ -79,10 +81,10 @@ async def pulse_transcribe(audio: UploadFile = File(...)) -> PulseTranscriptionR
     content_type = audio.content_type or "audio/webm"
     if not content_type.startswith("audio/"):
         raise HTTPException(400, "File must be audio (e.g. audio/webm, audio/wav)")
-    content = await audio.read()
+    content, digest = await read_audio_upload(audio)
     if not content:
         raise HTTPException(400, "Empty audio file")
-    return await transcribe_audio(content, content_type)
+    return await transcribe_audio(content, content_type, digest)
 
 
 @router.post("/transcribe-latex", response_model=PulseTranscriptionLatexResponse)
@@ -91,7 +93,19 @@ async def pulse_transcribe_latex(audio: UploadFile = File(...)) -> PulseTranscri
     content_type = audio.content_type or "audio/mpeg"
     if not content_type.startswith("audio/"):
         raise HTTPException(400, "File must be audio (e.g. audio/mpeg, audio/webm)")
-    content = await audio.read()
+    content, digest = await read_audio_upload(audio)
+    if not content:
+        raise HTTPException(400, "Empty audio file")
+    return await transcribe_to_latex(content, content_type, digest)
+
+
+@router.post("/transcribe-notes", response_model=ParseResponse)
+async def pulse_transcribe_notes(audio: UploadFile = File(...)) -> ParseResponse:
+    """Transcribe audio via Pulse and return it formatted as lecture notes."""
+    content_type = audio.content_type or "audio/webm"
+    if not content_type.startswith("audio/"):
+        raise HTTPException(400, "File must be audio (e.g. audio/webm, audio/wav)")
+    content, digest = await read_audio_upload(audio)
     if not content:
         raise HTTPException(400, "Empty audio file")
-    return await transcribe_to_latex(content, content_type)
+    return await transcribe_to_notes(content, content_type, digest)
@@ -0,0 +1,29 @@
+import logging
+
+from fastapi import APIRouter, WebSocket
+
+from app.config import get_settings
+from app.services.voice_pipeline import VoiceAskSession, speculation_stats
+
+router = APIRouter(prefix="/voice", tags=["Voice"])
+log = logging.getLogger(__name__)
+
+
+@router.websocket("/ask")
+async def voice_ask(websocket: WebSocket) -> None:
+    """Spoken question in, transcript events, answer text and PCM out, all on one socket.
+
+    See ``app.services.voice_pipeline`` for the message protocol.
+    """
+    await websocket.accept()
+    await VoiceAskSession(websocket, get_settings()).run()
+    try:
+        await websocket.close()
+    except RuntimeError:
+        pass  # the client already closed
+
+
+@router.get("/speculation")
+async def voice_speculation() -> dict:
+    """Hit rate and first-audio latency saved by speculative answers in this worker."""
+    return speculation_stats()
@@ -0,0 +1,315 @@
+"""Admission control: per-class concurrency limits, bounded priority queues and early shedding.
+
+Every request is mapped to a class by path (``ROUTE_CLASSES``). A request runs
+when both its class and the process as a whole have a free slot. Otherwise it
+waits in a bounded queue. When a slot frees, the highest-priority waiter that
+fits goes next, so interactive Q&A and live STT overtake bulk slide analysis
+and lesson pre-synthesis. A full queue, or a wait longer than
+``ADMISSION_MAX_WAIT_S`` or the request deadline, is shed with 503 and
+``Retry-After`` before any work or upstream quota is spent.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from bisect import insort
+from dataclasses import dataclass, field
+import itertools
+import json
+import math
+import time
+from typing import Any, Iterable
+
+from app.config import Settings, get_settings
+from app.services.upstream import remaining_time
+from app.utils.metrics import REGISTRY, counter, gauge_family, histogram
+
+# Lower runs first.
+PRIORITIES = {"interactive": 0, "live": 0, "standard": 1, "synthesis": 2, "bulk": 3}
+DEFAULT_CONCURRENCY = {"interactive": 32, "live": 50, "standard": 16, "synthesis": 16, "bulk": 2}
+DEFAULT_QUEUE = {"interactive": 64, "live": 0, "standard": 32, "synthesis": 32, "bulk": 16}
+
+# First matching prefix wins; ``None`` exempts the path. Unlisted paths are exempt.
+# A ``*`` segment matches any one path segment.
+ROUTE_CLASSES: tuple[tuple[str, str | None], ...] = (
+    ("/ask/analyze", "bulk"),
+    ("/ask/batch", "bulk"),
+    ("/ask/align", "bulk"),
+    ("/lightning/speak/batch", "bulk"),
+    ("/lightning/speak/stream", "synthesis"),
+    ("/lightning/stream", "synthesis"),
+    ("/pulse/live/metrics", None),
+    # Jobs run outside the request, capped by JOBS_MAX_CONCURRENT; SSE subscribers hold no slot.
+    ("/jobs", None),
+    # Lessons are served from disk and built as jobs.
+    ("/lessons", None),
+    ("/pulse/live", "live"),
+    # Notes subscribers stay connected for the whole lecture; a slot each would shed live STT.
+    ("/parse/live/*/events", None),
+    ("/parse/live", "live"),
+    ("/ask", "interactive"),
+    ("/voice", "interactive"),
+    ("/lightning", "standard"),
+    ("/pulse", "standard"),
+    ("/parse", "standard"),
+    ("/electron", "standard"),
+    ("/hydra", "standard"),
+)
+
+ADMISSION_WAIT = histogram(
+    "admission_queue_wait_seconds",
+    "Time requests spent queued for admission, per class.",
+    ("class",),
+)
+ADMISSION_REJECTED = counter(
+    "admission_rejected",
+    "Requests shed by admission control, per class and reason.",
+    ("class", "reason"),
+)
+
+
+class AdmissionRejected(Exception):
+    """The request was shed instead of queued or run."""
+
+    def __init__(self, class_name: str, reason: str, retry_after: float) -> None:
+        super().__init__(f"Server busy ({class_name} {reason.replace('_', ' ')}); retry later")
+        self.class_name = class_name
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def headers(self) -> dict[str, str]:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+@dataclass
+class AdmissionClass:
+    name: str
+    priority: int
+    max_concurrency: int
+    max_queue: int
+    in_flight: int = 0
+    queued: int = 0
+    admitted: int = 0
+    rejected: int = 0
+    # Moving average of how long a request holds its slot; drives Retry-After.
+    hold_s: float = 1.0
+    _wait: Any = field(default=None, repr=False)
+
+    def __post_init__(self) -> None:
+        self._wait = ADMISSION_WAIT.labels(self.name)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    cls: AdmissionClass = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class AdmissionController:
+    def __init__(self, classes: Iterable[AdmissionClass], max_in_flight: int, max_wait_s: float = 10.0) -> None:
+        self.classes = {cls.name: cls for cls in classes}
+        self.max_in_flight = max(max_in_flight, 1)
+        self.max_wait_s = max_wait_s
+        self.in_flight = 0
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+        # Set by ``build_admission_controller``; limits follow settings reloads.
+        self._settings: Settings | None = None
+
+    async def acquire(self, name: str) -> AdmissionClass:
+        """Wait for a slot in class ``name``; raises ``AdmissionRejected`` when shed."""
+        if self._settings is not None and (settings := get_settings()) is not self._settings:
+            self.configure(settings)
+        cls = self.classes[name]
+        if self._fits(cls):
+            self._admit(cls)
+            cls._wait.observe(0.0)
+            return cls
+        if cls.queued >= cls.max_queue:
+            raise self._reject(cls, "queue_full")
+
+        timeout = self.max_wait_s
+        deadline = remaining_time()
+        if deadline is not None:
+            timeout = min(timeout, deadline)
+        if timeout <= 0:
+            raise self._reject(cls, "timeout")
+
+        waiter = _Waiter(cls.priority, next(self._seq), cls, asyncio.get_running_loop().create_future())
+        insort(self._waiters, waiter)
+        cls.queued += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except BaseException as exc:
+            if waiter.future.done():
+                # Granted just as the wait timed out or the caller went away: hand the slot back.
+                self.release(cls, 0.0)
+            else:
+                self._waiters.remove(waiter)
+                cls.queued -= 1
+            if isinstance(exc, asyncio.TimeoutError):
+                raise self._reject(cls, "timeout") from None
+            raise
+        finally:
+            cls._wait.observe(time.monotonic() - started)
+        return cls
+
+    def configure(self, settings: Settings) -> None:
+        """Apply the limits in ``settings``; requests already in flight keep their slots."""
+        self._settings = settings
+        concurrency, queue = _limits(settings)
+        for cls in self.classes.values():
+            cls.max_concurrency, cls.max_queue = concurrency[cls.name], queue[cls.name]
+        self.max_in_flight = max(settings.ADMISSION_MAX_IN_FLIGHT, 1)
+        self.max_wait_s = settings.ADMISSION_MAX_WAIT_S
+        # Raised limits can admit waiters straight away.
+        self._dispatch()
+
+    def release(self, cls: AdmissionClass, held_s: float) -> None:
+        cls.in_flight -= 1
+        self.in_flight -= 1
+        if held_s > 0:
+            cls.hold_s += 0.2 * (held_s - cls.hold_s)
+        self._dispatch()
+
+    def stats(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "class": cls.name,
+                "priority": cls.priority,
+                "in_flight": cls.in_flight,
+                "queued": cls.queued,
+                "admitted": cls.admitted,
+                "rejected": cls.rejected,
+                "max_concurrency": cls.max_concurrency,
+                "max_queue": cls.max_queue,
+            }
+            for cls in self.classes.values()
+        ]
+
+    def _fits(self, cls: AdmissionClass) -> bool:
+        return cls.in_flight < cls.max_concurrency and self.in_flight < self.max_in_flight
+
+    def _admit(self, cls: AdmissionClass) -> None:
+        cls.in_flight += 1
+        cls.admitted += 1
+        self.in_flight += 1
+
+    def _dispatch(self) -> None:
+        # Waiters are kept sorted by (priority, arrival); skip those whose class is still full.
+        index = 0
+        while index < len(self._waiters) and self.in_flight < self.max_in_flight:
+            waiter = self._waiters[index]
+            if not self._fits(waiter.cls):
+                index += 1
+                continue
+            del self._waiters[index]
+            waiter.cls.queued -= 1
+            self._admit(waiter.cls)
+            waiter.future.set_result(None)
+
+    def _reject(self, cls: AdmissionClass, reason: str) -> AdmissionRejected:
+        cls.rejected += 1
+        ADMISSION_REJECTED.labels(cls.name, reason).inc()
+        retry_after = cls.hold_s * (cls.queued + 1) / max(cls.max_concurrency, 1)
+        return AdmissionRejected(cls.name, reason, min(retry_after, 60.0))
+
+
+def classify(path: str, routes: Iterable[tuple[str, str | None]] = ROUTE_CLASSES) -> str | None:
+    for prefix, name in routes:
+        if "*" in prefix:
+            if _matches_segments(path, prefix):
+                return name
+        elif path == prefix or path.startswith(prefix + "/"):
+            return name
+    return None
+
+
+def _matches_segments(path: str, prefix: str) -> bool:
+    parts, pattern = path.split("/"), prefix.split("/")
+    return len(parts) >= len(pattern) and all(want in ("*", part) for want, part in zip(pattern, parts))
+
+
+def build_admission_controller(settings: Settings) -> AdmissionController:
+    """Build the controller from settings; it re-reads its limits after a settings reload."""
+    concurrency, queue = _limits(settings)
+    controller = AdmissionController(
+        (AdmissionClass(name, priority, concurrency[name], queue[name]) for name, priority in PRIORITIES.items()),
+        max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+        max_wait_s=settings.ADMISSION_MAX_WAIT_S,
+    )
+    controller._settings = settings
+    _controllers[:] = [controller]
+    return controller
+
+
+def _limits(settings: Settings) -> tuple[dict[str, int], dict[str, int]]:
+    # The dict settings override the per-class defaults.
+    concurrency = {**DEFAULT_CONCURRENCY, **settings.ADMISSION_CONCURRENCY}
+    queue = {**DEFAULT_QUEUE, **settings.ADMISSION_QUEUE}
+    return concurrency, queue
+
+
+_controllers: list[AdmissionController] = []
+
+
+def _collect_admission():
+    stats = [s for controller in _controllers for s in controller.stats()]
+    yield gauge_family("admission_in_flight", "Requests holding an admission slot, per class.", (
+        ({"class": s["class"]}, s["in_flight"]) for s in stats
+    ))
+    yield gauge_family("admission_queued", "Requests waiting for admission, per class.", (
+        ({"class": s["class"]}, s["queued"]) for s in stats
+    ))
+
+
+REGISTRY.add_collector(_collect_admission)
+
+
+class AdmissionMiddleware:
+    """ASGI middleware gating HTTP requests and WebSocket sessions through an ``AdmissionController``.
+
+    The slot is held until the response (including any streamed body) or the
+    WebSocket session ends. Shed HTTP requests get a JSON 503 with
+    ``Retry-After``; shed WebSockets are accepted and closed straight away with
+    1013 (try again later), since a close before the handshake reaches the
+    client as a bare HTTP 403.
+    """
+
+    def __init__(self, app: Any, controller: AdmissionController) -> None:
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        if scope["type"] not in ("http", "websocket") or (name := classify(scope["path"])) is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            cls = await self.controller.acquire(name)
+        except AdmissionRejected as exc:
+            await _shed(scope, receive, send, exc)
+            return
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(cls, time.monotonic() - started)
+
+
+async def _shed(scope: dict, receive: Any, send: Any, exc: AdmissionRejected) -> None:
+    if scope["type"] == "websocket":
+        await receive()  # websocket.connect
+        await send({"type": "websocket.accept"})
+        await send({"type": "websocket.close", "code": 1013, "reason": str(exc)})
+        return
+    body = json.dumps({"detail": str(exc)}).encode("utf-8")
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode("ascii")),
+        *((key.lower().encode("ascii"), value.encode("ascii")) for key, value in exc.headers().items()),
+    ]
+    await send({"type": "http.response.start", "status": 503, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
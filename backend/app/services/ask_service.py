@@ -1,11 +1,32 @@
-import httpx
+import asyncio
+from functools import partial
+import logging
+from typing import AsyncIterator, Container
 
 from app.config import get_settings
 from app.models.base import SlideContext
+from app.services.chat_history import get_history_compactor
+from app.services.prompt_budget import (
+    ESTIMATOR,
+    Section,
+    body_chars,
+    budget_for,
+    fit_sections,
+    record_usage,
+)
+from app.services.question_index import deck_id, get_question_index
+from app.services.shared_cache import get_shared_cache
+from app.services.upstream import UPSTREAM_TTFB, UpstreamError, get_upstream, tls_context
+from app.utils.lazy import lazy_import
 import json
-import asyncio
+import re
+import time
+
+httpx = lazy_import("httpx")
 
-GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent"
+_WORD_RE = re.compile(r"[a-z0-9]{3,}")
+
+logger = logging.getLogger(__name__)
 
 SYSTEM_INSTRUCTION_QA = """You are a helpful teaching assistant. The student is listening to a lesson and has asked a question.
 
@@ -16,19 +37,99 @@ If context from the lesson is provided below, use it to give a relevant, concise
 - If the question is unclear or off-topic, answer politely and suggest they rephrase or wait for the relevant part of the lesson."""
 
 
-async def answer_question(question: str, context: str | None = None) -> str:
-    """Answer the student's question using Gemini, optionally with lesson context."""
-    settings = get_settings()
+def _qa_prompt(question: str, context: str | None) -> tuple[str, str]:
     system_text = SYSTEM_INSTRUCTION_QA
-    if context and context.strip():
-        system_text += f"\n\nLesson context (for reference only):\n{context.strip()}"
     user_text = question.strip()
     if not user_text:
         raise ValueError("Question cannot be empty")
+    if context and context.strip():
+        # The end of the lesson context is what the student just heard, so trimming keeps the tail.
+        _, _, lesson = fit_sections(
+            [Section(system_text, required=True), Section(user_text, required=True), Section(context.strip(), keep="tail")],
+            budget_for("qa"),
+            call="qa",
+        )
+        if lesson.text:
+            system_text += f"\n\nLesson context (for reference only):\n{lesson.text}"
+    return system_text, user_text
+
+
+async def _post_gemini(
+    body: dict, timeout_s: float, upstream: str = "gemini", hedge: bool = False, call: str | None = None
+) -> dict:
+    """POST one generateContent request through the shared upstream layer.
+
+    Text calls name their ``call`` kind so the prompt estimate is charged to the
+    token quota and checked against the reported usage.
+    """
+    settings = get_settings()
+    chars = body_chars(body) if call else 0
+    estimated = ESTIMATOR.estimate_chars(chars)
+
+    async def attempt(timeout: float) -> dict:
+        async with httpx.AsyncClient(timeout=timeout, verify=tls_context()) as client:
+            response = await client.post(
+                f"{settings.GEMINI_MODEL_URL}:generateContent",
+                headers={
+                    "x-goog-api-key": settings.GEMINI_API_KEY,
+                    "Content-Type": "application/json",
+                },
+                json=body,
+            )
+            response.raise_for_status()
+            return response.json()
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.post(
-            GEMINI_URL,
+    data = await get_upstream(upstream).call(attempt, timeout_s=timeout_s, hedge=hedge, cost_tokens=estimated)
+    if call:
+        record_usage(call, chars, estimated, data)
+    return data
+
+
+async def answer_question(question: str, context: str | None = None) -> str:
+    """Answer the student's question using Gemini, optionally with lesson context.
+
+    Answers are cached per prompt so repeated questions across workers skip Gemini.
+    """
+    system_text, user_text = _qa_prompt(question, context)
+    cache = get_shared_cache("answers")
+    return await cache.get_or_compute_json(
+        cache.key(system_text, user_text), lambda: _generate_answer(system_text, user_text)
+    )
+
+
+async def _generate_answer(system_text: str, user_text: str) -> str:
+    # Q&A is latency-critical, so a slow first attempt gets hedged.
+    data = await _post_gemini(
+        {
+            "systemInstruction": {"parts": [{"text": system_text}]},
+            "contents": [{"parts": [{"text": user_text}]}],
+        },
+        timeout_s=30.0,
+        hedge=True,
+        call="qa",
+    )
+
+    candidates = data.get("candidates", [])
+    if not candidates:
+        raise ValueError("No response from Gemini")
+    parts = candidates[0].get("content", {}).get("parts", [])
+    if not parts:
+        raise ValueError("Empty response from Gemini")
+    return parts[0].get("text", "").strip()
+
+
+async def stream_answer_text(question: str, context: str | None = None) -> AsyncIterator[str]:
+    """Stream the answer to a student's question as Gemini generates it."""
+    settings = get_settings()
+    system_text, user_text = _qa_prompt(question, context)
+    chars = len(system_text) + len(user_text)
+    estimated = ESTIMATOR.estimate_chars(chars)
+
+    async with httpx.AsyncClient(timeout=30.0, verify=tls_context()) as client:
+        request = client.build_request(
+            "POST",
+            f"{settings.GEMINI_MODEL_URL}:streamGenerateContent",
+            params={"alt": "sse"},
             headers={
                 "x-goog-api-key": settings.GEMINI_API_KEY,
                 "Content-Type": "application/json",
@@ -38,46 +139,100 @@ async def answer_question(question: str, context: str | None = None) -> str:
                 "contents": [{"parts": [{"text": user_text}]}],
             },
         )
-        response.raise_for_status()
-        data = response.json()
 
-    candidates = data.get("candidates", [])
-    if not candidates:
-        raise ValueError("No response from Gemini")
-    parts = candidates[0].get("content", {}).get("parts", [])
-    if not parts:
-        raise ValueError("Empty response from Gemini")
-    return parts[0].get("text", "").strip()
+        async def attempt(timeout: float) -> httpx.Response:
+            # Only opening the stream is retried; once text flows it cannot be replayed.
+            request.extensions["timeout"] = httpx.Timeout(timeout).as_dict()
+            response = await client.send(request, stream=True)
+            if response.status_code >= 400:
+                await response.aread()
+                await response.aclose()
+            response.raise_for_status()
+            return response
 
+        started = time.perf_counter()
+        response = await get_upstream("gemini").call(attempt, timeout_s=30.0, cost_tokens=estimated)
+        first_text = True
+        usage: dict = {}
+        try:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                try:
+                    data = json.loads(line[5:])
+                except json.JSONDecodeError:
+                    continue
+                usage = data.get("usageMetadata") or usage
+                for candidate in data.get("candidates", [])[:1]:
+                    for part in candidate.get("content", {}).get("parts", []):
+                        if part.get("text"):
+                            if first_text:
+                                first_text = False
+                                UPSTREAM_TTFB.labels("gemini").observe(time.perf_counter() - started)
+                            yield part["text"]
+        finally:
+            await response.aclose()
+            record_usage("qa", chars, estimated, {"usageMetadata": usage})
 
-async def analyze_slides(images_b64: list[str]) -> list[SlideContext]:
-    """
-    Sends slide images to Gemini Vision to extract text and descriptions.
-    Batches requests aggressively to avoid 429 errors.
+
+def normalize_question(question: str) -> str:
+    """Key for de-duplicating questions: case, spacing and trailing punctuation are ignored."""
+    return " ".join(question.casefold().split()).rstrip(" ?!.")
+
+
+async def answer_questions(
+    questions: list[str], context: str | None = None, concurrency: int = 8
+) -> AsyncIterator[dict]:
+    """Answer many questions that share one context, yielding results as they finish.
+
+    Questions that normalize to the same text are asked once, and each result
+    lists every original index it answers. At most ``concurrency`` questions are
+    in flight. The Gemini upstream's concurrency cap and quota buckets still apply.
     """
-    settings = get_settings()
-    all_results = []
-    # Vision models have much tighter TPM limits.
-    # Reducing batch size to 2 slides per request to stay under RPM/TPM.
-    batch_size = 2 
-    
-    for i in range(0, len(images_b64), batch_size):
-        batch = images_b64[i : i + batch_size]
-        parts = []
-        for j, img in enumerate(batch):
-            slide_idx = i + j + 1
-            if "base64," in img:
-                img = img.split("base64,")[1]
-                
-            parts.append({"text": f"--- Slide {slide_idx} ---"})
-            parts.append({
-                "inline_data": {
-                    "mime_type": "image/jpeg",
-                    "data": img
-                }
-            })
-        
-        prompt = """
+    groups: dict[str, list[int]] = {}
+    for index, question in enumerate(questions):
+        groups.setdefault(normalize_question(question), []).append(index)
+    pending = iter(groups.items())
+    results: asyncio.Queue[dict] = asyncio.Queue()
+
+    async def worker() -> None:
+        # Workers share one iterator, so each unique question is taken exactly once.
+        for key, indices in pending:
+            question = questions[indices[0]].strip()
+            started = time.perf_counter()
+            item: dict = {"indices": indices, "question": question}
+            try:
+                if not key:
+                    raise ValueError("Question cannot be empty")
+                item["answer"] = await answer_question(question, context)
+            except Exception as e:
+                item["error"], item["status"] = str(e), _batch_error_status(e)
+            item["elapsed_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+            await results.put(item)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(min(concurrency, len(groups)), 1))]
+    try:
+        for _ in range(len(groups)):
+            yield await results.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+def _batch_error_status(exc: Exception) -> int:
+    """The status ``/ask`` would have returned for this failure."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return 429 if exc.response.status_code == 429 else 502
+    if isinstance(exc, ValueError):
+        return 400
+    if isinstance(exc, UpstreamError):
+        return exc.status_code
+    logger.warning("Batch question failed: %s", exc)
+    return 500
+
+
+SLIDE_ANALYSIS_PROMPT = """
         Analyze these lecture slides sequentially. For EACH slide, provide:
         1. A detailed visual description (diagrams, charts, images).
         2. All text content extracted verbatim.
@@ -89,68 +244,98 @@ async def analyze_slides(images_b64: list[str]) -> list[SlideContext]:
         ]
         Do not use markdown code blocks. Just valid JSON.
         """
-        parts.append({"text": prompt})
 
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            response = await client.post(
-                f"{GEMINI_URL}?key={settings.GEMINI_API_KEY}",
-                headers={"Content-Type": "application/json"},
-                json={
-                    "contents": [{"parts": parts}],
-                    "generationConfig": {"response_mime_type": "application/json"} 
-                },
-            )
-            
-            # Explicitly catch 429
-            if response.status_code == 429:
-                raise httpx.HTTPStatusError("Rate limit exceeded", request=response.request, response=response)
-                
-            response.raise_for_status()
-            data = response.json()
-            
-        try:
-            candidates = data.get("candidates", [])
-            if not candidates:
-                raise ValueError("No candidates returned from Gemini")
-                
-            text_response = candidates[0].get("content", {}).get("parts", [{}])[0].get("text", "")
-            
-            # JSON cleanup
-            clean_json = text_response.strip()
-            if clean_json.startswith("```"):
-                lines = clean_json.split("\n")
-                if lines[0].startswith("```"): lines = lines[1:]
-                if lines[-1].startswith("```"): lines = lines[:-1]
-                clean_json = "\n".join(lines).strip()
-
-            slides_data = json.loads(clean_json)
-            all_results.extend([SlideContext(**s) for s in slides_data])
-            
-            # Aggressive delay: Vision tokens count for a lot in RPM/TPM limits
-            if i + batch_size < len(images_b64):
-                await asyncio.sleep(4.0) 
-            
-        except Exception as e:
-            print(f"Error in batch {i}: {e}")
-            raise ValueError(f"Batch analysis failed: {str(e)}")
-            
-    return all_results
+
+# Vision models have much tighter TPM limits.
+# Two slides per request keeps each call under RPM/TPM.
+SLIDE_BATCH_SIZE = 2
 
 
-async def chat_with_slides(query: str, context: list[SlideContext], current_slide: int, history: list[dict]) -> dict:
+async def analyze_slides(images_b64: list[str]) -> list[SlideContext]:
     """
-    Chat with the slides context.
-    Returns {"answer": str, "suggested_slide": int | None}
+    Sends slide images to Gemini Vision to extract text and descriptions.
+    Batches are paced by the gemini_vision token bucket and retried on 429/5xx.
+    Each batch result is cached by its images, so re-uploading a deck is free.
     """
-    settings = get_settings()
-    
-    # Construct system prompt with context
-    context_str = "\n".join([
-        f"--- Slide {s.slide_number} ---\n[Visuals]: {s.description}\n[Text]: {s.text_content}"
+    return [slide async for _, slides in analyze_slide_batches(images_b64) for slide in slides]
+
+
+async def analyze_slide_batches(
+    images_b64: list[str], skip: Container[int] = ()
+) -> AsyncIterator[tuple[int, list[SlideContext]]]:
+    """Yield ``(start, slides)`` per batch in deck order, skipping batch starts in ``skip``."""
+    cache = get_shared_cache("slide_analysis")
+    for i in range(0, len(images_b64), SLIDE_BATCH_SIZE):
+        if i in skip:
+            continue
+        batch = [img.split("base64,")[1] if "base64," in img else img for img in images_b64[i : i + SLIDE_BATCH_SIZE]]
+        slides_data = await cache.get_or_compute_json(
+            cache.key(i, SLIDE_ANALYSIS_PROMPT, *batch), lambda: _analyze_batch(i, batch)
+        )
+        yield i, [SlideContext(**s) for s in slides_data]
+
+
+async def _analyze_batch(start: int, batch: list[str]) -> list[dict]:
+    parts = []
+    for j, img in enumerate(batch):
+        parts.append({"text": f"--- Slide {start + j + 1} ---"})
+        parts.append({
+            "inline_data": {
+                "mime_type": "image/jpeg",
+                "data": img
+            }
+        })
+    parts.append({"text": SLIDE_ANALYSIS_PROMPT})
+
+    data = await _post_gemini(
+        {
+            "contents": [{"parts": parts}],
+            "generationConfig": {"response_mime_type": "application/json"},
+        },
+        timeout_s=300.0,
+        upstream="gemini_vision",
+    )
+
+    try:
+        candidates = data.get("candidates", [])
+        if not candidates:
+            raise ValueError("No candidates returned from Gemini")
+            
+        text_response = candidates[0].get("content", {}).get("parts", [{}])[0].get("text", "")
+        
+        # JSON cleanup
+        clean_json = text_response.strip()
+        if clean_json.startswith("```"):
+            lines = clean_json.split("\n")
+            if lines[0].startswith("```"): lines = lines[1:]
+            if lines[-1].startswith("```"): lines = lines[:-1]
+            clean_json = "\n".join(lines).strip()
+
+        slides_data = json.loads(clean_json)
+        # Validate before the result is cached.
+        return [SlideContext(**s).model_dump() for s in slides_data]
+
+    except Exception as e:
+        logger.warning("Slide analysis batch %d failed: %s", start, e)
+        raise ValueError(f"Batch analysis failed: {str(e)}")
+
+
+def _slide_text(slide: SlideContext) -> str:
+    return f"--- Slide {slide.slide_number} ---\n[Visuals]: {slide.description}\n[Text]: {slide.text_content}"
+
+
+def _rank_slides(query: str, context: list[SlideContext], current_slide: int) -> list[int]:
+    """Trim priority per slide: the current slide first, then by words shared with the query."""
+    words = set(_WORD_RE.findall(query.lower()))
+    return [
+        len(words & set(_WORD_RE.findall(f"{s.description} {s.text_content}".lower())))
+        + (len(words) + 1) * (s.slide_number == current_slide + 1)
         for s in context
-    ])
-    
-    system_instruction = f"""
+    ]
+
+
+def _chat_instruction(context_str: str, current_slide: int) -> str:
+    return f"""
     You are a teaching assistant helping a student with their lecture slides.
     
     CONTEXT (Slides):
@@ -187,52 +372,91 @@ async def chat_with_slides(query: str, context: list[SlideContext], current_slid
     }}
 
     """
-    
+
+
+CHAT_FALLBACK_ANSWER = "I'm sorry, I couldn't process that request."
+
+
+async def chat_with_slides(
+    query: str,
+    context: list[SlideContext],
+    current_slide: int,
+    history: list[dict],
+    session_id: str | None = None,
+) -> dict:
+    """
+    Chat with the slides context.
+    A near-duplicate of a recent question on the same deck reuses its answer (see ``question_index``).
+    Only opening questions are matched: with history, the answer depends on this session's conversation.
+    Returns {"answer": str, "suggested_slide": int | None}
+    """
+    ask = partial(_chat_with_gemini, query, context, current_slide, history, session_id)
+    if not get_settings().CHAT_REUSE_ENABLED or history:
+        return await ask()
+    return await get_question_index().get_or_answer(
+        deck_id(context),
+        query,
+        current_slide,
+        ask,
+        reusable=lambda result: result.get("answer") != CHAT_FALLBACK_ANSWER,
+    )
+
+
+async def _chat_with_gemini(
+    query: str,
+    context: list[SlideContext],
+    current_slide: int,
+    history: list[dict],
+    session_id: str | None,
+) -> dict:
+    """One slide chat turn; older history is compacted to CHAT_HISTORY_TOKEN_BUDGET (see ``chat_history``)."""
+
+    compacted = get_history_compactor().compact(history, session_id)
+    # Instructions, history and the question always go in; slides are ranked and trimmed to the rest of the budget.
+    required = "\n".join(
+        [_chat_instruction("", current_slide), compacted.summary or "", query, *(msg["content"] for msg in compacted.recent)]
+    )
+    ranks = _rank_slides(query, context, current_slide)
+    fitted = fit_sections(
+        [Section(required, required=True), *(Section(_slide_text(s), priority=rank) for s, rank in zip(context, ranks))],
+        budget_for("chat"),
+        call="chat",
+    )
+    context_str = "\n".join(section.text for section in fitted[1:] if section.text)
+    system_instruction = _chat_instruction(context_str, current_slide)
+    if compacted.summary:
+        system_instruction += f"\n\n{compacted.summary}\n"
+
     contents = []
-    # Add history
-    for msg in history:
+    # Add the recent history verbatim
+    for msg in compacted.recent:
         role = "user" if msg["role"] == "user" else "model"
         contents.append({"role": role, "parts": [{"text": msg["content"]}]})
         
     # Add current query
     contents.append({"role": "user", "parts": [{"text": query}]})
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.post(
-            f"{GEMINI_URL}?key={settings.GEMINI_API_KEY}",
-            headers={"Content-Type": "application/json"},
-            json={
-                "systemInstruction": {"parts": [{"text": system_instruction}]},
-                "contents": contents,
-                "generationConfig": {"response_mime_type": "application/json"}
-            },
-        )
-        response.raise_for_status()
-        data = response.json()
+    data = await _post_gemini(
+        {
+            "systemInstruction": {"parts": [{"text": system_instruction}]},
+            "contents": contents,
+            "generationConfig": {"response_mime_type": "application/json"},
+        },
+        timeout_s=60.0,
+        call="chat",
+    )
         
     try:
         text_response = data["candidates"][0]["content"]["parts"][0]["text"]
         result = json.loads(text_response)
         return result
     except Exception as e:
-        print(f"Error parsing chat response: {e}")
-        return {"answer": "I'm sorry, I couldn't process that request.", "suggested_slide": None}
-
-
-async def align_script_with_slides(script: str, context: list[SlideContext]) -> list[dict]:
-    """
-    Aligns a lesson script with the provided slide context.
-    Returns a list of segments, each with a corresponding slide number.
-    """
-    settings = get_settings()
+        logger.warning("Could not parse slide chat response: %s", e)
+        return {"answer": CHAT_FALLBACK_ANSWER, "suggested_slide": None}
 
-    # Construct context string
-    context_str = "\n".join([
-        f"--- Slide {s.slide_number} ---\n[Visuals]: {s.description}\n[Text]: {s.text_content}"
-        for s in context
-    ])
 
-    system_instruction = f"""
+def _align_instruction(context_str: str, script: str) -> str:
+    return f"""
     You are an expert educational content aligner.
     
     TASK:
@@ -259,18 +483,31 @@ async def align_script_with_slides(script: str, context: list[SlideContext]) ->
     ]
     """
 
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        response = await client.post(
-            f"{GEMINI_URL}?key={settings.GEMINI_API_KEY}",
-            headers={"Content-Type": "application/json"},
-            json={
-                "systemInstruction": {"parts": [{"text": system_instruction}]},
-                "contents": [{"parts": [{"text": "Align this script."}]}],
-                "generationConfig": {"response_mime_type": "application/json"}
-            },
-        )
-        response.raise_for_status()
-        data = response.json()
+
+async def align_script_with_slides(script: str, context: list[SlideContext]) -> list[dict]:
+    """
+    Aligns a lesson script with the provided slide context.
+    Returns a list of segments, each with a corresponding slide number.
+    """
+
+    # The whole script must be aligned, so only the slide descriptions are trimmed to fit.
+    fitted = fit_sections(
+        [Section(_align_instruction("", script), required=True), *(Section(_slide_text(s)) for s in context)],
+        budget_for("align"),
+        call="align",
+    )
+    context_str = "\n".join(section.text for section in fitted[1:] if section.text)
+    system_instruction = _align_instruction(context_str, script)
+
+    data = await _post_gemini(
+        {
+            "systemInstruction": {"parts": [{"text": system_instruction}]},
+            "contents": [{"parts": [{"text": "Align this script."}]}],
+            "generationConfig": {"response_mime_type": "application/json"},
+        },
+        timeout_s=120.0,
+        call="align",
+    )
 
     try:
         text_response = data["candidates"][0]["content"]["parts"][0]["text"]
@@ -284,9 +521,9 @@ async def align_script_with_slides(script: str, context: list[SlideContext]) ->
             clean_json = "\n".join(lines).strip()
             
         segments = json.loads(clean_json)
-        print(f"Alignment successful: {len(segments)} segments created.")
+        logger.info("Script aligned into %d segments", len(segments))
         return segments
     except Exception as e:
-        print(f"Error aligning script: {e}")
+        logger.warning("Script alignment failed, falling back to slide 1: %s", e)
         # Fallback: assign entire script to slide 1
         return [{"text": script, "slide_number": 1}]
@@ -0,0 +1,159 @@
+"""Token-budgeted slide chat history.
+
+The client sends the whole conversation on every ``/ask/slides`` turn. Sending
+all of it to Gemini would make each turn slower and more expensive than the
+last. ``HistoryCompactor`` keeps the newest messages verbatim. Older messages
+are folded into a short extractive summary: each one becomes a clipped line
+(the first sentence, at most ``LINE_CHARS`` characters). When the summary
+outgrows its own budget, its oldest lines are dropped.
+
+The folded prefix is cached per session, along with a digest of the messages
+it covers. A later turn reuses it as long as the client's history still starts
+with the same messages. Compaction advances in steps: once the verbatim tail
+overflows the budget, it is cut back to ``keep_messages``. So the summary, and
+the prompt prefix Gemini sees, stays unchanged for several turns at a time.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import hashlib
+import re
+
+from app.config import get_settings
+from app.services.prompt_budget import estimate_tokens
+from app.utils.cache import AsyncLRUCache
+from app.utils.metrics import counter
+
+# Role markers and turn separators Gemini adds around each message.
+MESSAGE_OVERHEAD_TOKENS = 4
+LINE_CHARS = 200
+SUMMARY_HEADER = "Summary of the earlier conversation (oldest first):"
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+CHAT_HISTORY = counter(
+    "chat_history_turns",
+    "Slide chat turns by how their history was prepared (verbatim, reused or compacted).",
+    ("result",),
+)
+
+
+def message_tokens(message: dict) -> int:
+    return estimate_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+
+@dataclass(frozen=True)
+class _Prefix:
+    upto: int  # messages [0:upto] are folded into ``lines``
+    digest: bytes
+    lines: tuple[str, ...]
+    tokens: int
+    dropped: int
+
+
+@dataclass
+class CompactedHistory:
+    summary: str | None
+    recent: list[dict]
+    tokens: int
+    folded: int = 0  # older messages represented by the summary or dropped
+    result: str = "verbatim"
+
+
+class HistoryCompactor:
+    def __init__(
+        self,
+        budget_tokens: int = 2000,
+        keep_messages: int = 6,
+        summary_tokens: int = 400,
+        max_sessions: int = 1024,
+        ttl_s: float = 3600.0,
+    ) -> None:
+        self.budget_tokens = max(budget_tokens, 1)
+        self.keep_messages = max(keep_messages, 1)
+        self.summary_tokens = max(min(summary_tokens, self.budget_tokens // 2), 0)
+        self._prefixes: AsyncLRUCache[_Prefix] = AsyncLRUCache(max_entries=max_sessions, ttl_seconds=ttl_s)
+
+    def compact(self, history: list[dict], session_id: str | None = None) -> CompactedHistory:
+        messages = [message for message in history if message.get("content")]
+        costs = [message_tokens(message) for message in messages]
+        total = sum(costs)
+        if total <= self.budget_tokens:
+            CHAT_HISTORY.labels("verbatim").inc()
+            return CompactedHistory(None, messages, total)
+
+        # Without a session ID the first message identifies the conversation; the digest check covers collisions.
+        key = session_id or _digest(messages[:1]).hex()
+        prefix = self._prefixes.get(key)
+        if prefix is None or prefix.upto > len(messages) or _digest(messages[:prefix.upto]) != prefix.digest:
+            prefix = _Prefix(0, _digest([]), (), 0, 0)
+
+        result = "reused"
+        if prefix.tokens + sum(costs[prefix.upto:]) > self.budget_tokens:
+            # Cut the tail back to keep_messages, or further if those alone overflow the budget.
+            upto = max(len(messages) - self.keep_messages, prefix.upto)
+            tail = sum(costs[upto:])
+            while upto < len(messages) - 1 and tail > self.budget_tokens - self.summary_tokens:
+                tail -= costs[upto]
+                upto += 1
+            prefix = self._fold(prefix, messages, upto)
+            self._prefixes.set(key, prefix)
+            result = "compacted"
+
+        CHAT_HISTORY.labels(result).inc()
+        recent = messages[prefix.upto:]
+        summary = "\n".join((SUMMARY_HEADER, *prefix.lines)) if prefix.lines else None
+        return CompactedHistory(
+            summary,
+            recent,
+            prefix.tokens + sum(costs[prefix.upto:]),
+            folded=prefix.upto,
+            result=result,
+        )
+
+    def _fold(self, prefix: _Prefix, messages: list[dict], upto: int) -> _Prefix:
+        lines = list(prefix.lines)
+        for message in messages[prefix.upto:upto]:
+            speaker = "Student" if message.get("role") == "user" else "Assistant"
+            lines.append(f"- {speaker}: {_clip(message['content'])}")
+        tokens = sum(estimate_tokens(line) for line in lines) + estimate_tokens(SUMMARY_HEADER)
+        dropped = prefix.dropped
+        while lines and tokens > self.summary_tokens:
+            tokens -= estimate_tokens(lines.pop(0))
+            dropped += 1
+        if not lines:
+            tokens = 0
+        return _Prefix(upto, _digest(messages[:upto]), tuple(lines), tokens, dropped)
+
+    def stats(self) -> dict:
+        return self._prefixes.stats()
+
+
+def _clip(text: str) -> str:
+    text = " ".join(text.split())
+    first = _SENTENCE_END_RE.split(text, maxsplit=1)[0]
+    return first if len(first) <= LINE_CHARS else first[:LINE_CHARS - 1].rstrip() + "…"
+
+
+def _digest(messages: list[dict]) -> bytes:
+    digest = hashlib.blake2b(digest_size=16)
+    for message in messages:
+        digest.update(str(message.get("role")).encode("utf-8") + b"\0")
+        digest.update(message["content"].encode("utf-8") + b"\0")
+    return digest.digest()
+
+
+_compactor: HistoryCompactor | None = None
+
+
+def get_history_compactor() -> HistoryCompactor:
+    global _compactor
+    if _compactor is None:
+        settings = get_settings()
+        _compactor = HistoryCompactor(
+            budget_tokens=settings.CHAT_HISTORY_TOKEN_BUDGET,
+            keep_messages=settings.CHAT_HISTORY_KEEP_MESSAGES,
+            summary_tokens=settings.CHAT_HISTORY_SUMMARY_TOKENS,
+        )
+    return _compactor
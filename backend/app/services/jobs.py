@@ -0,0 +1,229 @@
+"""Background jobs for long-running deck analysis and script alignment.
+
+A job runs on a bounded worker pool instead of inside an HTTP request, so no
+proxy timeout can kill it. Its runner records each finished unit of work (for
+example one slide batch) as a checkpoint. Clients poll the snapshot or subscribe
+to updates, and the snapshot always carries the results checkpointed so far.
+A failed or cancelled job can be retried: the runner sees the existing
+checkpoints and resumes after them instead of starting over. Finished jobs are
+dropped ``ttl_s`` after they end.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable
+import uuid
+
+from app.config import get_settings
+from app.services.upstream import UpstreamError, detached_deadline
+from app.utils.metrics import REGISTRY, gauge_family, histogram
+
+logger = logging.getLogger(__name__)
+
+JOB_DURATION = histogram(
+    "job_duration_seconds",
+    "Wall time of background job attempts, per kind and outcome.",
+    ("kind", "status"),
+    buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0),
+)
+
+FINISHED = frozenset({"succeeded", "failed", "cancelled"})
+
+Runner = Callable[["Job"], Awaitable[None]]
+
+
+class JobLimitError(UpstreamError):
+    """Too many jobs are queued or running to accept another."""
+
+
+class Job:
+    """One background job: status, progress and the checkpointed results so far."""
+
+    def __init__(self, job_id: str, kind: str, runner: Runner, fingerprint: str, total: int = 0) -> None:
+        self.job_id = job_id
+        self.kind = kind
+        self.fingerprint = fingerprint
+        self.total = total
+        self.status = "queued"
+        self.error: str | None = None
+        self.attempts = 0
+        self.version = 0
+        self.created_at = self.updated_at = time.time()
+        self.finished_at: float | None = None
+        # Checkpoint key -> list of result items; results are their concatenation in key order.
+        self.checkpoints: dict[int, list[Any]] = {}
+        self._runner = runner
+        self._task: asyncio.Task | None = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    @property
+    def results(self) -> list[Any]:
+        return [item for key in sorted(self.checkpoints) for item in self.checkpoints[key]]
+
+    async def checkpoint(self, key: int, items: list[Any]) -> None:
+        """Record a finished unit of work; a retried attempt skips keys already recorded."""
+        self.checkpoints[key] = items
+        await self._touch()
+
+    async def wait_for_update(self, since_version: int, timeout: float = 15.0) -> bool:
+        """Block until the job moves past ``since_version`` or finishes."""
+        async with self._changed:
+            try:
+                await asyncio.wait_for(
+                    self._changed.wait_for(lambda: self.version > since_version or self.finished),
+                    timeout=timeout,
+                )
+            except asyncio.TimeoutError:
+                return False
+        return self.version > since_version
+
+    def snapshot(self, include_results: bool = True) -> dict:
+        snapshot = {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "version": self.version,
+            "completed": len(self.checkpoints),
+            "total": self.total,
+            "attempts": self.attempts,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "error": self.error,
+        }
+        if include_results:
+            snapshot["results"] = self.results
+        return snapshot
+
+    async def _touch(self) -> None:
+        self.version += 1
+        self.updated_at = time.time()
+        async with self._changed:
+            self._changed.notify_all()
+
+
+class JobManager:
+    """Runs jobs at most ``max_concurrent`` at a time and keeps them for ``ttl_s`` after they finish."""
+
+    def __init__(self, max_concurrent: int = 2, max_pending: int = 32, ttl_s: float = 3600.0) -> None:
+        self.max_pending = max(max_pending, 1)
+        self.ttl_s = ttl_s
+        self._slots = asyncio.Semaphore(max(max_concurrent, 1))
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+
+    def submit(self, kind: str, runner: Runner, payload: Any, total: int = 0) -> Job:
+        """Start a job, or return the unfinished or succeeded job already submitted with the same payload."""
+        self.sweep()
+        fingerprint = hashlib.blake2b(
+            json.dumps([kind, payload], sort_keys=True, separators=(",", ":")).encode("utf-8"), digest_size=16
+        ).hexdigest()
+        for job in self._jobs.values():
+            if job.fingerprint == fingerprint and job.status not in ("failed", "cancelled"):
+                return job
+        if sum(not job.finished for job in self._jobs.values()) >= self.max_pending:
+            raise JobLimitError("Too many background jobs; retry later", retry_after=30.0)
+        job = Job(uuid.uuid4().hex, kind, runner, fingerprint, total)
+        self._jobs[job.job_id] = job
+        self._start(job)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        self.sweep()
+        return self._jobs.get(job_id)
+
+    def retry(self, job_id: str) -> Job | None:
+        """Re-run a failed or cancelled job from its checkpoints; unfinished jobs are returned as they are."""
+        job = self.get(job_id)
+        if job is None or job.status not in ("failed", "cancelled"):
+            return job
+        job.status = "queued"
+        job.error = None
+        job.finished_at = None
+        self._start(job)
+        return job
+
+    def cancel(self, job_id: str) -> Job | None:
+        job = self.get(job_id)
+        if job is not None and job._task is not None and not job._task.done():
+            job._task.cancel()
+        return job
+
+    def sweep(self) -> None:
+        """Drop finished jobs whose TTL has run out."""
+        cutoff = time.time() - self.ttl_s
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished_at and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def counts(self) -> dict[tuple[str, str], int]:
+        counts: dict[tuple[str, str], int] = {}
+        for job in self._jobs.values():
+            counts[(job.kind, job.status)] = counts.get((job.kind, job.status), 0) + 1
+        return counts
+
+    async def shutdown(self) -> None:
+        tasks = [job._task for job in self._jobs.values() if job._task is not None and not job._task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _start(self, job: Job) -> None:
+        # The job outlives the submitting request, so it must not inherit that request's deadline.
+        with detached_deadline():
+            job._task = asyncio.create_task(self._run(job))
+
+    async def _run(self, job: Job) -> None:
+        started = None
+        try:
+            async with self._slots:
+                started = time.monotonic()
+                job.status = "running"
+                job.attempts += 1
+                await job._touch()
+                await job._runner(job)
+            job.status = "succeeded"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            logger.warning("Job %s (%s) failed after %d checkpoints: %s", job.job_id, job.kind, len(job.checkpoints), e)
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            if started is not None:
+                JOB_DURATION.labels(job.kind, job.status).observe(time.monotonic() - started)
+            await job._touch()
+
+
+_manager: JobManager | None = None
+
+
+def get_job_manager() -> JobManager:
+    global _manager
+    if _manager is None:
+        settings = get_settings()
+        _manager = JobManager(settings.JOBS_MAX_CONCURRENT, settings.JOBS_MAX_PENDING, settings.JOBS_TTL_S)
+    return _manager
+
+
+async def close_jobs() -> None:
+    if _manager is not None:
+        await _manager.shutdown()
+
+
+def _collect_jobs():
+    counts = _manager.counts() if _manager is not None else {}
+    yield gauge_family("jobs", "Background jobs held in memory, per kind and status.", (
+        ({"kind": kind, "status": status}, count) for (kind, status), count in counts.items()
+    ))
+
+
+REGISTRY.add_collector(_collect_jobs)
@@ -0,0 +1,189 @@
+"""Packaged lessons: one seekable WAV per aligned script plus a segment, slide and anchor index.
+
+``build_lesson`` runs as a background job (see ``app.services.jobs``). Each
+aligned segment is synthesized through ``stream_lightning`` (and so through the
+TTS cache) and written as a part file. The part files are the checkpoints: a
+retried or repeated build only synthesizes segments that have no part yet.
+Once every segment is on disk, the parts are joined into ``<id>.wav`` and the
+offset table is written to ``<id>.json``. Both are written to a temp file and
+renamed into place. The lesson ID is a hash of the script, voice, audio format
+and post-processing settings, so an artifact never changes once written. That
+makes it safe to serve with a strong ETag and an immutable cache lifetime.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+from pathlib import Path
+import re
+import shutil
+import struct
+import time
+
+from app.config import Settings
+from app.models.lightning import LightningSpeakRequest
+from app.services.jobs import Job
+from app.services.lightning_service import parse_teaching_script, pcm_processing_key, stream_lightning
+
+WAV_HEADER_BYTES = 44
+BITS_PER_SAMPLE = 16
+CHANNELS = 1
+LESSON_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def lesson_id(segments: list[dict], voice_id: str | None, settings: Settings) -> str:
+    key = json.dumps(
+        [
+            [(segment.get("text", ""), segment.get("slide_number")) for segment in segments],
+            voice_id or settings.SMALLEST_VOICE_ID,
+            settings.LIGHTNING_MODEL,
+            settings.LIGHTNING_SAMPLE_RATE,
+            pcm_processing_key(settings),
+        ],
+        separators=(",", ":"),
+    )
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def audio_path(lesson: str, settings: Settings) -> Path:
+    return Path(settings.LESSON_ARTIFACT_DIR) / f"{lesson}.wav"
+
+
+def index_path(lesson: str, settings: Settings) -> Path:
+    return Path(settings.LESSON_ARTIFACT_DIR) / f"{lesson}.json"
+
+
+def load_index(lesson: str, settings: Settings) -> bytes | None:
+    """The artifact's index as stored JSON bytes, or None if it has not been built."""
+    if not LESSON_ID_RE.match(lesson):
+        return None
+    try:
+        return index_path(lesson, settings).read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+async def build_lesson(job: Job, lesson: str, segments: list[dict], voice_id: str | None, settings: Settings) -> None:
+    """Job runner: synthesize missing segments, then assemble the WAV and its index."""
+    if settings.LIGHTNING_OUTPUT_FORMAT != "pcm":
+        raise ValueError("Lesson artifacts need LIGHTNING_OUTPUT_FORMAT=pcm")
+    parts = Path(settings.LESSON_ARTIFACT_DIR) / f"{lesson}.parts"
+    await asyncio.to_thread(parts.mkdir, parents=True, exist_ok=True)
+
+    for index, segment in enumerate(segments):
+        part = parts / f"{index:05d}.pcm"
+        if not part.exists():
+            request = LightningSpeakRequest(latex_summary=segment["text"], voice_id=voice_id)
+            audio = b"".join([chunk async for chunk in stream_lightning(request, settings)])
+            await asyncio.to_thread(_write_atomic, part, audio)
+        await job.checkpoint(index, [{"index": index, "slide_number": segment.get("slide_number"), "bytes": part.stat().st_size}])
+
+    await asyncio.to_thread(_assemble, lesson, segments, voice_id, parts, settings)
+
+
+def _assemble(lesson: str, segments: list[dict], voice_id: str | None, parts: Path, settings: Settings) -> None:
+    sample_rate = settings.LIGHTNING_SAMPLE_RATE
+    bytes_per_ms = sample_rate * CHANNELS * BITS_PER_SAMPLE // 8 / 1000.0
+    part_files = [parts / f"{index:05d}.pcm" for index in range(len(segments))]
+    # Keep every segment boundary on a whole sample so any byte_start is a valid seek point.
+    sizes = [path.stat().st_size // 2 * 2 for path in part_files]
+    data_bytes = sum(sizes)
+
+    index_segments, slides, anchors = [], {}, []
+    offset = WAV_HEADER_BYTES
+    for index, (segment, size) in enumerate(zip(segments, sizes)):
+        start_ms = (offset - WAV_HEADER_BYTES) / bytes_per_ms
+        duration_ms = size / bytes_per_ms
+        slide = segment.get("slide_number")
+        index_segments.append({
+            "index": index,
+            "slide_number": slide,
+            "text": segment["text"],
+            "start_ms": round(start_ms),
+            "end_ms": round(start_ms + duration_ms),
+            "byte_start": offset,
+            "byte_end": offset + size,
+        })
+        if slide is not None and slide not in slides:
+            slides[slide] = {"slide_number": slide, "segment": index, "start_ms": round(start_ms), "byte_start": offset}
+        script = parse_teaching_script(segment["text"])
+        total_chars = max(len(script.text), 1)
+        for anchor in script.anchors:
+            # Spoken position is assumed proportional to text position within the segment.
+            ratio = min(anchor.span_start / total_chars, 1.0)
+            anchor_bytes = int(size * ratio) // 2 * 2
+            anchors.append({
+                "anchor_id": anchor.anchor_id,
+                "anchor_type": anchor.anchor_type,
+                "label": anchor.label,
+                "text": anchor.text,
+                "segment": index,
+                "ms": round(start_ms + anchor_bytes / bytes_per_ms),
+                "byte": offset + anchor_bytes,
+            })
+        offset += size
+
+    target = audio_path(lesson, settings)
+    tmp = target.with_suffix(f".wav.{os.getpid()}.tmp")
+    with open(tmp, "wb") as out:
+        out.write(_wav_header(data_bytes, sample_rate))
+        for path, size in zip(part_files, sizes):
+            with open(path, "rb") as part:
+                _copy(part, out, size)
+    os.replace(tmp, target)
+
+    index = {
+        "lesson_id": lesson,
+        "format": "wav",
+        "sample_rate": sample_rate,
+        "channels": CHANNELS,
+        "bits_per_sample": BITS_PER_SAMPLE,
+        "data_offset": WAV_HEADER_BYTES,
+        "bytes": WAV_HEADER_BYTES + data_bytes,
+        "duration_ms": round(data_bytes / bytes_per_ms),
+        "voice_id": voice_id or settings.SMALLEST_VOICE_ID,
+        "audio_url": f"/lessons/{lesson}/audio",
+        "created_at": time.time(),
+        "segments": index_segments,
+        "slides": sorted(slides.values(), key=lambda entry: entry["slide_number"]),
+        "anchors": anchors,
+    }
+    _write_atomic(index_path(lesson, settings), json.dumps(index, separators=(",", ":")).encode("utf-8"))
+    shutil.rmtree(parts, ignore_errors=True)
+
+
+def _wav_header(data_bytes: int, sample_rate: int) -> bytes:
+    byte_rate = sample_rate * CHANNELS * BITS_PER_SAMPLE // 8
+    block_align = CHANNELS * BITS_PER_SAMPLE // 8
+    return (
+        b"RIFF" + struct.pack("<I", 36 + data_bytes) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, CHANNELS, sample_rate, byte_rate, block_align, BITS_PER_SAMPLE)
+        + b"data" + struct.pack("<I", data_bytes)
+    )
+
+
+def _copy(source, target, size: int) -> None:
+    # Kernel-side copy between the two files where the platform allows it.
+    target.flush()
+    sent = 0
+    try:
+        while sent < size:
+            count = os.sendfile(target.fileno(), source.fileno(), sent, size - sent)
+            if count == 0:
+                break
+            sent += count
+    except (AttributeError, OSError):
+        source.seek(sent)
+        target.seek(0, os.SEEK_END)
+        target.write(source.read(size - sent))
+    target.seek(0, os.SEEK_END)
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
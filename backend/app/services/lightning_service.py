@@ -1,27 +1,155 @@
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
+import hashlib
+import json
 import logging
+import os
 import time
-from typing import Any, AsyncIterator
+from typing import Any, AsyncIterable, AsyncIterator
 
-from app.config import Settings
-from app.models.lightning import LightningSpeakRequest, LightningSpeakResponse, SemanticAnchor
+from app.config import LogRateLimiter, Settings
+from app.models.lightning import (
+    AnchorSpan,
+    LightningBatchSpeakRequest,
+    LightningBatchSpeakResponse,
+    LightningSpeakRequest,
+    LightningSpeakResponse,
+    ScriptSentence,
+    TeachingScript,
+)
 from app.services.smallest_lightning_client import (
     LightningClientError,
     SmallestLightningClient,
 )
-from app.utils.latex_parser import latex_to_teaching_script
+from app.services.shared_cache import get_shared_cache
+from app.utils.cache import AsyncLRUCache
+from app.utils.latex_parser import aiter_script_sentences, latex_to_teaching_script
+from app.utils.metrics import counter, histogram, register_cache_stats
+from app.utils.pcm_dsp import PcmProcessor, numpy_available
 
 logger = logging.getLogger(__name__)
 
+SCRIPT_CACHE_SIZE = 512
+# Cached audio is replayed in 100 ms slices of 24 kHz 16-bit PCM.
+REPLAY_CHUNK_BYTES = 4800
+# Below this many uncached characters, parsing inline beats process-pool IPC.
+BATCH_INLINE_CHARS = 50_000
+PARSE_POOL_WORKERS = min(4, os.cpu_count() or 1)
+
+_script_cache: AsyncLRUCache[TeachingScript] = AsyncLRUCache(max_entries=SCRIPT_CACHE_SIZE)
+_parse_pool: concurrent.futures.ProcessPoolExecutor | None = None
+
+STAGE_DURATION = histogram(
+    "lightning_stage_seconds",
+    "Duration of each speech pipeline stage.",
+    ("stage",),
+)
+_PARSE_STAGE = STAGE_DURATION.labels("parse")
+TRIMMED_SECONDS = counter(
+    "lightning_silence_trimmed_seconds",
+    "Leading and trailing silence dropped from Lightning segments by the PCM post-processing stage.",
+)
+
+# Anchor events fire while audio is streaming; keep their log volume bounded.
+_anchor_log_limiter = LogRateLimiter(per_second=2.0, burst=10)
+
+
+def parse_teaching_script(latex_summary: str) -> TeachingScript:
+    """Memoized ``latex_to_teaching_script``, keyed by a hash of the summary."""
+    return _script_cache.get_or_call(
+        _summary_key(latex_summary),
+        lambda: latex_to_teaching_script(latex_summary),
+    )
+
+
+async def parse_teaching_scripts(latex_summaries: list[str]) -> tuple[list[TeachingScript], int]:
+    """Parse many summaries, reusing cached scripts and spreading misses over a process pool.
+
+    Returns the scripts in input order plus how many came from the cache.
+    """
+    keys = [_summary_key(summary) for summary in latex_summaries]
+    scripts: list[TeachingScript | None] = [_script_cache.get(key) for key in keys]
+    cached = sum(script is not None for script in scripts)
+    _script_cache.hits += cached
+
+    missing: dict[str, str] = {}
+    for key, summary, script in zip(keys, latex_summaries, scripts):
+        if script is None:
+            missing.setdefault(key, summary)
+    _script_cache.misses += len(missing)
+
+    if missing:
+        sources = list(missing.values())
+        if sum(len(source) for source in sources) < BATCH_INLINE_CHARS:
+            parsed = [latex_to_teaching_script(source) for source in sources]
+        else:
+            loop = asyncio.get_running_loop()
+            pool = _get_parse_pool()
+            # A few chunks per worker keeps workers busy without paying IPC per summary.
+            chunk_size = max(1, -(-len(sources) // (PARSE_POOL_WORKERS * 4)))
+            parts = await asyncio.gather(
+                *(
+                    loop.run_in_executor(pool, _parse_many, sources[i:i + chunk_size])
+                    for i in range(0, len(sources), chunk_size)
+                )
+            )
+            parsed = [script for part in parts for script in part]
+        fresh = dict(zip(missing, parsed))
+        for key, script in fresh.items():
+            _script_cache.set(key, script)
+        scripts = [script if script is not None else fresh[key] for key, script in zip(keys, scripts)]
+
+    return scripts, cached
+
+
+def script_cache_stats() -> dict[str, Any]:
+    return _script_cache.stats()
+
+
+register_cache_stats("teaching_script", script_cache_stats)
+
+
+def _summary_key(latex_summary: str) -> str:
+    return hashlib.blake2b(latex_summary.encode("utf-8"), digest_size=20).hexdigest()
+
+
+def _parse_many(latex_summaries: list[str]) -> list[TeachingScript]:
+    return [latex_to_teaching_script(summary) for summary in latex_summaries]
+
+
+def _get_parse_pool() -> concurrent.futures.ProcessPoolExecutor:
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = concurrent.futures.ProcessPoolExecutor(max_workers=PARSE_POOL_WORKERS)
+    return _parse_pool
+
 
 async def speak_lightning(payload: LightningSpeakRequest) -> LightningSpeakResponse:
     """Return a parsed script preview for compatibility/debug workflows."""
-    teaching_script = latex_to_teaching_script(payload.latex_summary)
+    teaching_script = parse_teaching_script(payload.latex_summary)
+    return _speak_response(teaching_script, payload.anchors_enabled)
+
+
+async def speak_lightning_batch(payload: LightningBatchSpeakRequest) -> LightningBatchSpeakResponse:
+    """Parse a whole module of lesson summaries in one call."""
+    parse_start = time.perf_counter()
+    scripts, cached = await parse_teaching_scripts(payload.latex_summaries)
+    parse_ms = (time.perf_counter() - parse_start) * 1000.0
+    return LightningBatchSpeakResponse(
+        results=[_speak_response(script, payload.anchors_enabled) for script in scripts],
+        cached=cached,
+        parse_ms=round(parse_ms, 2),
+    )
+
+
+def _speak_response(teaching_script: TeachingScript, anchors_enabled: bool = True) -> LightningSpeakResponse:
+    anchors = teaching_script.anchors if anchors_enabled else []
     return LightningSpeakResponse(
         message="Lightning speech pipeline prepared",
         teaching_script_preview=teaching_script.text,
-        anchors=teaching_script.anchors,
+        anchors=[anchor.to_model() for anchor in anchors],
     )
 
 
@@ -30,10 +158,16 @@ async def stream_lightning(
     settings: Settings,
     client: SmallestLightningClient | None = None,
 ) -> AsyncIterator[bytes]:
-    """Stream clean raw PCM bytes for browser playback."""
+    """Stream clean raw PCM bytes for browser playback.
+
+    The audio goes through ``pcm_processor`` when it is enabled: leveled,
+    limited and trimmed of silence at both ends.
+    """
     parse_start = time.perf_counter()
-    teaching_script = latex_to_teaching_script(payload.latex_summary)
-    parse_ms = (time.perf_counter() - parse_start) * 1000.0
+    teaching_script = parse_teaching_script(payload.latex_summary)
+    parse_s = time.perf_counter() - parse_start
+    parse_ms = parse_s * 1000.0
+    _PARSE_STAGE.observe(parse_s)
 
     if client is None:
         client = SmallestLightningClient(settings)
@@ -44,19 +178,43 @@ async def stream_lightning(
     anchors = teaching_script.anchors if payload.anchors_enabled else []
     sorted_anchors = sorted(anchors, key=lambda item: item.span_end)
 
+    audio_cache = get_shared_cache("tts_audio", settings.TTS_CACHE_TTL_S, settings)
+    audio_key = audio_cache.key(
+        teaching_script.text,
+        payload.voice_id or settings.SMALLEST_VOICE_ID,
+        settings.LIGHTNING_MODEL,
+        settings.LIGHTNING_SAMPLE_RATE,
+        settings.LIGHTNING_OUTPUT_FORMAT,
+        json.dumps(payload.metadata, sort_keys=True, default=str),
+    )
+    cached_audio = await audio_cache.get(audio_key)
+    # The cache keeps Lightning's raw audio; replays go through the same processing.
+    processor = pcm_processor(settings)
+
     stream_started = time.perf_counter()
     bytes_streamed = 0
     anchor_index = 0
+    ttfb_ms: float | None = None
+    recorded: list[bytes] | None = None
 
     try:
-        chunk_iterator, metrics = await client.stream_tts(
-            script_text=teaching_script.text,
-            voice_id=payload.voice_id,
-            metadata=payload.metadata,
-        )
+        if cached_audio is not None:
+            chunk_iterator = _replay_audio(cached_audio)
+        else:
+            chunk_iterator, metrics = await client.stream_tts(
+                script_text=teaching_script.text,
+                voice_id=payload.voice_id,
+                metadata=payload.metadata,
+            )
+            recorded = []
 
         async for chunk in chunk_iterator:
             bytes_streamed += len(chunk)
+            if recorded is not None:
+                # Lessons too long to cache are streamed without being kept.
+                recorded = recorded if bytes_streamed <= settings.CACHE_MAX_VALUE_BYTES else None
+                if recorded is not None:
+                    recorded.append(chunk)
 
             progress = _estimate_progress_by_audio(
                 bytes_streamed=bytes_streamed,
@@ -69,29 +227,45 @@ async def stream_lightning(
                 threshold = candidate.span_end / total_chars
                 if progress < threshold:
                     break
-                logger.info("Semantic anchor reached: %s", _anchor_payload(candidate, estimated_duration_s, total_chars))
+                _log_anchor(candidate, estimated_duration_s, total_chars)
                 anchor_index += 1
 
+            if processor is not None:
+                chunk = processor.process(chunk)
+                if not chunk:
+                    continue
             yield chunk
 
+        if processor is not None:
+            tail = processor.end_segment()
+            if tail:
+                yield tail
+            TRIMMED_SECONDS.inc(processor.trimmed_ms / 1000.0)
+
         while anchor_index < len(sorted_anchors):
-            logger.info(
-                "Semantic anchor reached (end flush): %s",
-                _anchor_payload(sorted_anchors[anchor_index], estimated_duration_s, total_chars),
-            )
+            _log_anchor(sorted_anchors[anchor_index], estimated_duration_s, total_chars)
             anchor_index += 1
 
-        total_stream_ms = (time.perf_counter() - stream_started) * 1000.0
+        if recorded:
+            await audio_cache.set(audio_key, b"".join(recorded))
+        if cached_audio is None:
+            ttfb_ms = metrics.ttfb_ms
+
+        total_stream_s = time.perf_counter() - stream_started
+        total_stream_ms = total_stream_s * 1000.0
+        STAGE_DURATION.labels("stream").observe(total_stream_s)
         done_payload = {
             "total_bytes": bytes_streamed,
+            "cached": cached_audio is not None,
             "parse_ms": round(parse_ms, 2),
-            "ttfb_ms": round(metrics.ttfb_ms, 2) if metrics.ttfb_ms is not None else None,
+            "ttfb_ms": round(ttfb_ms, 2) if ttfb_ms is not None else None,
             "stream_ms": round(total_stream_ms, 2),
             "sample_rate": settings.LIGHTNING_SAMPLE_RATE,
             "output_format": settings.LIGHTNING_OUTPUT_FORMAT,
             "script_length": len(teaching_script.text),
+            "trimmed_ms": round(processor.trimmed_ms) if processor is not None else None,
         }
-        logger.info("Lightning stream complete: %s", done_payload)
+        logger.info("Lightning stream complete: %s", done_payload, extra={"anchors": anchor_index})
 
     except LightningClientError as exc:
         logger.exception("Lightning stream failed")
@@ -101,6 +275,131 @@ async def stream_lightning(
         raise RuntimeError(f"Unexpected error: {exc}") from exc
 
 
+def pcm_processing_key(settings: Settings) -> list[float] | None:
+    """The post-processing parameters that shape streamed audio, or None when it passes through unprocessed."""
+    if not settings.LIGHTNING_DSP_ENABLED or settings.LIGHTNING_OUTPUT_FORMAT != "pcm" or not numpy_available():
+        return None
+    return [
+        settings.LIGHTNING_DSP_TARGET_DBFS,
+        settings.LIGHTNING_DSP_CEILING_DBFS,
+        settings.LIGHTNING_DSP_SILENCE_DBFS,
+        settings.LIGHTNING_DSP_EDGE_PAD_MS,
+    ]
+
+
+def pcm_processor(settings: Settings) -> PcmProcessor | None:
+    """A post-processing stage for one stream, or None when it is disabled or cannot run."""
+    if pcm_processing_key(settings) is None:
+        return None
+    return PcmProcessor(
+        sample_rate=settings.LIGHTNING_SAMPLE_RATE,
+        target_dbfs=settings.LIGHTNING_DSP_TARGET_DBFS,
+        ceiling_dbfs=settings.LIGHTNING_DSP_CEILING_DBFS,
+        silence_dbfs=settings.LIGHTNING_DSP_SILENCE_DBFS,
+        pad_ms=settings.LIGHTNING_DSP_EDGE_PAD_MS,
+    )
+
+
+async def _replay_audio(audio: bytes) -> AsyncIterator[bytes]:
+    for offset in range(0, len(audio), REPLAY_CHUNK_BYTES):
+        yield audio[offset : offset + REPLAY_CHUNK_BYTES]
+
+
+async def stream_lightning_chunks(
+    chunks: AsyncIterable[str],
+    settings: Settings,
+    voice_id: str | None = None,
+    metadata: dict[str, Any] | None = None,
+    client: SmallestLightningClient | None = None,
+    max_batch_chars: int = 800,
+) -> AsyncIterator[bytes]:
+    """Stream PCM for LaTeX that is itself still arriving, e.g. a streaming Gemini answer.
+
+    Parsing runs concurrently with synthesis. The first complete sentence goes
+    to Lightning on its own for a fast first byte; every later request carries
+    all sentences parsed while the previous one was streaming. Each request's
+    audio is one post-processing segment, so the silence Lightning pads it with
+    is trimmed at the joins while the loudness carries over.
+    """
+    if client is None:
+        client = SmallestLightningClient(settings)
+
+    sentences: asyncio.Queue[ScriptSentence | None] = asyncio.Queue()
+
+    async def parse() -> None:
+        try:
+            async for sentence in aiter_script_sentences(chunks):
+                await sentences.put(sentence)
+        finally:
+            await sentences.put(None)
+
+    parser_task = asyncio.create_task(parse())
+    processor = pcm_processor(settings)
+    stream_started = time.perf_counter()
+    first_byte_ms: float | None = None
+    bytes_streamed = 0
+    requests = 0
+    finished = False
+
+    try:
+        while not finished:
+            first = await sentences.get()
+            if first is None:
+                break
+            batch = [first.text]
+            batch_chars = len(first.text)
+            while not sentences.empty() and batch_chars < max_batch_chars:
+                sentence = sentences.get_nowait()
+                if sentence is None:
+                    finished = True
+                    break
+                batch.append(sentence.text)
+                batch_chars += len(sentence.text) + 1
+
+            chunk_iterator, _ = await client.stream_tts(
+                script_text=" ".join(batch),
+                voice_id=voice_id,
+                metadata=metadata,
+            )
+            requests += 1
+            async for chunk in chunk_iterator:
+                if processor is not None:
+                    chunk = processor.process(chunk)
+                    if not chunk:
+                        continue
+                if first_byte_ms is None:
+                    first_audio_s = time.perf_counter() - stream_started
+                    first_byte_ms = first_audio_s * 1000.0
+                    STAGE_DURATION.labels("first_audio").observe(first_audio_s)
+                bytes_streamed += len(chunk)
+                yield chunk
+            if processor is not None:
+                tail = processor.end_segment()
+                if tail:
+                    bytes_streamed += len(tail)
+                    yield tail
+
+        await parser_task
+        if processor is not None:
+            TRIMMED_SECONDS.inc(processor.trimmed_ms / 1000.0)
+        STAGE_DURATION.labels("stream_chunked").observe(time.perf_counter() - stream_started)
+        logger.info(
+            "Lightning chunked stream complete: %s",
+            {
+                "total_bytes": bytes_streamed,
+                "requests": requests,
+                "trimmed_ms": round(processor.trimmed_ms) if processor is not None else None,
+                "first_byte_ms": round(first_byte_ms, 2) if first_byte_ms is not None else None,
+                "stream_ms": round((time.perf_counter() - stream_started) * 1000.0, 2),
+            },
+        )
+    except LightningClientError:
+        logger.exception("Lightning chunked stream failed")
+        raise
+    finally:
+        parser_task.cancel()
+
+
 def _estimate_speech_duration_seconds(text: str) -> float:
     words = max(len(text.split()), 1)
     words_per_second = 2.6
@@ -115,7 +414,17 @@ def _estimate_progress_by_audio(
     return min(1.0, elapsed_audio_seconds / max(estimated_duration_seconds, 0.001))
 
 
-def _anchor_payload(anchor: SemanticAnchor, estimated_duration_s: float, total_chars: int) -> dict[str, Any]:
+def _log_anchor(anchor: AnchorSpan, estimated_duration_s: float, total_chars: int) -> None:
+    if not logger.isEnabledFor(logging.DEBUG) or not _anchor_log_limiter.allow():
+        return
+    logger.debug(
+        "Semantic anchor reached: %s",
+        _anchor_payload(anchor, estimated_duration_s, total_chars),
+        extra={"suppressed": _anchor_log_limiter.take_suppressed()},
+    )
+
+
+def _anchor_payload(anchor: AnchorSpan, estimated_duration_s: float, total_chars: int) -> dict[str, Any]:
     ratio = anchor.span_end / max(total_chars, 1)
     return {
         "anchor_id": anchor.anchor_id,
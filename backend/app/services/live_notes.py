@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+import logging
+import time
+from typing import Awaitable, Callable
+import uuid
+
+from app.services.parse_service import format_transcript_increment
+from app.utils.metrics import REGISTRY, gauge_family
+
+logger = logging.getLogger(__name__)
+
+Formatter = Callable[[str, str], Awaitable[str]]
+
+# A failed batch is retried after 1, 2 and 4 s, then kept as raw transcript text.
+RETRY_BASE_S = 1.0
+MAX_RETRIES = 3
+
+
+class LiveNotesSession:
+    """Rolling finalized transcript plus the notes formatted from it so far.
+
+    Only segments past the formatting cursor are sent to Gemini, at most about
+    ``batch_chars`` at a time, together with a small overlap window of
+    already-formatted segments, so each update costs the same regardless of how
+    long the lecture has been running. A batch that keeps failing (a Gemini
+    outage) is retried with backoff and then kept unformatted, so the cursor
+    never stalls and prompts never grow.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        batch_chars: int = 600,
+        overlap_segments: int = 2,
+        formatter: Formatter | None = None,
+        retry_base_s: float = RETRY_BASE_S,
+    ) -> None:
+        self.session_id = session_id
+        self.segments: list[str] = []
+        self.sections: list[str] = []
+        self.version = 0
+        self.closed = False
+        self.updated_at = time.time()
+        self._batch_chars = max(batch_chars, 1)
+        self._overlap_segments = max(overlap_segments, 0)
+        self._formatter = formatter or format_transcript_increment
+        self._retry_base_s = retry_base_s
+        self._cursor = 0
+        self._pending_chars = 0
+        self._flushing = False
+        self._task: asyncio.Task | None = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def pending_segments(self) -> int:
+        return len(self.segments) - self._cursor
+
+    @property
+    def document(self) -> str:
+        return "\n\n".join(self.sections)
+
+    def add_final(self, text: str) -> None:
+        """Record one finalized transcript segment; format once a batch is ready."""
+        text = text.strip()
+        if not text or self.closed:
+            return
+        self.segments.append(text)
+        self._pending_chars += len(text)
+        if self._pending_chars >= self._batch_chars:
+            self._schedule()
+
+    async def flush(self) -> None:
+        """Format everything still pending and wait for it to land."""
+        self._flushing = True
+        try:
+            self._schedule()
+            if self._task is not None:
+                await asyncio.shield(self._task)
+        finally:
+            self._flushing = False
+
+    async def close(self) -> None:
+        """Flush the tail of the transcript and wake any subscribers."""
+        try:
+            await self.flush()
+        finally:
+            self.closed = True
+            await self._notify()
+
+    async def wait_for_update(self, since_version: int, timeout: float = 15.0) -> bool:
+        """Block until the document moves past ``since_version`` or the session closes."""
+        async with self._changed:
+            try:
+                await asyncio.wait_for(
+                    self._changed.wait_for(lambda: self.version > since_version or self.closed),
+                    timeout=timeout,
+                )
+            except asyncio.TimeoutError:
+                return False
+        return self.version > since_version
+
+    def snapshot(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "version": self.version,
+            "formatted": self.document,
+            "sections": len(self.sections),
+            "finalized_segments": len(self.segments),
+            "pending_segments": self.pending_segments,
+            "closed": self.closed,
+        }
+
+    def changes(self, since_section: int) -> dict:
+        """Snapshot counters plus only the sections from ``since_section`` on."""
+        update = self.snapshot()
+        del update["formatted"]
+        update["start"] = since_section
+        update["added"] = self.sections[since_section:]
+        return update
+
+    def _schedule(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._drain())
+
+    async def _drain(self) -> None:
+        while self._cursor < len(self.segments) and (self._flushing or self._pending_chars >= self._batch_chars):
+            end, batch_chars = self._cursor, 0
+            while end < len(self.segments) and (end == self._cursor or batch_chars < self._batch_chars):
+                batch_chars += len(self.segments[end])
+                end += 1
+            new_text = " ".join(self.segments[self._cursor:end])
+            overlap_start = max(0, self._cursor - self._overlap_segments)
+            overlap_text = " ".join(self.segments[overlap_start:self._cursor])
+            formatted = await self._format(new_text, overlap_text)
+            if formatted:
+                self.sections.append(formatted)
+            self._cursor = end
+            self._pending_chars -= batch_chars
+            self.version += 1
+            self.updated_at = time.time()
+            await self._notify()
+
+    async def _format(self, new_text: str, overlap_text: str) -> str:
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                return await self._formatter(new_text, overlap_text)
+            except Exception:
+                logger.exception(
+                    "Live notes update failed for session %s (attempt %d/%d)",
+                    self.session_id, attempt + 1, MAX_RETRIES + 1,
+                )
+            if attempt < MAX_RETRIES:
+                await asyncio.sleep(self._retry_base_s * 2 ** attempt)
+        # Keep the transcript in the notes rather than stalling the cursor.
+        return new_text
+
+    async def _notify(self) -> None:
+        async with self._changed:
+            self._changed.notify_all()
+
+
+_sessions: OrderedDict[str, LiveNotesSession] = OrderedDict()
+
+
+def create_live_session(
+    session_id: str | None = None,
+    batch_chars: int = 600,
+    overlap_segments: int = 2,
+    max_sessions: int = 50,
+) -> LiveNotesSession:
+    """Register a notes session, evicting the oldest finished ones past ``max_sessions``."""
+    session_id = session_id or uuid.uuid4().hex
+    existing = _sessions.get(session_id)
+    if existing is not None and not existing.closed:
+        _sessions.move_to_end(session_id)
+        return existing
+
+    session = LiveNotesSession(
+        session_id,
+        batch_chars=batch_chars,
+        overlap_segments=overlap_segments,
+    )
+    if existing is not None:
+        # Resuming a closed session keeps the notes written so far.
+        session.segments = existing.segments
+        session.sections = existing.sections
+        session.version = existing.version
+        session._cursor = len(existing.segments)
+    _sessions[session_id] = session
+    _sessions.move_to_end(session_id)
+
+    while len(_sessions) > max_sessions:
+        oldest_id = next((sid for sid, s in _sessions.items() if s.closed), None)
+        if oldest_id is None:
+            break
+        del _sessions[oldest_id]
+    return session
+
+
+def get_live_session(session_id: str) -> LiveNotesSession | None:
+    return _sessions.get(session_id)
+
+
+def _collect_sessions():
+    sessions = list(_sessions.values())
+    yield gauge_family("live_notes_sessions", "Live notes sessions held in memory.", [
+        ({"state": "open"}, sum(not s.closed for s in sessions)),
+        ({"state": "closed"}, sum(s.closed for s in sessions)),
+    ])
+    yield gauge_family("live_notes_pending_segments", "Finalized segments not yet formatted.", [
+        ({}, sum(s.pending_segments for s in sessions))
+    ])
+
+
+REGISTRY.add_collector(_collect_sessions)
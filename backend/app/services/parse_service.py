@@ -1,8 +1,9 @@
-import httpx
+from app.config import Settings, get_settings
+from app.services.prompt_budget import ESTIMATOR, budget_for, estimate_tokens, record_usage, split_to_budget
+from app.services.upstream import get_upstream, tls_context
+from app.utils.lazy import lazy_import
 
-from app.config import get_settings
-
-GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent"
+httpx = lazy_import("httpx")
 
 SYSTEM_INSTRUCTION = """You are a lecture formatter. Given a raw transcript of spoken content, reorganise it into a clear, structured lecture document. Use:
 
@@ -14,41 +15,72 @@ SYSTEM_INSTRUCTION = """You are a lecture formatter. Given a raw transcript of s
 
 Output plain text only. No LaTeX, no markdown formatting symbols."""
 
+SYSTEM_INSTRUCTION_INCREMENTAL = """You are a lecture formatter continuing a lecture document that is being written live. You receive the newest stretch of a raw spoken transcript, plus the tail of the transcript that was already formatted for context.
+
+- Format ONLY the new transcript; never repeat content from the already-formatted context
+- Use a section heading only when the new transcript starts a new topic
+- Bullet points for key points
+- Explicitly mark questions (e.g. "Q: ..." or "Question: ...")
+- Remove filler words and repetitions
+- Keep the original meaning and order of ideas
+
+Output plain text only. No LaTeX, no markdown formatting symbols."""
+
+
+# Formatted text carried into the next chunk of a long transcript, like live notes do.
+CHUNK_OVERLAP_CHARS = 600
+
 
 async def parse_transcript(raw_text: str) -> str:
-    """Format raw transcript into a polished lecture using Gemini."""
+    """Format raw transcript into a polished lecture using Gemini.
+
+    A transcript over the ``parse`` prompt budget is formatted in chunks, each
+    continuing from the tail of the previous chunk's output.
+    """
+    settings = get_settings()
+    room = budget_for("parse") - estimate_tokens(SYSTEM_INSTRUCTION_INCREMENTAL) - ESTIMATOR.estimate_chars(CHUNK_OVERLAP_CHARS)
+    chunks = split_to_budget(raw_text, max(room, 1))
+    if len(chunks) == 1:
+        return await _generate(SYSTEM_INSTRUCTION, raw_text, settings, call="parse")
+    formatted: list[str] = []
+    for chunk in chunks:
+        overlap = formatted[-1][-CHUNK_OVERLAP_CHARS:] if formatted else ""
+        formatted.append(await format_transcript_increment(chunk, overlap))
+    return "\n\n".join(formatted)
+
+
+async def format_transcript_increment(new_text: str, overlap_text: str = "") -> str:
+    """Format only the newest transcript segments, using a short overlap for continuity."""
     settings = get_settings()
-    # #region agent log
-    try:
-        import json as _j
-        with open("/Users/angoos/Documents/pocketprof/.cursor/debug.log", "a") as _f:
-            _f.write(_j.dumps({"location":"parse_service:pre_request","message":"Calling Gemini","data":{"url":GEMINI_URL,"text_len":len(raw_text),"has_key":bool(settings.GEMINI_API_KEY)},"hypothesisId":"H1,H2","timestamp":__import__("time").time()*1000}) + "\n")
-    except Exception:
-        pass
-    # #endregion
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.post(
-            GEMINI_URL,
-            headers={
-                "x-goog-api-key": settings.GEMINI_API_KEY,
-                "Content-Type": "application/json",
-            },
-            json={
-                "systemInstruction": {"parts": [{"text": SYSTEM_INSTRUCTION}]},
-                "contents": [{"parts": [{"text": raw_text}]}],
-            },
-        )
-        # #region agent log
-        try:
-            import json as _j
-            err_body = response.text[:500] if not response.is_success else ""
-            with open("/Users/angoos/Documents/pocketprof/.cursor/debug.log", "a") as _f:
-                _f.write(_j.dumps({"location":"parse_service:response","message":"Gemini response","data":{"status":response.status_code,"reason":getattr(response,"reason_phrase",""),"body_preview":err_body},"hypothesisId":"H1","timestamp":__import__("time").time()*1000}) + "\n")
-        except Exception:
-            pass
-        # #endregion
-        response.raise_for_status()
-        data = response.json()
+    user_text = f"NEW TRANSCRIPT:\n{new_text.strip()}"
+    if overlap_text.strip():
+        user_text = f"ALREADY FORMATTED (context only):\n{overlap_text.strip()}\n\n{user_text}"
+    return await _generate(SYSTEM_INSTRUCTION_INCREMENTAL, user_text, settings, call="notes")
+
+
+async def _generate(system_instruction: str, text: str, settings: Settings, call: str = "parse") -> str:
+    """Send one system + user prompt to Gemini and return the first text part."""
+    chars = len(system_instruction) + len(text)
+    estimated = ESTIMATOR.estimate_chars(chars)
+
+    async def attempt(timeout: float) -> dict:
+        async with httpx.AsyncClient(timeout=timeout, verify=tls_context()) as client:
+            response = await client.post(
+                f"{settings.GEMINI_MODEL_URL}:generateContent",
+                headers={
+                    "x-goog-api-key": settings.GEMINI_API_KEY,
+                    "Content-Type": "application/json",
+                },
+                json={
+                    "systemInstruction": {"parts": [{"text": system_instruction}]},
+                    "contents": [{"parts": [{"text": text}]}],
+                },
+            )
+            response.raise_for_status()
+            return response.json()
+
+    data = await get_upstream("gemini").call(attempt, timeout_s=60.0, cost_tokens=estimated)
+    record_usage(call, chars, estimated, data)
     candidates = data.get("candidates", [])
     if not candidates:
         raise ValueError("No response from Gemini")
@@ -0,0 +1,182 @@
+"""Token budgets for Gemini text prompts.
+
+Prompts are built from ``Section``s and fitted to a per-call token budget
+before they are sent. ``DEFAULT_BUDGETS`` sets the budgets, and
+``PROMPT_BUDGETS`` overrides them. An oversized deck, context or transcript is
+therefore trimmed locally. Otherwise it would come back as a slow response,
+truncated JSON or a 429. Required sections are never cut: the instructions, the
+question, the script to align. Optional sections are trimmed lowest priority
+first, and sections that share a priority shrink in proportion to their size.
+
+Token counts come from ``TokenEstimator``, which divides the character count by
+a characters-per-token ratio. ``record_usage`` calibrates that ratio against
+``usageMetadata.promptTokenCount`` in Gemini's responses. The same estimate is
+charged to the upstream's tokens-per-minute bucket (``GEMINI_TOKENS_PER_MIN``).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+import math
+import re
+from typing import Iterable
+
+from app.config import get_settings
+from app.utils.metrics import counter, histogram
+
+DEFAULT_BUDGETS = {"qa": 8000, "chat": 16000, "align": 32000, "parse": 16000}
+MIN_SECTION_TOKENS = 32
+TRIM_MARKER = " […]"
+
+# Preferred split points, best first: paragraph breaks, then sentence ends.
+_BREAK_RES = (re.compile(r"\n\s*\n"), re.compile(r"(?<=[.!?])\s+"))
+
+PROMPT_TOKENS = counter(
+    "gemini_prompt_tokens",
+    "Prompt tokens per Gemini call kind, as estimated locally and as reported by Gemini.",
+    ("call", "source"),
+)
+PROMPT_TRIMMED = counter(
+    "prompt_sections_trimmed",
+    "Prompt sections shortened or dropped to fit the call's token budget.",
+    ("call",),
+)
+ESTIMATE_RATIO = histogram(
+    "prompt_token_estimate_ratio",
+    "Reported prompt tokens divided by the local estimate, per call kind.",
+    ("call",),
+    buckets=(0.5, 0.75, 0.9, 1.0, 1.1, 1.25, 1.5, 2.0),
+)
+
+
+class TokenEstimator:
+    """Characters-per-token estimate, nudged toward each reported usage."""
+
+    def __init__(self, chars_per_token: float = 4.0, weight: float = 0.1, bounds: tuple[float, float] = (1.5, 8.0)) -> None:
+        self.chars_per_token = chars_per_token
+        self.weight = weight
+        self.bounds = bounds
+        self.samples = 0
+
+    def estimate(self, text: str) -> int:
+        return self.estimate_chars(len(text))
+
+    def estimate_chars(self, chars: int) -> int:
+        return math.ceil(chars / self.chars_per_token) if chars > 0 else 0
+
+    def observe(self, chars: int, actual_tokens: int) -> None:
+        if chars <= 0 or actual_tokens <= 0:
+            return
+        ratio = chars / actual_tokens
+        low, high = self.bounds
+        self.chars_per_token = min(max(self.chars_per_token + self.weight * (ratio - self.chars_per_token), low), high)
+        self.samples += 1
+
+
+ESTIMATOR = TokenEstimator()
+
+
+def estimate_tokens(text: str) -> int:
+    return ESTIMATOR.estimate(text)
+
+
+@dataclass(frozen=True)
+class Section:
+    text: str
+    priority: int = 0  # higher survives longer
+    required: bool = False
+    keep: str = "head"  # the end that survives trimming: "head" or "tail"
+    trimmed: bool = False
+
+
+def budget_for(call: str) -> int:
+    return {**DEFAULT_BUDGETS, **get_settings().PROMPT_BUDGETS}.get(call, DEFAULT_BUDGETS["chat"])
+
+
+def fit_sections(sections: list[Section], budget_tokens: int, call: str = "") -> list[Section]:
+    """Trim optional sections until the total fits ``budget_tokens``.
+
+    Returns the sections in their original order. A dropped section comes back
+    with empty text. Required sections are returned unchanged even if they
+    alone exceed the budget.
+    """
+    fitted = list(sections)
+    costs = [estimate_tokens(section.text) for section in fitted]
+    over = sum(costs) - budget_tokens
+    for priority in sorted({section.priority for section in fitted if not section.required}):
+        if over <= 0:
+            break
+        level = [i for i, section in enumerate(fitted) if not section.required and section.priority == priority]
+        level_cost = sum(costs[i] for i in level)
+        if not level_cost:
+            continue
+        keep = max(level_cost - over, 0)
+        for i in level:
+            allowance = costs[i] * keep // level_cost
+            text = _trim(fitted[i], allowance) if allowance >= MIN_SECTION_TOKENS else ""
+            if text == fitted[i].text:
+                continue
+            over -= costs[i] - estimate_tokens(text)
+            fitted[i] = replace(fitted[i], text=text, trimmed=True)
+            PROMPT_TRIMMED.labels(call or "other").inc()
+    return fitted
+
+
+def split_to_budget(text: str, budget_tokens: int) -> list[str]:
+    """Split ``text`` at paragraph or sentence breaks into pieces of at most ``budget_tokens``."""
+    if estimate_tokens(text) <= budget_tokens:
+        return [text]
+    max_chars = max(int(budget_tokens * ESTIMATOR.chars_per_token), 1)
+    pieces: list[str] = []
+    start = 0
+    while len(text) - start > max_chars:
+        end = start + max_chars
+        cut = end
+        for pattern in _BREAK_RES:
+            breaks = [match.end() for match in pattern.finditer(text, start + max_chars // 2, end)]
+            if breaks:
+                cut = breaks[-1]
+                break
+        pieces.append(text[start:cut].strip())
+        start = cut
+    pieces.append(text[start:].strip())
+    return [piece for piece in pieces if piece]
+
+
+def body_chars(body: dict) -> int:
+    """Characters of prompt text in a generateContent body (inline images are not counted)."""
+    return sum(len(part.get("text", "")) for part in _parts(body))
+
+
+def record_usage(call: str, chars: int, estimated: int, data: dict) -> None:
+    """Compare the estimate with Gemini's ``usageMetadata`` and recalibrate."""
+    PROMPT_TOKENS.labels(call, "estimated").inc(estimated)
+    actual = (data.get("usageMetadata") or {}).get("promptTokenCount")
+    if not actual:
+        return
+    PROMPT_TOKENS.labels(call, "actual").inc(actual)
+    if estimated:
+        ESTIMATE_RATIO.labels(call).observe(actual / estimated)
+    ESTIMATOR.observe(chars, actual)
+
+
+def _parts(body: dict) -> Iterable[dict]:
+    yield from body.get("systemInstruction", {}).get("parts", [])
+    for content in body.get("contents", []):
+        yield from content.get("parts", [])
+
+
+def _trim(section: Section, tokens: int) -> str:
+    chars = int(tokens * ESTIMATOR.chars_per_token) - len(TRIM_MARKER)
+    text = section.text
+    if chars >= len(text):
+        return text
+    if chars <= 0:
+        return ""
+    if section.keep == "tail":
+        kept = text[-chars:]
+        space = kept.find(" ")
+        return TRIM_MARKER.strip() + " " + (kept[space + 1:] if 0 <= space < chars // 4 else kept)
+    kept = text[:chars]
+    space = kept.rfind(" ")
+    return (kept[:space] if space > chars * 3 // 4 else kept) + TRIM_MARKER
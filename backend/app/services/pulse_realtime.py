@@ -1,23 +1,280 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
 import json
 import logging
+import re
+import time
+from typing import Any, Callable
 
 import websockets
+from fastapi import WebSocket, WebSocketDisconnect
 
 from app.config import get_settings
+from app.services.smallest_lightning_client import STREAMED_BYTES
+from app.services.upstream import get_upstream, tls_context
+from app.utils.metrics import REGISTRY, gauge_family
 
 logger = logging.getLogger(__name__)
 
-PULSE_WS_URL = "wss://waves-api.smallest.ai/api/v1/pulse/get_text"
+PULSE_SAMPLE_RATE = 16000
+PULSE_BYTES_PER_SECOND = PULSE_SAMPLE_RATE * 2  # linear16 mono
+
+# Cheap checks on raw upstream frames so only final transcripts are JSON-decoded.
+_IS_LAST_RE = re.compile(r'"is_last"\s*:\s*true')
+_IS_FINAL_RE = re.compile(r'"is_final"\s*:\s*true')
+
+_END = object()
+
+OVERFLOW_POLICIES = ("drop_oldest", "block")
 
 
 async def create_pulse_connection():
     """Create a WebSocket connection to Smallest Pulse real-time API."""
     settings = get_settings()
-    params = "language=en&encoding=linear16&sample_rate=16000"
-    url = f"{PULSE_WS_URL}?{params}"
-    return await websockets.connect(
-        url,
-        additional_headers={"Authorization": f"Bearer {settings.SMALLEST_API_KEY}"},
-        ping_interval=20,
-        ping_timeout=20,
+    params = f"language=en&encoding=linear16&sample_rate={PULSE_SAMPLE_RATE}"
+    url = f"{settings.PULSE_WS_URL}?{params}"
+    return await get_upstream("pulse").call(
+        lambda timeout: websockets.connect(
+            url,
+            additional_headers={"Authorization": f"Bearer {settings.SMALLEST_API_KEY}"},
+            ping_interval=20,
+            ping_timeout=20,
+            open_timeout=timeout,
+            ssl=tls_context() if url.startswith("wss://") else None,
+        ),
+        timeout_s=10.0,
     )
+
+
+@dataclass
+class LiveProxyMetrics:
+    """Per-session flow counters for the Pulse live proxy."""
+
+    session_id: str
+    started_at: float = field(default_factory=time.perf_counter)
+    frames_in: int = 0
+    bytes_in: int = 0
+    frames_out: int = 0
+    bytes_out: int = 0
+    dropped_frames: int = 0
+    dropped_bytes: int = 0
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    queued_bytes: int = 0
+    upstream_messages: int = 0
+    lag_events: int = 0
+
+    @property
+    def lag_ms(self) -> float:
+        return self.queued_bytes / PULSE_BYTES_PER_SECOND * 1000.0
+
+    def snapshot(self) -> dict[str, Any]:
+        elapsed = max(time.perf_counter() - self.started_at, 1e-6)
+        return {
+            "session_id": self.session_id,
+            "elapsed_s": round(elapsed, 2),
+            "frames_in": self.frames_in,
+            "bytes_in": self.bytes_in,
+            "frames_out": self.frames_out,
+            "bytes_out": self.bytes_out,
+            "dropped_frames": self.dropped_frames,
+            "dropped_bytes": self.dropped_bytes,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "lag_ms": round(self.lag_ms, 1),
+            "upstream_messages": self.upstream_messages,
+            "lag_events": self.lag_events,
+            "in_kbps": round(self.bytes_in * 8 / elapsed / 1000, 1),
+            "out_kbps": round(self.bytes_out * 8 / elapsed / 1000, 1),
+        }
+
+
+_active_proxies: dict[str, "PulseLiveProxy"] = {}
+
+
+def live_proxy_metrics() -> list[dict[str, Any]]:
+    """Snapshot flow metrics for every live proxy session currently running."""
+    return [proxy.metrics.snapshot() for proxy in list(_active_proxies.values())]
+
+
+def _collect_live_proxies():
+    metrics = [proxy.metrics for proxy in list(_active_proxies.values())]
+    yield gauge_family("pulse_live_sessions", "Active /pulse/live WebSocket sessions.", [({}, len(metrics))])
+    yield gauge_family("pulse_live_queued_frames", "Audio frames waiting to be forwarded to Pulse.", [
+        ({}, sum(m.queue_depth for m in metrics))
+    ])
+    yield gauge_family("pulse_live_max_lag_seconds", "Largest forwarding lag across live sessions.", [
+        ({}, max((m.lag_ms for m in metrics), default=0.0) / 1000.0)
+    ])
+    yield gauge_family("pulse_live_dropped_frames", "Frames dropped by drop_oldest in active sessions.", [
+        ({}, sum(m.dropped_frames for m in metrics))
+    ])
+
+
+REGISTRY.add_collector(_collect_live_proxies)
+
+
+class PulseLiveProxy:
+    """Bounded, coalescing relay between a browser WebSocket and Pulse.
+
+    Browser audio lands on a bounded queue. A single pump drains it, merging
+    whatever is queued into frames of up to ``frame_ms`` of audio, so a slow
+    upstream gets fewer, larger sends instead of an invisible backlog. When the
+    queue is full, ``drop_oldest`` discards the stalest audio while ``block``
+    stops reading from the browser so TCP pushes back on the client. Either
+    way the client gets a ``backpressure`` event once lag passes ``lag_warn_ms``.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        pulse_ws: Any,
+        session_id: str,
+        on_final: Callable[[str], None] | None = None,
+        frame_ms: int = 100,
+        max_queue_frames: int = 50,
+        overflow_policy: str = "drop_oldest",
+        lag_warn_ms: int = 1000,
+    ) -> None:
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self._websocket = websocket
+        self._pulse_ws = pulse_ws
+        self._on_final = on_final
+        self._frame_bytes = max(PULSE_BYTES_PER_SECOND * frame_ms // 1000, 2)
+        self._max_queue_frames = max(max_queue_frames, 1)
+        self._overflow_policy = overflow_policy
+        self._lag_warn_ms = lag_warn_ms
+        self._queue: deque[Any] = deque()
+        self._has_items = asyncio.Event()
+        self._has_space = asyncio.Event()
+        self._has_space.set()
+        self._send_lock = asyncio.Lock()
+        self._last_lag_notice = 0.0
+        self.metrics = LiveProxyMetrics(session_id=session_id)
+
+    async def run(self) -> None:
+        """Relay until Pulse sends ``is_last`` or either side goes away."""
+        _active_proxies[self.metrics.session_id] = self
+        upstream = asyncio.create_task(self._read_upstream())
+        pump = asyncio.create_task(self._pump_upstream())
+        client = asyncio.create_task(self._read_client())
+        try:
+            await upstream
+        finally:
+            for task in (pump, client):
+                task.cancel()
+            await asyncio.gather(pump, client, return_exceptions=True)
+            await self._pulse_ws.close()
+            _active_proxies.pop(self.metrics.session_id, None)
+            STREAMED_BYTES.labels("pulse_live_in").inc(self.metrics.bytes_in)
+            STREAMED_BYTES.labels("pulse_live_out").inc(self.metrics.bytes_out)
+            logger.info("Pulse live session complete: %s", self.metrics.snapshot())
+
+    async def _read_client(self) -> None:
+        try:
+            while True:
+                msg = await self._websocket.receive()
+                if msg.get("type") == "websocket.disconnect":
+                    break
+                if msg.get("bytes"):
+                    await self._enqueue(msg["bytes"])
+                elif msg.get("text"):
+                    try:
+                        obj = json.loads(msg["text"])
+                    except (json.JSONDecodeError, TypeError):
+                        continue
+                    if isinstance(obj, dict) and obj.get("type") == "end":
+                        break
+        except WebSocketDisconnect:
+            pass
+        self._queue.append(_END)
+        self._has_items.set()
+
+    async def _enqueue(self, data: bytes) -> None:
+        metrics = self.metrics
+        metrics.frames_in += 1
+        metrics.bytes_in += len(data)
+        while len(self._queue) >= self._max_queue_frames:
+            if self._overflow_policy == "block":
+                self._has_space.clear()
+                await self._has_space.wait()
+                continue
+            dropped = self._queue.popleft()
+            metrics.dropped_frames += 1
+            metrics.dropped_bytes += len(dropped)
+            metrics.queued_bytes -= len(dropped)
+        self._queue.append(data)
+        metrics.queued_bytes += len(data)
+        metrics.queue_depth = len(self._queue)
+        metrics.max_queue_depth = max(metrics.max_queue_depth, metrics.queue_depth)
+        self._has_items.set()
+        if metrics.lag_ms >= self._lag_warn_ms:
+            await self._notify_lag()
+
+    async def _pump_upstream(self) -> None:
+        metrics = self.metrics
+        try:
+            while True:
+                if not self._queue:
+                    self._has_items.clear()
+                    await self._has_items.wait()
+                    continue
+                if self._queue[0] is _END:
+                    await self._pulse_ws.send(json.dumps({"type": "end"}))
+                    return
+
+                frame = bytearray(self._queue.popleft())
+                while self._queue and self._queue[0] is not _END and len(frame) + len(self._queue[0]) <= self._frame_bytes:
+                    frame += self._queue.popleft()
+                metrics.queued_bytes -= len(frame)
+                metrics.queue_depth = len(self._queue)
+                self._has_space.set()
+
+                await self._pulse_ws.send(bytes(frame))
+                metrics.frames_out += 1
+                metrics.bytes_out += len(frame)
+        except websockets.ConnectionClosed:
+            logger.warning("Pulse closed while forwarding audio for session %s", metrics.session_id)
+
+    async def _read_upstream(self) -> None:
+        try:
+            async for raw in self._pulse_ws:
+                self.metrics.upstream_messages += 1
+                if isinstance(raw, bytes):
+                    raw = raw.decode("utf-8", errors="ignore")
+                await self._send_client(raw)
+                if self._on_final is not None and _IS_FINAL_RE.search(raw):
+                    try:
+                        obj = json.loads(raw)
+                    except json.JSONDecodeError:
+                        obj = {}
+                    if obj.get("transcript"):
+                        self._on_final(obj["transcript"])
+                if _IS_LAST_RE.search(raw):
+                    break
+        except Exception as e:
+            logger.exception("Error forwarding from Pulse: %s", e)
+
+    async def _notify_lag(self) -> None:
+        now = time.perf_counter()
+        if now - self._last_lag_notice < 1.0:
+            return
+        self._last_lag_notice = now
+        self.metrics.lag_events += 1
+        event = {
+            "type": "backpressure",
+            "lag_ms": round(self.metrics.lag_ms, 1),
+            "queue_depth": self.metrics.queue_depth,
+            "dropped_frames": self.metrics.dropped_frames,
+            "policy": self._overflow_policy,
+        }
+        try:
+            await self._send_client(json.dumps(event))
+        except Exception:
+            logger.debug("Could not deliver backpressure notice", exc_info=True)
+
+    async def _send_client(self, text: str) -> None:
+        async with self._send_lock:
+            await self._websocket.send_text(text)
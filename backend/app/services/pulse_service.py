@@ -1,9 +1,19 @@
-import httpx
+import hashlib
 
-from app.config import get_settings
-from app.models.base import PulseTranscriptionResponse, ServiceResponse
+from fastapi import UploadFile
 
-PULSE_URL = "https://waves-api.smallest.ai/api/v1/pulse/get_text"
+from app.config import Settings, get_settings
+from app.models.base import ParseResponse, PulseTranscriptionResponse, ServiceResponse
+from app.services.parse_service import parse_transcript
+from app.services.shared_cache import get_shared_cache
+from app.services.upstream import get_upstream, tls_context
+from app.utils.lazy import lazy_import
+
+httpx = lazy_import("httpx")
+
+PULSE_MODEL = "pulse"
+PULSE_LANGUAGE = "en"
+UPLOAD_CHUNK_SIZE = 64 * 1024
 
 
 async def stream_pulse(payload: dict) -> ServiceResponse:
@@ -11,26 +21,53 @@ async def stream_pulse(payload: dict) -> ServiceResponse:
     return ServiceResponse(message="Pulse endpoint ready")
 
 
-async def transcribe_audio(audio_bytes: bytes, content_type: str) -> PulseTranscriptionResponse:
-    """Send audio to Smallest Pulse API and return transcription."""
+async def read_audio_upload(upload: UploadFile) -> tuple[bytes, str]:
+    """Read an uploaded recording in chunks, hashing it as it streams in."""
+    digest = hashlib.blake2b(digest_size=20)
+    chunks: list[bytes] = []
+    while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+        digest.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), digest.hexdigest()
+
+
+async def transcribe_audio(
+    audio_bytes: bytes, content_type: str, audio_digest: str | None = None
+) -> PulseTranscriptionResponse:
+    """Return the Pulse transcription for a recording, reusing cached results for identical audio."""
     content_type = content_type or "audio/webm"
     settings = get_settings()
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        response = await client.post(
-            PULSE_URL,
-            params={"model": "pulse", "language": "en"},
-            headers={
-                "Authorization": f"Bearer {settings.SMALLEST_API_KEY}",
-                "Content-Type": content_type,
-            },
-            content=audio_bytes,
-        )
-        response.raise_for_status()
-        data = response.json()
-    transcription = data.get("transcription", "")
+    if audio_digest is None:
+        audio_digest = hashlib.blake2b(audio_bytes, digest_size=20).hexdigest()
+    cache = get_shared_cache("transcription", settings.TRANSCRIPTION_CACHE_TTL_S, settings)
+    transcription = await cache.get_or_compute_json(
+        cache.key(audio_digest, PULSE_LANGUAGE, PULSE_MODEL),
+        lambda: _request_transcription(audio_bytes, content_type, settings),
+    )
     return PulseTranscriptionResponse(transcription=transcription)
 
 
+async def _request_transcription(audio_bytes: bytes, content_type: str, settings: Settings) -> str:
+    """Send audio to Smallest Pulse API and return the raw transcription."""
+
+    async def attempt(timeout: float) -> dict:
+        async with httpx.AsyncClient(timeout=timeout, verify=tls_context()) as client:
+            response = await client.post(
+                settings.PULSE_API_URL,
+                params={"model": PULSE_MODEL, "language": PULSE_LANGUAGE},
+                headers={
+                    "Authorization": f"Bearer {settings.SMALLEST_API_KEY}",
+                    "Content-Type": content_type,
+                },
+                content=audio_bytes,
+            )
+            response.raise_for_status()
+            return response.json()
+
+    data = await get_upstream("pulse").call(attempt, timeout_s=120.0)
+    return data.get("transcription", "")
+
+
 def _escape_latex(text: str) -> str:
     """Escape special LaTeX characters in plain text."""
     replacements = [
@@ -50,11 +87,13 @@ def _escape_latex(text: str) -> str:
     return text
 
 
-async def transcribe_to_latex(audio_bytes: bytes, content_type: str) -> "PulseTranscriptionLatexResponse":
+async def transcribe_to_latex(
+    audio_bytes: bytes, content_type: str, audio_digest: str | None = None
+) -> "PulseTranscriptionLatexResponse":
     """Transcribe audio via Pulse and return as a LaTeX document."""
     from app.models.base import PulseTranscriptionLatexResponse
 
-    result = await transcribe_audio(audio_bytes, content_type)
+    result = await transcribe_audio(audio_bytes, content_type, audio_digest)
     escaped = _escape_latex(result.transcription)
     paragraphs = [p.strip() for p in escaped.split("\n\n") if p.strip()]
     if not paragraphs:
@@ -69,3 +108,13 @@ async def transcribe_to_latex(audio_bytes: bytes, content_type: str) -> "PulseTr
 \\end{{document}}
 """
     return PulseTranscriptionLatexResponse(latex=latex)
+
+
+async def transcribe_to_notes(
+    audio_bytes: bytes, content_type: str, audio_digest: str | None = None
+) -> ParseResponse:
+    """Transcribe audio via Pulse and format the transcript into lecture notes."""
+    result = await transcribe_audio(audio_bytes, content_type, audio_digest)
+    if not result.transcription.strip():
+        return ParseResponse(formatted="")
+    return ParseResponse(formatted=await parse_transcript(result.transcription))
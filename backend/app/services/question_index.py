@@ -0,0 +1,252 @@
+"""Reuse slide chat answers for near-duplicate questions.
+
+During a lecture, many students ask the same thing in different words.
+``QuestionIndex`` keeps recently answered queries per deck. The deck is keyed
+by a hash of its slides. Each query is stored as a hashed vector of word
+unigrams and character trigrams, so no embedding service is involved. A new
+query whose cosine similarity to a stored one reaches ``CHAT_REUSE_THRESHOLD``
+gets that answer and ``suggested_slide`` straight away. Queries still waiting
+for Gemini are matchable too, so a burst of rephrasings shares one upstream
+call.
+
+Some differences always block a match:
+* any number or single-letter symbol ("x squared" vs "y squared");
+* a different current slide, when the query points at it ("this slide").
+Queries with fewer than two content words ("why?") depend too much on the
+conversation to reuse, so they always go to Gemini. ``chat_with_slides`` only
+consults the index for queries without history, because a follow-up ("what
+about the second one?") means something different in every conversation.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import hashlib
+import json
+import math
+import re
+import time
+from typing import Any, Awaitable, Callable
+
+from app.config import get_settings
+from app.models.base import SlideContext
+from app.utils.metrics import REGISTRY, counter, gauge_family
+
+DIMENSIONS = 1 << 18
+TRIGRAM_WEIGHT = 0.5
+MIN_CONTENT_WORDS = 2
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_CONTRACTIONS = {
+    "what's": "what is", "whats": "what is", "how's": "how is", "where's": "where is",
+    "why's": "why is", "that's": "that is", "it's": "it is", "isn't": "is not",
+    "aren't": "are not", "doesn't": "does not", "don't": "do not", "can't": "cannot",
+}
+_FILLER = frozenset({
+    "a", "an", "the", "is", "are", "was", "were", "be", "do", "does", "um", "uh", "so", "just",
+    "really", "actually", "like", "please", "can", "could", "would", "you", "me", "i", "we", "to",
+    "explain", "tell", "again",
+})
+_DEICTIC = frozenset({"this", "these", "here", "current", "previous", "next", "above", "below"})
+
+CHAT_REUSE = counter(
+    "chat_question_reuse",
+    "Slide chat queries by reuse outcome: hit (answered), joined (in flight), miss or skipped.",
+    ("result",),
+)
+
+
+@dataclass
+class _Features:
+    vector: dict[int, float]
+    exact: frozenset[str]
+    deictic: bool
+
+
+@dataclass
+class _Entry:
+    query: str
+    features: _Features
+    current_slide: int
+    task: asyncio.Future
+    created_at: float = field(default_factory=time.monotonic)
+    hits: int = 0
+
+
+@dataclass
+class _Deck:
+    entries: list[_Entry] = field(default_factory=list)
+
+
+class QuestionIndex:
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        ttl_s: float = 900.0,
+        max_entries: int = 256,
+        max_decks: int = 256,
+    ) -> None:
+        self.threshold = threshold
+        self.ttl_s = ttl_s
+        self.max_entries = max(max_entries, 1)
+        self.max_decks = max(max_decks, 1)
+        self._decks: OrderedDict[str, _Deck] = OrderedDict()
+        self.counts = {"hit": 0, "joined": 0, "miss": 0, "skipped": 0}
+
+    async def get_or_answer(
+        self,
+        deck_id: str,
+        query: str,
+        current_slide: int,
+        answer: Callable[[], Awaitable[dict]],
+        reusable: Callable[[dict], bool] = lambda result: True,
+    ) -> dict:
+        """Return a stored answer for a near-duplicate of ``query``, or call ``answer`` and store it.
+
+        A reused result is a copy marked with ``"reused": True``. Results that
+        fail ``reusable`` are returned but never offered to later queries.
+        """
+        features = _features(query)
+        if features is None:
+            self._count("skipped")
+            return await answer()
+
+        deck = self._decks.get(deck_id)
+        if deck is None:
+            deck = self._decks[deck_id] = _Deck()
+            while len(self._decks) > self.max_decks:
+                self._decks.popitem(last=False)
+        self._decks.move_to_end(deck_id)
+        match = self._match(deck, features, current_slide)
+        if match is not None:
+            self._count("joined" if not match.task.done() else "hit")
+            match.hits += 1
+            return {**await asyncio.shield(match.task), "reused": True}
+
+        self._count("miss")
+        entry = _Entry(query, features, current_slide, asyncio.ensure_future(answer()))
+        deck.entries.append(entry)
+        if len(deck.entries) > self.max_entries:
+            del deck.entries[0]
+        # Shield so a caller disconnecting does not cancel the answer others joined.
+        # A failed answer is pruned by the next lookup.
+        result = await asyncio.shield(entry.task)
+        if not reusable(result):
+            _discard(deck, entry)
+        return result
+
+    def stats(self) -> dict[str, Any]:
+        lookups = sum(self.counts.values()) - self.counts["skipped"]
+        return {
+            **self.counts,
+            "decks": len(self._decks),
+            "entries": sum(len(deck.entries) for deck in self._decks.values()),
+            "threshold": self.threshold,
+            "hit_ratio": round((self.counts["hit"] + self.counts["joined"]) / lookups, 3) if lookups else 0.0,
+        }
+
+    def _match(self, deck: _Deck, features: _Features, current_slide: int) -> _Entry | None:
+        cutoff = time.monotonic() - self.ttl_s
+        deck.entries[:] = [
+            entry for entry in deck.entries if entry.created_at >= cutoff and not _failed(entry.task)
+        ]
+        best, best_score = None, self.threshold
+        for entry in deck.entries:
+            if entry.features.exact != features.exact:
+                continue
+            if (features.deictic or entry.features.deictic) and entry.current_slide != current_slide:
+                continue
+            score = _cosine(features.vector, entry.features.vector)
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def _count(self, result: str) -> None:
+        self.counts[result] += 1
+        CHAT_REUSE.labels(result).inc()
+
+
+def deck_id(context: list[SlideContext]) -> str:
+    key = json.dumps(
+        [(s.slide_number, s.description, s.text_content) for s in context], separators=(",", ":")
+    )
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def similarity(a: str, b: str) -> float:
+    """Cosine similarity of two queries' vectors, 0.0 when either is too short to compare."""
+    fa, fb = _features(a), _features(b)
+    if fa is None or fb is None or fa.exact != fb.exact:
+        return 0.0
+    return _cosine(fa.vector, fb.vector)
+
+
+def _features(query: str) -> _Features | None:
+    words: list[str] = []
+    for word in _WORD_RE.findall(query.lower().replace("’", "'")):
+        words.extend(_CONTRACTIONS.get(word, word).split())
+    content = [_stem(word) for word in words if word not in _FILLER]
+    if sum(len(word) > 1 for word in content) < MIN_CONTENT_WORDS:
+        return None
+
+    vector: dict[int, float] = {}
+    for word in content:
+        bucket = hash(word) & (DIMENSIONS - 1)
+        vector[bucket] = vector.get(bucket, 0.0) + 1.0
+    text = f" {' '.join(content)} "
+    for i in range(len(text) - 2):
+        bucket = hash(text[i:i + 3]) & (DIMENSIONS - 1)
+        vector[bucket] = vector.get(bucket, 0.0) + TRIGRAM_WEIGHT
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    return _Features(
+        {bucket: value / norm for bucket, value in vector.items()},
+        frozenset(word for word in content if len(word) == 1 or any(c.isdigit() for c in word)),
+        any(word in _DEICTIC for word in words),
+    )
+
+
+def _stem(word: str) -> str:
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def _cosine(a: dict[int, float], b: dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(bucket, 0.0) for bucket, value in a.items())
+
+
+def _failed(task: asyncio.Future) -> bool:
+    return task.done() and (task.cancelled() or task.exception() is not None)
+
+
+def _discard(deck: _Deck, entry: _Entry) -> None:
+    if entry in deck.entries:
+        deck.entries.remove(entry)
+
+
+_index: QuestionIndex | None = None
+
+
+def get_question_index() -> QuestionIndex:
+    global _index
+    if _index is None:
+        settings = get_settings()
+        _index = QuestionIndex(
+            threshold=settings.CHAT_REUSE_THRESHOLD,
+            ttl_s=settings.CHAT_REUSE_TTL_S,
+            max_entries=settings.CHAT_REUSE_MAX_ENTRIES,
+        )
+    return _index
+
+
+def _collect_reuse():
+    if _index is None:
+        return
+    yield gauge_family("chat_question_reuse_hit_ratio", "Share of indexable slide chat queries answered by reuse.", [
+        ({}, _index.stats()["hit_ratio"])
+    ])
+
+
+REGISTRY.add_collector(_collect_reuse)
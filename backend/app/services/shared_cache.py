@@ -0,0 +1,66 @@
+"""Settings-selected cache backend shared by transcripts, answers, slide analyses and audio.
+
+One backend is built per process from ``CACHE_BACKEND``; with ``sqlite`` or
+``redis`` every uvicorn worker sees the same entries. Each caller gets a
+namespaced ``SharedCache`` with its own TTL and hit/miss stats.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from app.config import Settings, get_settings
+from app.utils.cache_backends import (
+    CacheBackend,
+    MemoryBackend,
+    RedisBackend,
+    SharedCache,
+    SQLiteBackend,
+)
+from app.utils.metrics import register_cache_stats
+
+_backend: CacheBackend | None = None
+_caches: dict[str, SharedCache] = {}
+
+
+def create_backend(settings: Settings) -> CacheBackend:
+    kind = settings.CACHE_BACKEND.lower()
+    if kind == "memory":
+        return MemoryBackend(settings.CACHE_MAX_ENTRIES, settings.CACHE_MAX_BYTES)
+    if kind == "sqlite":
+        return SQLiteBackend(settings.CACHE_SQLITE_PATH, settings.CACHE_MAX_ENTRIES, settings.CACHE_MAX_BYTES)
+    if kind == "redis":
+        return RedisBackend(settings.CACHE_REDIS_URL)
+    raise ValueError(f"Unknown CACHE_BACKEND {settings.CACHE_BACKEND!r}; expected memory, sqlite or redis")
+
+
+def get_cache_backend(settings: Settings | None = None) -> CacheBackend:
+    global _backend
+    if _backend is None:
+        _backend = create_backend(settings or get_settings())
+        register_cache_stats(f"{_backend.kind}_backend", _backend.stats)
+    return _backend
+
+
+def get_shared_cache(namespace: str, ttl_s: float | None = None, settings: Settings | None = None) -> SharedCache:
+    """Return the ``SharedCache`` for ``namespace``, creating the process backend on first use."""
+    cache = _caches.get(namespace)
+    if cache is None:
+        settings = settings or get_settings()
+        ttl = ttl_s if ttl_s is not None else settings.CACHE_DEFAULT_TTL_S
+        cache = _caches[namespace] = SharedCache(get_cache_backend(settings), namespace, ttl)
+        register_cache_stats(namespace, cache.stats)
+    return cache
+
+
+def shared_cache_stats() -> dict[str, Any]:
+    return {namespace: cache.stats() for namespace, cache in _caches.items()}
+
+
+async def close_shared_caches() -> None:
+    """Release backend connections (app shutdown, tests)."""
+    global _backend
+    backend, _backend = _backend, None
+    _caches.clear()
+    if backend is not None:
+        await backend.close()
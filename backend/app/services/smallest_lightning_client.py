@@ -7,9 +7,14 @@ import logging
 import time
 from typing import Any, AsyncIterator
 
-import httpx
-
 from app.config import Settings
+from app.services.upstream import UPSTREAM_TTFB, UpstreamError, get_upstream, parse_retry_after, tls_context
+from app.utils.lazy import lazy_import
+from app.utils.metrics import counter
+
+httpx = lazy_import("httpx")
+
+STREAMED_BYTES = counter("streamed_bytes", "Audio bytes relayed to clients, per stream kind.", ("stream",))
 
 logger = logging.getLogger(__name__)
 
@@ -26,9 +31,22 @@ class LightningStreamMetrics:
 class LightningClientError(Exception):
     """Typed error wrapper for upstream Lightning API failures."""
 
-    def __init__(self, message: str, status_code: int | None = None) -> None:
+    def __init__(
+        self,
+        message: str,
+        status_code: int | None = None,
+        retry_after: float | None = None,
+    ) -> None:
         super().__init__(message)
         self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def _record_first_byte(metrics: LightningStreamMetrics) -> None:
+    metrics.first_byte_ts = time.perf_counter()
+    ttfb_s = metrics.first_byte_ts - metrics.request_start_ts
+    metrics.ttfb_ms = ttfb_s * 1000.0
+    UPSTREAM_TTFB.labels("lightning").observe(ttfb_s)
 
 
 class SmallestLightningClient:
@@ -71,7 +89,7 @@ class SmallestLightningClient:
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
         }
-        logger.info(
+        logger.debug(
             "Lightning request prepared: url=%s, key_len=%s, has_voice_id=%s",
             self._settings.LIGHTNING_API_URL,
             len(api_key),
@@ -79,49 +97,70 @@ class SmallestLightningClient:
         )
 
         async def iterator() -> AsyncIterator[bytes]:
+            bytes_streamed = 0
             try:
                 async with httpx.AsyncClient(
-                    timeout=self._timeout, transport=self._transport
+                    timeout=self._timeout, transport=self._transport, verify=tls_context()
                 ) as client:
-                    async with client.stream(
-                        "POST",
-                        self._settings.LIGHTNING_API_URL,
-                        json=payload,
-                        headers=headers,
-                    ) as response:
-                        if response.status_code >= 400:
-                            detail = (await response.aread()).decode("utf-8", errors="ignore")
-                            raise LightningClientError(
-                                f"Lightning API error ({response.status_code}): {detail}",
-                                status_code=response.status_code,
-                            )
-
+                    response = await get_upstream("lightning").call(
+                        lambda timeout: self._open_stream(client, payload, headers, timeout),
+                        timeout_s=self._timeout,
+                    )
+                    try:
                         content_type = response.headers.get("content-type", "").lower()
                         if "text/event-stream" in content_type:
                             async for chunk in self._iter_pcm_from_sse(response):
                                 if metrics.first_byte_ts is None:
-                                    metrics.first_byte_ts = time.perf_counter()
-                                    metrics.ttfb_ms = (
-                                        metrics.first_byte_ts - metrics.request_start_ts
-                                    ) * 1000.0
+                                    _record_first_byte(metrics)
+                                bytes_streamed += len(chunk)
                                 yield chunk
                         else:
                             async for chunk in response.aiter_bytes():
                                 if not chunk:
                                     continue
                                 if metrics.first_byte_ts is None:
-                                    metrics.first_byte_ts = time.perf_counter()
-                                    metrics.ttfb_ms = (
-                                        metrics.first_byte_ts - metrics.request_start_ts
-                                    ) * 1000.0
+                                    _record_first_byte(metrics)
+                                bytes_streamed += len(chunk)
                                 yield chunk
+                    finally:
+                        await response.aclose()
+            except UpstreamError as exc:
+                raise LightningClientError(str(exc), status_code=exc.status_code) from exc
             except httpx.TimeoutException as exc:
                 raise LightningClientError("Lightning API request timed out") from exc
             except httpx.HTTPError as exc:
                 raise LightningClientError(f"Lightning API request failed: {exc}") from exc
+            finally:
+                STREAMED_BYTES.labels("lightning").inc(bytes_streamed)
 
         return iterator(), metrics
 
+    async def _open_stream(
+        self,
+        client: httpx.AsyncClient,
+        payload: dict[str, Any],
+        headers: dict[str, str],
+        timeout: float,
+    ) -> httpx.Response:
+        """Send the request and return the open response once upstream accepts it."""
+        request = client.build_request(
+            "POST",
+            self._settings.LIGHTNING_API_URL,
+            json=payload,
+            headers=headers,
+            timeout=timeout,
+        )
+        response = await client.send(request, stream=True)
+        if response.status_code >= 400:
+            detail = (await response.aread()).decode("utf-8", errors="ignore")
+            await response.aclose()
+            raise LightningClientError(
+                f"Lightning API error ({response.status_code}): {detail}",
+                status_code=response.status_code,
+                retry_after=parse_retry_after(response.headers.get("retry-after", "")),
+            )
+        return response
+
     async def _iter_pcm_from_sse(self, response: httpx.Response) -> AsyncIterator[bytes]:
         """Parse upstream SSE frames and yield only decoded PCM bytes."""
         current_event = ""
@@ -0,0 +1,580 @@
+"""Shared execution layer for calls to Gemini, Lightning and Pulse.
+
+Every upstream request goes through an ``Upstream``, which adds jittered
+exponential retries that honor ``Retry-After``, a circuit breaker, a
+concurrency cap, an optional quota token bucket, optional hedging and the
+deadline of the incoming request (see ``DeadlineMiddleware``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+import logging
+import random
+import ssl
+import time
+from typing import Any, Awaitable, Callable, Iterator, TypeVar
+
+from app.config import Settings, get_settings
+from app.utils.lazy import lazy_import
+from app.utils.metrics import REGISTRY, gauge_family, histogram
+
+httpx = lazy_import("httpx")
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+DEADLINE_HEADER = b"x-request-timeout-ms"
+
+_deadline: ContextVar[float | None] = ContextVar("upstream_deadline", default=None)
+
+UPSTREAM_DURATION = histogram(
+    "upstream_request_duration_seconds",
+    "Duration of single upstream attempts (stream opens count until headers).",
+    ("upstream", "outcome"),
+)
+UPSTREAM_TTFB = histogram(
+    "upstream_ttfb_seconds",
+    "Time from request to the first streamed byte, per provider.",
+    ("upstream",),
+)
+
+
+class UpstreamError(Exception):
+    """An upstream call was refused locally instead of being sent."""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float | None = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    def headers(self) -> dict[str, str] | None:
+        if self.retry_after is None:
+            return None
+        return {"Retry-After": str(max(1, round(self.retry_after)))}
+
+
+class CircuitOpenError(UpstreamError):
+    """The upstream's circuit breaker is open."""
+
+
+class DeadlineExceeded(UpstreamError):
+    """The incoming request's deadline ran out before the upstream answered."""
+
+    status_code = 504
+
+
+@contextmanager
+def deadline_scope(seconds: float | None) -> Iterator[None]:
+    """Bound every upstream call made inside the block to ``seconds`` from now.
+
+    Nested scopes can only shorten the deadline, never extend it.
+    """
+    if seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def detached_deadline() -> Iterator[None]:
+    """Lift the request deadline for work that outlives the request, such as background jobs."""
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> float | None:
+    """Seconds left before the current request's deadline, or None if unbounded."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class DeadlineMiddleware:
+    """ASGI middleware that turns ``X-Request-Timeout-Ms`` into an upstream deadline."""
+
+    def __init__(self, app: Any, default_timeout_s: float | Callable[[], float] | None = None) -> None:
+        """``default_timeout_s`` may be a callable, read per request (so reloads apply)."""
+        self.app = app
+        self._default_timeout_s = default_timeout_s
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timeout = self._default_timeout_s
+        if callable(timeout):
+            timeout = timeout()
+        timeout = timeout or None
+        for name, value in scope.get("headers", ()):
+            if name == DEADLINE_HEADER:
+                try:
+                    timeout = max(float(value) / 1000.0, 0.0)
+                except ValueError:
+                    pass
+                break
+        with deadline_scope(timeout):
+            await self.app(scope, receive, send)
+
+
+class TokenBucket:
+    """Rate limiter that smooths bursts to an upstream's quota (requests, or prompt tokens)."""
+
+    def __init__(self, rate_per_s: float, burst: int = 1) -> None:
+        self._rate = rate_per_s
+        self._capacity = float(max(burst, 1))
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller back, e.g. after a 429 with ``Retry-After``."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def try_acquire(self, amount: float = 1.0) -> bool:
+        """Take ``amount`` only if it is available right now."""
+        return self._take(amount) <= 0
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        while True:
+            wait = self._take(amount)
+            if wait <= 0:
+                return
+            remaining = remaining_time()
+            if remaining is not None and wait > remaining:
+                raise DeadlineExceeded("Deadline exceeded waiting for upstream quota", retry_after=wait)
+            await asyncio.sleep(wait)
+
+    def _take(self, amount: float = 1.0) -> float:
+        # A request larger than the burst would never fit; let it through once the bucket is full.
+        amount = min(amount, self._capacity)
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._tokens >= amount:
+            self._tokens -= amount
+            return 0.0
+        return (amount - self._tokens) / self._rate
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; lets one probe through after ``reset_timeout_s``."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_s: float = 30.0) -> None:
+        self.state = "closed"
+        self._failure_threshold = max(failure_threshold, 1)
+        self._reset_timeout_s = reset_timeout_s
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> float | None:
+        """Return None if a call may proceed, otherwise seconds until it might."""
+        if self.state == "open":
+            elapsed = time.monotonic() - self._opened_at
+            if elapsed < self._reset_timeout_s:
+                return self._reset_timeout_s - elapsed
+            self.state = "half_open"
+            self._probing = False
+        if self.state == "half_open":
+            if self._probing:
+                return 1.0
+            self._probing = True
+        return None
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self._failures = 0
+        self._probing = False
+
+    def release_probe(self) -> None:
+        """End a half-open probe whose outcome says nothing about the upstream."""
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == "half_open" or self._failures >= self._failure_threshold:
+            if self.state != "open":
+                logger.warning("Circuit opened after %d consecutive failures", self._failures)
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            self._probing = False
+
+
+@dataclass(frozen=True)
+class UpstreamPolicy:
+    name: str
+    timeout_s: float = 60.0
+    max_attempts: int = 3
+    base_delay_s: float = 0.5
+    max_delay_s: float = 8.0
+    max_concurrency: int = 8
+    rate_per_s: float | None = None
+    burst: int = 1
+    tokens_per_min: float | None = None
+    failure_threshold: int = 5
+    reset_timeout_s: float = 30.0
+    hedge_after_s: float | None = None
+
+
+class Upstream:
+    """Resilient caller for one upstream service."""
+
+    def __init__(self, policy: UpstreamPolicy) -> None:
+        self.policy = policy
+        self.breaker = CircuitBreaker(policy.failure_threshold, policy.reset_timeout_s)
+        self._bucket = TokenBucket(policy.rate_per_s, policy.burst) if policy.rate_per_s else None
+        tpm = policy.tokens_per_min
+        self._token_bucket = TokenBucket(tpm / 60.0, int(tpm)) if tpm else None
+        self._slots = asyncio.Semaphore(max(policy.max_concurrency, 1))
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.hedges = 0
+        self.rejected = 0
+
+    def configure(self, policy: UpstreamPolicy) -> None:
+        """Apply a new policy (after a settings reload), keeping breaker state and counters.
+
+        Only the parts that changed are rebuilt. Attempts already holding a
+        concurrency slot finish under the old cap.
+        """
+        old, self.policy = self.policy, policy
+        if (old.failure_threshold, old.reset_timeout_s) != (policy.failure_threshold, policy.reset_timeout_s):
+            self.breaker._failure_threshold = max(policy.failure_threshold, 1)
+            self.breaker._reset_timeout_s = policy.reset_timeout_s
+        if (old.rate_per_s, old.burst) != (policy.rate_per_s, policy.burst):
+            self._bucket = TokenBucket(policy.rate_per_s, policy.burst) if policy.rate_per_s else None
+        if old.tokens_per_min != policy.tokens_per_min:
+            tpm = policy.tokens_per_min
+            self._token_bucket = TokenBucket(tpm / 60.0, int(tpm)) if tpm else None
+        if old.max_concurrency != policy.max_concurrency:
+            self._slots = asyncio.Semaphore(max(policy.max_concurrency, 1))
+
+    async def call(
+        self,
+        attempt: Callable[[float], Awaitable[T]],
+        timeout_s: float | None = None,
+        hedge: bool = False,
+        cost_tokens: int = 0,
+    ) -> T:
+        """Run ``attempt(timeout)`` until it succeeds or retrying stops making sense.
+
+        ``attempt`` sends one request and raises on failure (e.g. via
+        ``raise_for_status``); it is given the per-attempt timeout in seconds.
+        The last upstream error is re-raised unchanged, so callers keep their
+        existing status handling. ``cost_tokens`` (the estimated prompt size) is
+        charged to the tokens-per-minute bucket before each attempt.
+        """
+        policy = self.policy
+        self.calls += 1
+        hedge = hedge and policy.hedge_after_s is not None
+        for attempt_no in range(1, policy.max_attempts + 1):
+            wait = self.breaker.allow()
+            if wait is not None:
+                self.rejected += 1
+                raise CircuitOpenError(f"{policy.name} is temporarily unavailable", retry_after=wait)
+            probe = self.breaker.state == "half_open"
+            try:
+                if hedge:
+                    result = await self._hedged(attempt, timeout_s, cost_tokens)
+                else:
+                    result = await self._run_one(attempt, timeout_s, cost_tokens=cost_tokens)
+            except asyncio.CancelledError:
+                # A cancelled probe (client gone, speculation discarded) would
+                # otherwise hold the half-open slot and reject every later call.
+                if probe:
+                    self.breaker.record_failure()
+                raise
+            except Exception as exc:
+                retryable, server_delay = _classify(exc)
+                if isinstance(exc, DeadlineExceeded):
+                    # The caller ran out of time; that proves nothing either way.
+                    if probe:
+                        self.breaker.release_probe()
+                elif retryable and _status_of(exc) != 429:
+                    self.breaker.record_failure()
+                else:
+                    # Throttling and client errors still prove the upstream is up.
+                    self.breaker.record_success()
+                if server_delay is not None:
+                    for bucket in (self._bucket, self._token_bucket):
+                        if bucket is not None:
+                            bucket.pause(server_delay)
+
+                delay = server_delay if server_delay is not None else self._backoff(attempt_no)
+                remaining = remaining_time()
+                if (
+                    not retryable
+                    or attempt_no == policy.max_attempts
+                    or delay > policy.max_delay_s
+                    or (remaining is not None and delay >= remaining)
+                ):
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                logger.warning(
+                    "%s attempt %d/%d failed (%s); retrying in %.2fs",
+                    policy.name, attempt_no, policy.max_attempts, exc, delay,
+                )
+                await asyncio.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+        raise AssertionError("unreachable")
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "name": self.policy.name,
+            "circuit": self.breaker.state,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "rejected": self.rejected,
+        }
+
+    async def _run_one(
+        self,
+        attempt: Callable[[float], Awaitable[T]],
+        timeout_s: float | None,
+        sent: asyncio.Event | None = None,
+        metered: bool = True,
+        cost_tokens: int = 0,
+    ) -> T:
+        if metered and self._bucket is not None:
+            await self._bucket.acquire()
+        if metered and cost_tokens and self._token_bucket is not None:
+            await self._token_bucket.acquire(cost_tokens)
+        async with self._slots:
+            if sent is not None:
+                sent.set()
+            timeout = timeout_s or self.policy.timeout_s
+            remaining = remaining_time()
+            if remaining is not None:
+                if remaining <= 0:
+                    raise DeadlineExceeded(f"Deadline exceeded before calling {self.policy.name}")
+                timeout = min(timeout, remaining)
+            self.in_flight += 1
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                if remaining is None:
+                    result = await attempt(timeout)
+                else:
+                    result = await asyncio.wait_for(attempt(timeout), remaining)
+                outcome = "ok"
+                return result
+            except asyncio.TimeoutError as exc:
+                # Only the request deadline running out is final; the attempt's own
+                # timeout stays an ordinary, retryable timeout.
+                if remaining is None or remaining_time() > 0:
+                    raise
+                outcome = "deadline"
+                raise DeadlineExceeded(f"Deadline exceeded waiting for {self.policy.name}") from exc
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                raise
+            finally:
+                self.in_flight -= 1
+                UPSTREAM_DURATION.labels(self.policy.name, outcome).observe(time.perf_counter() - start)
+
+    async def _hedged(
+        self, attempt: Callable[[float], Awaitable[T]], timeout_s: float | None, cost_tokens: int = 0
+    ) -> T:
+        """Send a second copy if the first is slower than ``hedge_after_s``; first success wins.
+
+        The hedge clock starts once the first copy is actually sent, so time spent
+        queued behind the quota or concurrency cap never triggers a hedge. Hedges
+        only use spare quota: if the bucket is empty the first copy runs alone.
+        """
+        sent = asyncio.Event()
+        first = asyncio.ensure_future(self._run_one(attempt, timeout_s, sent, cost_tokens=cost_tokens))
+        sending = asyncio.ensure_future(sent.wait())
+        tasks = {first, sending}
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            tasks.discard(sending)
+            sending.cancel()
+            done, _ = await asyncio.wait(tasks, timeout=self.policy.hedge_after_s)
+            if not done and (self._bucket is None or self._bucket.try_acquire()) and (
+                not cost_tokens or self._token_bucket is None or self._token_bucket.try_acquire(cost_tokens)
+            ):
+                self.hedges += 1
+                tasks.add(asyncio.ensure_future(self._run_one(attempt, timeout_s, metered=False)))
+            pending = set(tasks)
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            assert error is not None
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _backoff(self, attempt_no: int) -> float:
+        cap = min(self.policy.max_delay_s, self.policy.base_delay_s * 2 ** (attempt_no - 1))
+        return random.uniform(0, cap)
+
+
+_upstreams: dict[str, Upstream] = {}
+_upstreams_settings: Settings | None = None
+_tls_context: ssl.SSLContext | None = None
+
+
+def tls_context() -> ssl.SSLContext:
+    """Client TLS context shared by every upstream connection.
+
+    httpx otherwise builds one per client, loading the CA bundle each time:
+    about 30 ms of event-loop CPU per upstream call.
+    """
+    global _tls_context
+    if _tls_context is None:
+        _tls_context = httpx.create_ssl_context()
+    return _tls_context
+
+
+def get_upstream(name: str) -> Upstream:
+    """Return the shared ``Upstream`` for ``name``, built from settings on first use.
+
+    After a settings reload every existing upstream picks up its new policy.
+    """
+    global _upstreams_settings
+    settings = get_settings()
+    if settings is not _upstreams_settings:
+        _upstreams_settings = settings
+        for key, existing in _upstreams.items():
+            existing.configure(_policy(key))
+    upstream = _upstreams.get(name)
+    if upstream is None:
+        upstream = _upstreams[name] = Upstream(_policy(name))
+    return upstream
+
+
+def upstream_stats() -> list[dict[str, Any]]:
+    return [upstream.stats() for upstream in _upstreams.values()]
+
+
+def _collect_upstreams():
+    stats = upstream_stats()
+    yield gauge_family("upstream_in_flight", "Attempts currently running per upstream.", (
+        ({"upstream": s["name"]}, s["in_flight"]) for s in stats
+    ))
+    yield gauge_family("upstream_circuit_open", "1 while the upstream's breaker is open or half-open.", (
+        ({"upstream": s["name"]}, float(s["circuit"] != "closed")) for s in stats
+    ))
+    for field in ("calls", "retries", "failures", "hedges", "rejected"):
+        name = f"upstream_{field}"
+        yield name, "counter", f"Upstream {field} since start.", [
+            (f"{name}_total", {"upstream": s["name"]}, s[field]) for s in stats
+        ]
+
+
+REGISTRY.add_collector(_collect_upstreams)
+
+
+def reset_upstreams() -> None:
+    """Drop all breaker, bucket and counter state (tests)."""
+    _upstreams.clear()
+
+
+def _policy(name: str) -> UpstreamPolicy:
+    settings = get_settings()
+    common = {
+        "max_attempts": settings.UPSTREAM_MAX_ATTEMPTS,
+        "failure_threshold": settings.UPSTREAM_BREAKER_FAILURES,
+        "reset_timeout_s": settings.UPSTREAM_BREAKER_RESET_S,
+    }
+    if name == "gemini":
+        return UpstreamPolicy(
+            name,
+            max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+            rate_per_s=settings.GEMINI_RATE_PER_S or None,
+            burst=settings.GEMINI_BURST,
+            tokens_per_min=settings.GEMINI_TOKENS_PER_MIN or None,
+            hedge_after_s=settings.QA_HEDGE_AFTER_S or None,
+            **common,
+        )
+    if name == "gemini_vision":
+        # Vision tokens weigh heavily against RPM/TPM; pace batches instead of sleeping.
+        return UpstreamPolicy(
+            name,
+            timeout_s=300.0,
+            max_concurrency=1,
+            rate_per_s=settings.GEMINI_VISION_RATE_PER_S or None,
+            **common,
+        )
+    if name == "lightning":
+        return UpstreamPolicy(name, timeout_s=30.0, max_concurrency=settings.LIGHTNING_MAX_CONCURRENCY, **common)
+    if name == "pulse":
+        return UpstreamPolicy(name, timeout_s=120.0, max_concurrency=settings.PULSE_MAX_CONCURRENCY, **common)
+    return UpstreamPolicy(name, **common)
+
+
+def _status_of(exc: BaseException) -> int | None:
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _classify(exc: BaseException) -> tuple[bool, float | None]:
+    """Return (retryable, server-requested delay) for an attempt's exception."""
+    if isinstance(exc, UpstreamError):
+        return False, None
+    status = _status_of(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS, _retry_after(exc)
+    while exc is not None:
+        if isinstance(exc, (httpx.TransportError, OSError, asyncio.TimeoutError)):
+            return True, None
+        exc = exc.__cause__
+    return False, None
+
+
+def _retry_after(exc: BaseException) -> float | None:
+    value = getattr(exc, "retry_after", None)
+    if isinstance(value, (int, float)):
+        return float(value)
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if headers is not None:
+        value = headers.get("retry-after")
+    return parse_retry_after(value) if isinstance(value, str) else None
+
+
+def parse_retry_after(value: str) -> float | None:
+    """Parse a ``Retry-After`` header given as delta-seconds or an HTTP date."""
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
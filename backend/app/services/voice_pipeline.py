@@ -0,0 +1,477 @@
+"""Fused spoken Q&A: Pulse STT, then Gemini, then Lightning TTS, over one WebSocket.
+
+The browser streams microphone audio while the student is still speaking. The
+audio goes to Pulse as it arrives, so the transcript is final a moment after
+the client sends ``end``, not after an upload. The question then goes to Gemini
+as a stream. Answer text is relayed as it arrives and fed sentence by sentence
+into Lightning (``stream_lightning_chunks``), so the first PCM plays while the
+rest of the answer is still being written.
+
+Client -> server: an optional ``{"type": "start", "context": ..., "voice_id": ...}``
+text frame, binary linear16 16 kHz mono audio, then ``{"type": "end"}``. A
+``{"type": "cancel"}`` frame while the answer plays stops it (barge-in).
+
+Server -> client: ``transcript`` events (partial and final), a ``question``
+event, ``answer`` text deltas, binary PCM frames, and a ``done`` event with
+per-stage timings. Failures send an ``error`` event.
+
+Speculative mode (``VOICE_SPECULATIVE`` or ``"speculative": true`` in ``start``)
+starts the answer before the student presses stop. Once the running transcript
+has not changed for ``VOICE_SPECULATION_STABLE_MS``, Gemini and Lightning run in
+the background and their output is buffered. If the final transcript matches the
+speculated one (ignoring case, punctuation and spacing), the buffer is replayed
+and the answer continues live. Otherwise, and as soon as the transcript moves
+on, the speculative work is cancelled and discarded.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import re
+import time
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from app.config import Settings
+from app.services.ask_service import stream_answer_text
+from app.services.lightning_service import stream_lightning_chunks
+from app.services.pulse_realtime import create_pulse_connection
+from app.utils.metrics import REGISTRY, counter, gauge_family, histogram
+
+logger = logging.getLogger(__name__)
+
+VOICE_STAGE = histogram(
+    "voice_ask_stage_seconds",
+    "Per-stage latency of /voice/ask turns.",
+    ("stage",),
+)
+
+SPECULATION = counter(
+    "voice_speculation",
+    "Speculative answers by outcome: hit, miss (final transcript differed), changed, failed, abandoned.",
+    ("outcome",),
+)
+SPECULATION_SAVED = histogram(
+    "voice_speculation_saved_seconds",
+    "First-audio latency saved by speculative answers that were used.",
+)
+
+_END = object()
+_NON_WORD_RE = re.compile(r"[^\w\s]+")
+
+_speculation_totals = {"started": 0, "hit": 0, "saved_s": 0.0}
+
+
+def speculation_stats() -> dict[str, Any]:
+    """Process-wide speculative answer hit rate and first-audio latency saved."""
+    started, hits = _speculation_totals["started"], _speculation_totals["hit"]
+    return {
+        "started": started,
+        "hits": hits,
+        "hit_rate": round(hits / started, 3) if started else 0.0,
+        "saved_ms_total": round(_speculation_totals["saved_s"] * 1000.0, 1),
+        "saved_ms_mean": round(_speculation_totals["saved_s"] * 1000.0 / hits, 1) if hits else 0.0,
+    }
+
+
+def _collect_speculation():
+    yield gauge_family("voice_speculation_hit_ratio", "Share of speculative answers that were used.", [
+        ({}, speculation_stats()["hit_rate"])
+    ])
+
+
+REGISTRY.add_collector(_collect_speculation)
+
+AnswerStream = Callable[[str, str | None], AsyncIterable[str]]
+Speaker = Callable[..., AsyncIterable[bytes]]
+
+
+class _Speculation:
+    """An answer started from a stable partial transcript, buffered until the final one arrives."""
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.key = _normalize(text)
+        self.started = time.perf_counter()
+        self.first_audio_at: float | None = None
+        self.events: asyncio.Queue[tuple[str, Any] | None] = asyncio.Queue()
+        self.task: asyncio.Task | None = None
+
+    async def emit(self, kind: str, data: Any) -> None:
+        if kind == "pcm" and self.first_audio_at is None:
+            self.first_audio_at = time.perf_counter()
+        await self.events.put((kind, data))
+
+
+class VoiceAskSession:
+    """One spoken question and its spoken answer on an accepted WebSocket."""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        settings: Settings,
+        pulse_connect: Callable[[], Awaitable[Any]] = create_pulse_connection,
+        answer_stream: AnswerStream = stream_answer_text,
+        speak: Speaker = stream_lightning_chunks,
+    ) -> None:
+        self._websocket = websocket
+        self._settings = settings
+        self._pulse_connect = pulse_connect
+        self._answer_stream = answer_stream
+        self._speak = speak
+        self._send_lock = asyncio.Lock()
+        self._audio: asyncio.Queue[Any] = asyncio.Queue()
+        self.context: str | None = None
+        self.voice_id: str | None = None
+        self.finals: list[str] = []
+        self.partial = ""
+        self.answer_parts: list[str] = []
+        self.audio_bytes = 0
+        self.started = time.perf_counter()
+        self.marks: dict[str, float] = {}
+        self.speculative = settings.VOICE_SPECULATIVE
+        self.speculations = 0
+        self.speculation_outcome: str | None = None
+        self.speculation_saved_s: float | None = None
+        self._speculation: _Speculation | None = None
+        self._transcript_changed = asyncio.Event()
+
+    async def run(self) -> None:
+        try:
+            await self._run()
+        finally:
+            self._discard_speculation("abandoned")
+
+    async def _run(self) -> None:
+        pulse = asyncio.create_task(self._connect_pulse())
+        try:
+            question = await self._transcribe(pulse)
+        except _ClientGone:
+            return
+        except Exception as e:
+            logger.exception("Voice ask transcription failed")
+            await self._send_error(f"Transcription failed: {e}")
+            return
+        finally:
+            if not pulse.done():
+                pulse.cancel()
+            elif not pulse.cancelled() and pulse.exception() is None:
+                await pulse.result().close()
+
+        if not question:
+            await self._send_error("No speech detected")
+            return
+        await self._send_json({"type": "question", "text": question})
+
+        answer = asyncio.create_task(self._answer(question))
+        watcher = asyncio.create_task(self._watch_client())
+        await asyncio.wait({answer, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if not answer.done():
+            answer.cancel()
+            await asyncio.gather(answer, return_exceptions=True)
+            logger.info("Voice ask answer stopped by the client after %d audio bytes", self.audio_bytes)
+            return
+        watcher.cancel()
+        await asyncio.gather(watcher, return_exceptions=True)
+        try:
+            answer.result()
+        except _ClientGone:
+            return
+        except Exception as e:
+            logger.exception("Voice ask answer failed")
+            await self._send_error(f"Answer failed: {e}")
+            return
+        await self._send_json({
+            "type": "done",
+            "question": question,
+            "answer": "".join(self.answer_parts).strip(),
+            "audio_bytes": self.audio_bytes,
+            "timings": self.timings(),
+            "speculation": {
+                "outcome": self.speculation_outcome,
+                "attempts": self.speculations,
+                "saved_ms": round(self.speculation_saved_s * 1000.0, 1) if self.speculation_saved_s is not None else None,
+            },
+        })
+
+    def timings(self) -> dict[str, float | None]:
+        """Stage latencies in milliseconds; ``None`` for stages that never happened."""
+
+        def span(start: str, end: str) -> float | None:
+            if start not in self.marks or end not in self.marks:
+                return None
+            return round((self.marks[end] - self.marks[start]) * 1000.0, 1)
+
+        return {
+            "stt_connect_ms": span("connect", "stt_connected"),
+            "speech_ms": span("first_audio_in", "speech_end"),
+            "transcript_ms": span("speech_end", "transcript"),
+            "answer_first_text_ms": span("transcript", "answer_first_text"),
+            "answer_ms": span("transcript", "answer_done"),
+            "first_audio_ms": span("transcript", "first_audio_out"),
+            "speech_end_to_first_audio_ms": span("speech_end", "first_audio_out"),
+            "audio_ms": span("transcript", "audio_done"),
+            "total_ms": span("connect", "audio_done"),
+        }
+
+    def _mark(self, name: str) -> None:
+        now = time.perf_counter()
+        self.marks.setdefault(name, now)
+
+    async def _connect_pulse(self) -> Any:
+        self._mark("connect")
+        pulse_ws = await self._pulse_connect()
+        self._mark("stt_connected")
+        VOICE_STAGE.labels("stt_connect").observe(self.marks["stt_connected"] - self.marks["connect"])
+        return pulse_ws
+
+    async def _transcribe(self, pulse: asyncio.Task) -> str:
+        """Forward audio while it is spoken; return the question once Pulse sends ``is_last``."""
+        client = asyncio.create_task(self._read_client_audio())
+        forward = asyncio.create_task(self._forward_audio(pulse))
+        transcripts = asyncio.create_task(self._read_transcripts(pulse))
+        # The monitor always runs: ``start`` may turn speculation on after this point.
+        started = [client, forward, transcripts, asyncio.create_task(self._speculate_when_stable())]
+        tasks = tuple(started)
+        try:
+            while not transcripts.done():
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # Surfaces client disconnects and upstream failures; clean exits fall through.
+                    task.result()
+                tasks = tuple(task for task in tasks if not task.done())
+        finally:
+            for task in started:
+                task.cancel()
+            await asyncio.gather(*started, return_exceptions=True)
+        self._mark("transcript")
+        VOICE_STAGE.labels("transcript").observe(self.marks["transcript"] - self.marks.get("speech_end", self.started))
+        return self._current_text()
+
+    def _current_text(self) -> str:
+        return " ".join([*self.finals, self.partial]).strip()
+
+    async def _read_client_audio(self) -> None:
+        while True:
+            message = await self._receive()
+            if message.get("bytes"):
+                self._mark("first_audio_in")
+                await self._audio.put(message["bytes"])
+                continue
+            event = _parse_event(message.get("text"))
+            if event.get("type") == "start":
+                self.context = event.get("context") or None
+                self.voice_id = event.get("voice_id") or None
+                if isinstance(event.get("speculative"), bool):
+                    self.speculative = event["speculative"]
+            elif event.get("type") == "end":
+                self._mark("speech_end")
+                await self._audio.put(_END)
+                return
+
+    async def _forward_audio(self, pulse: asyncio.Task) -> None:
+        pulse_ws = await pulse
+        ended = False
+        while not ended:
+            chunks = [await self._audio.get()]
+            # Merge whatever queued while Pulse was connecting into one send.
+            while not self._audio.empty():
+                chunks.append(self._audio.get_nowait())
+            if chunks[-1] is _END:
+                chunks.pop()
+                ended = True
+            if chunks:
+                await pulse_ws.send(b"".join(chunks))
+        await pulse_ws.send(json.dumps({"type": "end"}))
+
+    async def _read_transcripts(self, pulse: asyncio.Task) -> None:
+        pulse_ws = await pulse
+        async for raw in pulse_ws:
+            event = _parse_event(raw)
+            text = (event.get("transcript") or "").strip()
+            if text:
+                before = _normalize(self._current_text())
+                if event.get("is_final"):
+                    self.finals.append(text)
+                    self.partial = ""
+                else:
+                    self.partial = text
+                await self._send_json({"type": "transcript", "text": text, "is_final": bool(event.get("is_final"))})
+                current = _normalize(self._current_text())
+                if current != before:
+                    # Only real changes restart the stability timer or invalidate a speculation.
+                    if self._speculation is not None and current != self._speculation.key:
+                        self._discard_speculation("changed")
+                    self._transcript_changed.set()
+            if event.get("is_last"):
+                return
+
+    async def _answer(self, question: str) -> None:
+        speculation = self._take_speculation(question)
+        if speculation is None:
+            await self._produce(question, self._deliver)
+        else:
+            while (event := await speculation.events.get()) is not None:
+                await self._deliver(*event)
+            speculation.task.result()
+        self._mark("audio_done")
+        VOICE_STAGE.labels("total").observe(self.marks["audio_done"] - self.marks["connect"])
+
+    async def _produce(self, question: str, emit: Callable[[str, Any], Awaitable[None]]) -> None:
+        """Run Gemini into Lightning for ``question``, handing answer text and PCM to ``emit``."""
+
+        async def text() -> AsyncIterator[str]:
+            async for delta in self._answer_stream(question, self.context):
+                await emit("answer", delta)
+                yield delta
+            await emit("answer_done", None)
+
+        async for pcm in self._speak(text(), settings=self._settings, voice_id=self.voice_id):
+            await emit("pcm", pcm)
+
+    async def _deliver(self, kind: str, data: Any) -> None:
+        if kind == "answer":
+            self._mark("answer_first_text")
+            self.answer_parts.append(data)
+            await self._send_json({"type": "answer", "delta": data})
+        elif kind == "answer_done":
+            self._mark("answer_done")
+        elif kind == "pcm":
+            if "first_audio_out" not in self.marks:
+                self._mark("first_audio_out")
+                VOICE_STAGE.labels("first_audio").observe(self.marks["first_audio_out"] - self.marks["transcript"])
+            self.audio_bytes += len(data)
+            await self._send_bytes(data)
+
+    async def _speculate_when_stable(self) -> None:
+        """Start a speculative answer each time the transcript settles for the configured interval."""
+        stable_s = self._settings.VOICE_SPECULATION_STABLE_MS / 1000.0
+        while True:
+            await self._transcript_changed.wait()
+            self._transcript_changed.clear()
+            try:
+                await asyncio.wait_for(self._transcript_changed.wait(), stable_s)
+                continue  # still changing
+            except asyncio.TimeoutError:
+                pass
+            if not self.speculative:
+                continue
+            text = self._current_text()
+            key = _normalize(text)
+            if self._speculation is not None and self._speculation.key == key:
+                continue
+            if len(key.split()) < self._settings.VOICE_SPECULATION_MIN_WORDS:
+                continue
+            if self.speculations >= self._settings.VOICE_SPECULATION_MAX_ATTEMPTS:
+                return
+            self._discard_speculation("changed")
+            self._start_speculation(text)
+
+    def _start_speculation(self, text: str) -> None:
+        speculation = _Speculation(text)
+
+        async def run() -> None:
+            try:
+                await self._produce(speculation.text, speculation.emit)
+            finally:
+                speculation.events.put_nowait(None)
+
+        speculation.task = asyncio.create_task(run())
+        self._speculation = speculation
+        self.speculations += 1
+        _speculation_totals["started"] += 1
+        logger.debug("Speculating on %r", text)
+
+    def _take_speculation(self, question: str) -> _Speculation | None:
+        """Hand over the speculative answer if it was for this question and has not failed."""
+        speculation = self._speculation
+        if speculation is None:
+            return None
+        task = speculation.task
+        if _normalize(question) != speculation.key:
+            self._discard_speculation("miss")
+            return None
+        if task.done() and not task.cancelled() and task.exception() is not None:
+            self._discard_speculation("failed")
+            return None
+        self._speculation = None
+        now = self.marks["transcript"]
+        ready = speculation.first_audio_at or now
+        self.speculation_outcome = "hit"
+        self.speculation_saved_s = max(min(now, ready) - speculation.started, 0.0)
+        SPECULATION.labels("hit").inc()
+        SPECULATION_SAVED.observe(self.speculation_saved_s)
+        _speculation_totals["hit"] += 1
+        _speculation_totals["saved_s"] += self.speculation_saved_s
+        return speculation
+
+    def _discard_speculation(self, outcome: str) -> None:
+        speculation, self._speculation = self._speculation, None
+        if speculation is None:
+            return
+        if not speculation.task.done():
+            speculation.task.cancel()
+        self.speculation_outcome = outcome
+        SPECULATION.labels(outcome).inc()
+        logger.debug("Discarded speculative answer (%s) for %r", outcome, speculation.text)
+
+    async def _watch_client(self) -> None:
+        """Return when the client disconnects or cancels the answer."""
+        while True:
+            try:
+                message = await self._receive()
+            except _ClientGone:
+                return
+            if _parse_event(message.get("text")).get("type") == "cancel":
+                return
+
+    async def _receive(self) -> dict:
+        try:
+            message = await self._websocket.receive()
+        except WebSocketDisconnect:
+            raise _ClientGone() from None
+        if message.get("type") == "websocket.disconnect":
+            raise _ClientGone()
+        return message
+
+    async def _send_json(self, event: dict) -> None:
+        await self._send(self._websocket.send_text, json.dumps(event))
+
+    async def _send_bytes(self, data: bytes) -> None:
+        await self._send(self._websocket.send_bytes, data)
+
+    async def _send(self, send: Callable[[Any], Awaitable[None]], data: Any) -> None:
+        try:
+            async with self._send_lock:
+                await send(data)
+        except (WebSocketDisconnect, RuntimeError):
+            raise _ClientGone() from None
+
+    async def _send_error(self, message: str) -> None:
+        try:
+            await self._send_json({"type": "error", "message": message, "timings": self.timings()})
+        except _ClientGone:
+            pass
+
+
+class _ClientGone(Exception):
+    """The browser closed the socket; there is no one left to answer."""
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_NON_WORD_RE.sub(" ", text.lower()).split())
+
+
+def _parse_event(raw: Any) -> dict:
+    if not raw:
+        return {}
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8", errors="ignore")
+    try:
+        event = json.loads(raw)
+    except (json.JSONDecodeError, TypeError):
+        return {}
+    return event if isinstance(event, dict) else {}
@@ -0,0 +1,72 @@
+"""In-process LRU/TTL cache.
+
+Cross-request results that need single-flight (Pulse transcriptions, TTS audio)
+go through ``SharedCache`` in ``cache_backends`` instead.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+import time
+from typing import Any, Callable, Generic, Hashable, TypeVar
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class AsyncLRUCache(Generic[V]):
+    """Bounded LRU cache whose entries expire after ``ttl_seconds``."""
+
+    def __init__(self, max_entries: int = 128, ttl_seconds: float | None = None) -> None:
+        self._max_entries = max(max_entries, 1)
+        self._ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> V | Any:
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        ttl = self._ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl is not None else float("inf")
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def get_or_call(self, key: Hashable, fn: Callable[[], V]) -> V:
+        """Synchronous memoization for cheap, CPU-bound values."""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = fn()
+        self.set(key, value)
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self._max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
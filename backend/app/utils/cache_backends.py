@@ -0,0 +1,447 @@
+"""Byte-oriented cache backends that can be shared across uvicorn workers.
+
+``MemoryBackend`` is a per-process LRU, ``SQLiteBackend`` a WAL-mode file that
+any number of worker processes can open, and ``RedisBackend`` speaks RESP to a
+Redis (or compatible stand-in) server without extra dependencies. All of them
+store raw bytes, so PCM audio and JSON share one code path, and all report the
+same stats. ``SharedCache`` adds namespacing, codecs and per-process
+single-flight on top of any backend.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable
+from urllib.parse import urlparse
+
+from app.utils.lazy import lazy_import
+
+sqlite3 = lazy_import("sqlite3")
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """Stores bytes under string keys with an optional per-entry TTL."""
+
+    kind = "base"
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+
+    async def get(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl_s: float | None = None) -> None:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.kind,
+            "hits": self.hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    def _count(self, value: bytes | None) -> bytes | None:
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process LRU bounded by entry count and total bytes."""
+
+    kind = "memory"
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 256 * 1024 * 1024) -> None:
+        super().__init__()
+        self._max_entries = max(max_entries, 1)
+        self._max_bytes = max(max_bytes, 1)
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._bytes = 0
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] < time.time():
+            self._remove(key)
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return self._count(entry[1] if entry is not None else None)
+
+    async def set(self, key: str, value: bytes, ttl_s: float | None = None) -> None:
+        if len(value) > self._max_bytes:
+            return
+        self._remove(key)
+        expires_at = time.time() + ttl_s if ttl_s else float("inf")
+        self._entries[key] = (expires_at, value)
+        self._bytes += len(value)
+        self.sets += 1
+        while len(self._entries) > self._max_entries or self._bytes > self._max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    async def delete(self, key: str) -> None:
+        self._remove(key)
+
+    def stats(self) -> dict[str, Any]:
+        return {**super().stats(), "entries": len(self._entries), "bytes": self._bytes}
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+
+class SQLiteBackend(CacheBackend):
+    """Cache table in a WAL-mode SQLite file, safe to share between processes.
+
+    Queries run in worker threads so disk I/O never blocks the event loop.
+    Reads only refresh ``accessed_at`` every ``touch_interval_s`` to keep hits
+    read-mostly; eviction removes expired rows first, then least recently used.
+    """
+
+    kind = "sqlite"
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 1024,
+        max_bytes: int = 256 * 1024 * 1024,
+        touch_interval_s: float = 60.0,
+    ) -> None:
+        super().__init__()
+        self._path = path
+        self._max_entries = max(max_entries, 1)
+        self._max_bytes = max(max_bytes, 1)
+        self._touch_interval_s = touch_interval_s
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self.entries = 0
+        self.bytes = 0
+
+    async def get(self, key: str) -> bytes | None:
+        return self._count(await asyncio.to_thread(self._get_sync, key))
+
+    async def set(self, key: str, value: bytes, ttl_s: float | None = None) -> None:
+        if len(value) > self._max_bytes:
+            return
+        await asyncio.to_thread(self._set_sync, key, value, ttl_s)
+        self.sets += 1
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._execute, "DELETE FROM cache WHERE key = ?", (key,))
+
+    async def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict[str, Any]:
+        # Sizes are as of the last write from this process; querying here would block the loop.
+        return {**super().stats(), "entries": self.entries, "bytes": self.bytes}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=30.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+                " expires_at REAL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> None:
+        with self._lock:
+            self._connection().execute(sql, params)
+
+    def _get_sync(self, key: str) -> bytes | None:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, expires_at, accessed_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at, accessed_at = row
+            if expires_at is not None and expires_at < now:
+                conn.execute("DELETE FROM cache WHERE key = ? AND expires_at < ?", (key, now))
+                return None
+            if now - accessed_at > self._touch_interval_s:
+                conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return bytes(value)
+
+    def _set_sync(self, key: str, value: bytes, ttl_s: float | None) -> None:
+        now = time.time()
+        expires_at = now + ttl_s if ttl_s else None
+        with self._lock:
+            conn = self._connection()
+            # IMMEDIATE takes the write lock up front so concurrent workers evict consistently.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, sqlite3.Binary(value), len(value), expires_at, now),
+                )
+                entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+                if entries > self._max_entries or total > self._max_bytes:
+                    removed = conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,)).rowcount
+                    self.evictions += removed
+                    entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+                    victims = []
+                    for victim, size in conn.execute(
+                        "SELECT key, size FROM cache WHERE key != ? ORDER BY accessed_at", (key,)
+                    ):
+                        if entries <= self._max_entries and total <= self._max_bytes:
+                            break
+                        victims.append((victim,))
+                        entries -= 1
+                        total -= size
+                    conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+                    self.evictions += len(victims)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self.entries, self.bytes = entries, total
+
+
+class RedisError(Exception):
+    """Error reply from a Redis-protocol server."""
+
+
+class _RespConnection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+
+    async def command(self, *parts: bytes | str | int) -> Any:
+        payload = [b"*%d\r\n" % len(parts)]
+        for part in parts:
+            if isinstance(part, str):
+                part = part.encode("utf-8")
+            elif isinstance(part, int):
+                part = str(part).encode("ascii")
+            payload.append(b"$%d\r\n" % len(part))
+            payload.append(part)
+            payload.append(b"\r\n")
+        self.writer.write(b"".join(payload))
+        await self.writer.drain()
+        return await self._reply()
+
+    async def _reply(self, nested: bool = False) -> Any:
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        prefix, body = line[:1], line[1:-2]
+        if prefix == b"+":
+            return body.decode("utf-8")
+        if prefix == b"-":
+            # Raised only once the whole reply is read, so the connection stays usable.
+            error = RedisError(body.decode("utf-8", errors="replace"))
+            if nested:
+                return error
+            raise error
+        if prefix == b":":
+            return int(body)
+        if prefix == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            return (await self.reader.readexactly(length + 2))[:-2]
+        if prefix == b"*":
+            count = int(body)
+            return None if count < 0 else [await self._reply(nested=True) for _ in range(count)]
+        # The stream is out of sync; the caller drops the connection.
+        raise ConnectionError(f"Unexpected Redis reply: {line!r}")
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class RedisBackend(CacheBackend):
+    """Minimal RESP2 client (GET / SET PX / DEL) over a small connection pool.
+
+    Size-based eviction is left to the server's ``maxmemory-policy``.
+    """
+
+    kind = "redis"
+
+    def __init__(self, url: str = "redis://127.0.0.1:6379/0", max_connections: int = 8) -> None:
+        super().__init__()
+        parsed = urlparse(url)
+        self._host = parsed.hostname or "127.0.0.1"
+        self._port = parsed.port or 6379
+        self._password = parsed.password
+        self._db = int(parsed.path.lstrip("/") or 0)
+        self._idle: list[_RespConnection] = []
+        self._slots = asyncio.Semaphore(max(max_connections, 1))
+
+    async def get(self, key: str) -> bytes | None:
+        return self._count(await self._command("GET", key))
+
+    async def set(self, key: str, value: bytes, ttl_s: float | None = None) -> None:
+        if ttl_s:
+            await self._command("SET", key, value, "PX", max(int(ttl_s * 1000), 1))
+        else:
+            await self._command("SET", key, value)
+        self.sets += 1
+
+    async def delete(self, key: str) -> None:
+        await self._command("DEL", key)
+
+    async def close(self) -> None:
+        while self._idle:
+            conn = self._idle.pop()
+            conn.close()
+            await conn.writer.wait_closed()
+
+    async def _command(self, *parts: bytes | str | int) -> Any:
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else await self._connect()
+            try:
+                reply = await conn.command(*parts)
+            except RedisError:
+                # An error reply was read in full; the connection is still in sync.
+                self._idle.append(conn)
+                raise
+            except BaseException:
+                # I/O errors, protocol errors and cancellation mid-reply leave unread bytes.
+                conn.close()
+                raise
+            else:
+                self._idle.append(conn)
+                return reply
+
+    async def _connect(self) -> _RespConnection:
+        reader, writer = await asyncio.open_connection(self._host, self._port)
+        conn = _RespConnection(reader, writer)
+        try:
+            if self._password:
+                await conn.command("AUTH", self._password)
+            if self._db:
+                await conn.command("SELECT", self._db)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+
+class SharedCache:
+    """Namespaced view over a backend with codecs and per-process single-flight.
+
+    Backend failures are logged and treated as misses, so a cache outage
+    degrades to recomputing rather than failing requests.
+    """
+
+    def __init__(self, backend: CacheBackend, namespace: str, ttl_s: float | None = None) -> None:
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl_s = ttl_s
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0
+        self.errors = 0
+
+    def key(self, *parts: Any) -> str:
+        digest = hashlib.blake2b(digest_size=20)
+        for part in parts:
+            digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+            digest.update(b"\x1f")
+        return f"{self.namespace}:{digest.hexdigest()}"
+
+    async def get(self, key: str) -> bytes | None:
+        value = await self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes, ttl_s: float | None = None) -> None:
+        try:
+            await self.backend.set(key, value, ttl_s if ttl_s is not None else self.ttl_s)
+        except Exception as exc:
+            self._failed("set", exc)
+
+    async def get_or_compute(self, key: str, factory: Callable[[], Awaitable[bytes]]) -> bytes:
+        value = await self._get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        task = self._inflight.get(key)
+        if task is not None:
+            self.joined += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._compute(key, factory))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def get_or_compute_json(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        async def encoded() -> bytes:
+            return json.dumps(await factory(), separators=(",", ":")).encode("utf-8")
+
+        return json.loads(await self.get_or_compute(key, encoded))
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses + self.joined
+        return {
+            "backend": self.backend.kind,
+            "hits": self.hits,
+            "misses": self.misses,
+            "joined": self.joined,
+            "errors": self.errors,
+            "hit_ratio": round((self.hits + self.joined) / lookups, 3) if lookups else 0.0,
+        }
+
+    async def _get(self, key: str) -> bytes | None:
+        try:
+            return await self.backend.get(key)
+        except Exception as exc:
+            self._failed("get", exc)
+            return None
+
+    async def _compute(self, key: str, factory: Callable[[], Awaitable[bytes]]) -> bytes:
+        value = await factory()
+        await self.set(key, value)
+        return value
+
+    def _failed(self, op: str, exc: Exception) -> None:
+        self.errors += 1
+        if self.errors == 1 or self.errors % 100 == 0:
+            logger.warning("Cache %s failed on %s backend (%d errors): %s", op, self.backend.kind, self.errors, exc)
@@ -0,0 +1,110 @@
+"""Negotiated gzip / brotli compression for complete JSON responses.
+
+Only single-message ``application/json`` bodies of at least ``minimum_size``
+bytes are compressed. Streaming bodies (PCM audio, SSE, NDJSON) and every
+other media type pass through untouched, so audio never waits on a compressor.
+Brotli is used when the optional ``brotli`` package is installed and the client
+prefers it; gzip otherwise.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+from typing import Any, Callable
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+GZIP_LEVEL = 4
+BROTLI_QUALITY = 4
+# Bodies this large are compressed off the event loop so live audio keeps flowing.
+THREAD_COMPRESS_BYTES = 256 * 1024
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """Pick ``br`` or ``gzip`` from an Accept-Encoding header, honoring q=0."""
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.strip().lower()] = q
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = None
+    for coding in candidates:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (coding, q)
+    return best[0] if best else None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing large, complete JSON responses."""
+
+    def __init__(self, app: Any, minimum_size: int | Callable[[], int] = 1024) -> None:
+        """``minimum_size`` may be a callable, read per response (so reloads apply)."""
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: dict | None = None
+        passthrough = False
+
+        async def send_wrapper(message: dict) -> None:
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message.get("headers", []))
+                if headers.get("content-type", "").startswith("application/json") and "content-encoding" not in headers:
+                    start = message
+                else:
+                    passthrough = True
+                    await send(message)
+                return
+
+            body = message.get("body", b"")
+            passthrough = True
+            minimum_size = self.minimum_size() if callable(self.minimum_size) else self.minimum_size
+            if message.get("more_body", False) or len(body) < minimum_size:
+                await send(start)
+                await send(message)
+                return
+            if len(body) >= THREAD_COMPRESS_BYTES:
+                compressed = await asyncio.to_thread(compress, body, encoding)
+            else:
+                compressed = compress(body, encoding)
+            headers = MutableHeaders(scope=start)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
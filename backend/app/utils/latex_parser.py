@@ -1,135 +1,754 @@
+"""LaTeX lecture summaries to speakable teaching scripts: a single-pass tokenizer and verbalizer plus anchor extraction."""
+
 from __future__ import annotations
 
 import re
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable
+
+from app.models.lightning import AnchorSpan, ScriptSentence, TeachingScript
+
+_STUDENT_PHRASES = ("a student asked", "student question")
+_TRICK_PHRASES = ("prof's trick", "profs trick", "professor's trick", "professors trick")
+_CONCEPT_PHRASES = ("core concept", "important point", "key idea")
+_MATH_KEYWORDS = (
+    " equals ",
+    " plus ",
+    " minus ",
+    " over ",
+    " square root ",
+    " squared",
+    " cubed",
+    " to the power of ",
+)
+
+# Trigger phrases and math keywords compiled into one alternation of plain
+# literals, so anchor extraction is a single scan of the script. Without
+# capture groups the regex engine can skip ahead by first character; hits are
+# identified by a dict lookup and word boundaries are checked by hand.
+# Keywords are scanned without their trailing space, which is checked by hand
+# too: adjacent keywords share a space (" equals minus "), and a consumed space
+# would hide the next keyword from the scan.
+# A sentence is math-heavy when at least two distinct keywords occur in it.
+_STUDENT_BIT, _TRICK_BIT, _CONCEPT_BIT = 1, 2, 4
+_KEYWORD_MASK = sum(8 << index for index in range(len(_MATH_KEYWORDS)))
+_PHRASE_BITS: dict[str, int] = {
+    **{phrase: _STUDENT_BIT for phrase in _STUDENT_PHRASES},
+    **{phrase: _TRICK_BIT for phrase in _TRICK_PHRASES},
+    **{phrase: _CONCEPT_BIT for phrase in _CONCEPT_PHRASES},
+    **{keyword.rstrip(" "): 8 << index for index, keyword in enumerate(_MATH_KEYWORDS)},
+}
+_SPACED_KEYWORDS = frozenset(keyword.rstrip(" ") for keyword in _MATH_KEYWORDS if keyword.endswith(" "))
+_ANCHOR_SCAN_PATTERN = "|".join(re.escape(phrase) for phrase in _PHRASE_BITS)
+_ANCHOR_SCAN_RE = re.compile(_ANCHOR_SCAN_PATTERN)
+_ANCHOR_SCAN_NOCASE_RE = re.compile(_ANCHOR_SCAN_PATTERN, re.IGNORECASE)
+_SENTENCE_END_RE = re.compile(r"[.!?]")
+_LEADING_SPACE_RE = re.compile(r"\s*")
+
+# One alternation covers every token kind, so the document is scanned exactly once.
+# Plain prose (including single spaces) lexes as one ``text`` token, so the
+# Python-level walk only does work where there is markup to interpret.
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<text>[^\\{}^_+=\-$`\s]+(?:\ [^\\{}^_+=\-$`\s]+)*)
+    |(?P<space>\s+)
+    |(?P<cmd>\\[A-Za-z]+)
+    |(?P<esc>\\.)
+    |(?P<lbrace>\{)
+    |(?P<rbrace>\})
+    |(?P<sup>\^)
+    |(?P<sub>_)
+    |(?P<op>[+=\-])
+    |(?P<math>\$+)
+    |(?P<other>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+_HEAD_RE = re.compile(r"[A-Za-z0-9]+")
+
+# Past this nesting depth braces are flattened instead of recursed into, so
+# pathological input cannot hit Python's recursion limit.
+_MAX_DEPTH = 100
+
+_WORDS: dict[str, str] = {
+    # Greek letters
+    **{
+        name: name
+        for name in (
+            "alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta",
+            "iota", "kappa", "lambda", "mu", "nu", "xi", "pi", "rho", "sigma",
+            "tau", "upsilon", "phi", "chi", "psi", "omega",
+        )
+    },
+    **{name: name.lower() for name in ("Gamma", "Delta", "Theta", "Lambda", "Xi", "Pi", "Sigma", "Phi", "Psi", "Omega")},
+    "varepsilon": "epsilon",
+    "vartheta": "theta",
+    "varphi": "phi",
+    # Operators and relations
+    "cdot": "times",
+    "times": "times",
+    "div": "divided by",
+    "pm": "plus or minus",
+    "mp": "minus or plus",
+    "le": "is less than or equal to",
+    "leq": "is less than or equal to",
+    "ge": "is greater than or equal to",
+    "geq": "is greater than or equal to",
+    "lt": "is less than",
+    "gt": "is greater than",
+    "ne": "is not equal to",
+    "neq": "is not equal to",
+    "approx": "is approximately",
+    "equiv": "is equivalent to",
+    "propto": "is proportional to",
+    "to": "goes to",
+    "rightarrow": "goes to",
+    "Rightarrow": "implies",
+    "implies": "implies",
+    "iff": "if and only if",
+    "in": "in",
+    "infty": "infinity",
+    "partial": "partial",
+    "nabla": "del",
+    "forall": "for all",
+    "exists": "there exists",
+    "circ": "degrees",
+    "degree": "degrees",
+    "ldots": "and so on",
+    "cdots": "and so on",
+    "dots": "and so on",
+    # Functions
+    "sin": "sine",
+    "cos": "cosine",
+    "tan": "tangent",
+    "log": "log",
+    "ln": "natural log",
+    "exp": "exp",
+    "max": "max",
+    "min": "min",
+}
+
+# Layout commands that produce no speech.
+_SILENT = frozenset(
+    {
+        "left", "right", "displaystyle", "newline", "par", "noindent", "centering",
+        "item", "maketitle", "quad", "qquad", "hline", "big", "Big", "bigg", "Bigg",
+    }
+)
 
-from app.models.lightning import SemanticAnchor, TeachingScript
+# Commands whose single argument is spoken as-is.
+_PASSTHROUGH = frozenset(
+    {
+        "text", "textbf", "textit", "emph", "underline", "mathrm", "mathbf", "mathit",
+        "mathcal", "operatorname", "boxed", "section", "subsection", "subsubsection",
+        "paragraph", "title",
+    }
+)
 
-_STUDENT_PATTERNS = (r"\ba student asked\b", r"\bstudent question\b")
-_TRICK_PATTERNS = (r"\bprof(?:essor)?'?s trick\b", r"\bprofessor'?s trick\b")
-_CONCEPT_PATTERNS = (r"\bcore concept\b", r"\bimportant point\b", r"\bkey idea\b")
+# Commands whose argument is dropped entirely.
+_DROP_ARGUMENT = frozenset({"label", "ref", "cite", "usepackage", "documentclass", "vspace", "hspace"})
+
+# Accent commands: template applied around the spoken argument.
+_ACCENTS: dict[str, tuple[str, str]] = {
+    "hat": ("", "hat"),
+    "bar": ("", "bar"),
+    "dot": ("", "dot"),
+    "tilde": ("", "tilde"),
+    "vec": ("vector", ""),
+}
+
+# Big operators: spoken name plus the word that introduces the lower bound.
+_BIG_OPERATORS: dict[str, tuple[str, str]] = {
+    "sum": ("the sum", "from"),
+    "prod": ("the product", "from"),
+    "int": ("the integral", "from"),
+    "iint": ("the double integral", "over"),
+    "oint": ("the contour integral", "over"),
+    "lim": ("the limit", "as"),
+}
+
+_ENVIRONMENTS: dict[str, str] = {
+    "theorem": "Theorem.",
+    "lemma": "Lemma.",
+    "definition": "Definition.",
+    "example": "Example.",
+    "proof": "Proof.",
+}
+
+_ESCAPES: dict[str, str] = {
+    "%": "percent",
+    "$": "dollar",
+    "&": "and",
+    "#": "number",
+}
+
+_OPERATOR_WORDS = {"+": "plus", "=": "equals", "-": "minus"}
 
 
 def latex_to_teaching_script(latex_summary: str) -> TeachingScript:
     """Convert LaTeX-heavy summary text into speech-ready script + anchors."""
-    text = _normalize_text(latex_summary)
-    text = _replace_frac(text)
-    text = _replace_sqrt(text)
-    text = _replace_exponents(text)
-    text = _replace_math_operators(text)
-    text = _normalize_whitespace(text)
+    text = _verbalize(latex_summary)
     anchors = _extract_anchors(text)
     return TeachingScript(text=text, anchors=anchors)
 
 
-def _normalize_text(text: str) -> str:
-    text = text.replace("\\n", " ")
-    text = text.replace("\\%", " percent")
-    text = text.replace("\\$", " dollar")
-    text = text.replace("`", "'")
-    return text.strip()
+class IncrementalScriptParser:
+    """Turn LaTeX arriving in chunks into speakable sentences as soon as each completes.
 
+    A sentence is cut after ``.``/``!``/``?`` followed by whitespace, or at a
+    blank line, but only at brace depth 0 and outside math mode; brace depth,
+    math mode and a pending backslash carry across chunk boundaries. Each cut
+    piece is verbalized and anchored on its own, so the first sentence can go
+    to TTS while the rest of the document is still arriving.
+    """
 
-def _replace_frac(text: str) -> str:
-    pattern = re.compile(r"\\frac\{([^{}]+)\}\{([^{}]+)\}")
-    for _ in range(10):
-        new_text, changed = pattern.subn(r"\1 over \2", text)
-        text = new_text
-        if changed == 0:
-            break
-    return text
+    def __init__(self, max_sentence_chars: int = 1000) -> None:
+        self._max_sentence_chars = max_sentence_chars
+        self._buffer = ""
+        self._scan_pos = 0
+        self._depth = 0
+        self._math = False
+        self._last_space = -1
+        self._script_len = 0
+        self._anchor_count = 0
 
+    def feed(self, chunk: str) -> list[ScriptSentence]:
+        """Add source text and return every sentence it completed."""
+        self._buffer += chunk
+        sentences: list[ScriptSentence] = []
+        while (cut := self._find_cut()) is not None:
+            sentence = self._emit(self._buffer[:cut])
+            if sentence is not None:
+                sentences.append(sentence)
+            self._buffer = self._buffer[cut:]
+            self._scan_pos = 0
+            self._last_space = -1
+        return sentences
 
-def _replace_sqrt(text: str) -> str:
-    pattern = re.compile(r"\\sqrt\{([^{}]+)\}")
-    for _ in range(10):
-        new_text, changed = pattern.subn(r"square root of \1", text)
-        text = new_text
-        if changed == 0:
-            break
-    return text
+    def close(self) -> list[ScriptSentence]:
+        """Flush whatever is left once the source has ended."""
+        tail, self._buffer = self._buffer, ""
+        self._scan_pos = 0
+        self._depth = 0
+        self._math = False
+        sentence = self._emit(tail)
+        return [sentence] if sentence is not None else []
 
+    def _find_cut(self) -> int | None:
+        buffer = self._buffer
+        size = len(buffer)
+        i = self._scan_pos
+        while i < size:
+            char = buffer[i]
+            if char == "\\":
+                if i + 1 >= size:
+                    break
+                nxt = buffer[i + 1]
+                if nxt in "([":
+                    self._math = True
+                elif nxt in ")]":
+                    self._math = False
+                i += 2
+                continue
+            if char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth = max(self._depth - 1, 0)
+            elif char == "$":
+                if i + 1 >= size:
+                    break
+                if buffer[i + 1] == "$":
+                    i += 1
+                self._math = not self._math
+            elif self._depth == 0 and not self._math:
+                if char in ".!?":
+                    if i + 1 >= size:
+                        break
+                    if buffer[i + 1].isspace():
+                        self._scan_pos = i + 1
+                        return i + 1
+                elif char == "\n":
+                    if i + 1 >= size:
+                        break
+                    if buffer[i + 1] == "\n":
+                        self._scan_pos = i + 2
+                        return i + 2
+                if char.isspace():
+                    self._last_space = i
+            i += 1
+        self._scan_pos = i
+        if size > self._max_sentence_chars and self._last_space > 0:
+            # Very long run without a sentence end: cut at the last safe space.
+            return self._last_space + 1
+        return None
+
+    def _emit(self, source: str) -> ScriptSentence | None:
+        text = _verbalize(source)
+        if not text:
+            return None
+        start = self._script_len + 1 if self._script_len else 0
+        anchors = _extract_anchors(text)
+        for anchor in anchors:
+            self._anchor_count += 1
+            anchor.anchor_id = f"anchor_{self._anchor_count}"
+            # In the whole script a sentence starts right after the previous
+            # terminator, so its span includes the joining space.
+            anchor.span_start += start - 1 if start and anchor.span_start == 0 else start
+            anchor.span_end += start
+        self._script_len = start + len(text)
+        return ScriptSentence(text=text, span_start=start, span_end=self._script_len, anchors=anchors)
+
+
+async def aiter_script_sentences(
+    chunks: AsyncIterable[str] | Iterable[str],
+    max_sentence_chars: int = 1000,
+) -> AsyncIterator[ScriptSentence]:
+    """Yield speakable sentences from LaTeX chunks, e.g. a streaming Gemini answer."""
+    parser = IncrementalScriptParser(max_sentence_chars=max_sentence_chars)
+    if isinstance(chunks, AsyncIterable):
+        async for chunk in chunks:
+            for sentence in parser.feed(chunk):
+                yield sentence
+    else:
+        for chunk in chunks:
+            for sentence in parser.feed(chunk):
+                yield sentence
+    for sentence in parser.close():
+        yield sentence
 
-def _replace_exponents(text: str) -> str:
-    pattern = re.compile(
-        r"(?P<base>[A-Za-z0-9\)\]])\s*\^\s*(?:\{(?P<braced>[^{}]+)\}|(?P<plain>[A-Za-z0-9]+))"
-    )
 
-    def replacer(match: re.Match[str]) -> str:
-        base = match.group("base")
-        exponent = (match.group("braced") or match.group("plain") or "").strip()
-        if exponent == "2":
-            phrase = "squared"
-        elif exponent == "3":
-            phrase = "cubed"
+def _verbalize(source: str) -> str:
+    tokens = [(match.lastgroup, match.group()) for match in _TOKEN_RE.finditer(source)]
+    return _Verbalizer(tokens).run()
+
+
+class _Writer:
+    """Output buffer that collapses whitespace as it is written."""
+
+    def __init__(self) -> None:
+        self.parts: list[str] = []
+        self.last = ""
+        self._space_pending = False
+        self._needs_separator = False
+
+    def space(self) -> None:
+        if self.parts:
+            self._space_pending = True
+
+    def word(self, text: str) -> None:
+        """Write generated speech, always separated from its neighbours."""
+        if not text:
+            return
+        if self.parts and self.last not in "([{":
+            self.parts.append(" ")
+        self.parts.append(text)
+        self.last = text[-1]
+        self._space_pending = False
+        self._needs_separator = True
+
+    def raw(self, text: str) -> None:
+        """Write source text, keeping it glued to punctuation as written."""
+        if self._space_pending or (self._needs_separator and text[0].isalnum()):
+            self.parts.append(" ")
+        self.parts.append(text)
+        self.last = text[-1]
+        self._space_pending = False
+        self._needs_separator = False
+
+    def getvalue(self) -> str:
+        return "".join(self.parts).strip()
+
+
+class _Verbalizer:
+    """Recursive-descent walk over the token stream, writing speech as it goes."""
+
+    def __init__(self, tokens: list[tuple[str, str]]) -> None:
+        self.tokens = tokens
+        self.pos = 0
+        self.out = _Writer()
+        self._flattened = 0
+
+    def run(self) -> str:
+        self._sequence(depth=0, closing=False)
+        return self.out.getvalue()
+
+    def _sequence(self, depth: int, closing: bool) -> None:
+        tokens = self.tokens
+        while self.pos < len(tokens):
+            if tokens[self.pos][0] == "rbrace":
+                self.pos += 1
+                if self._flattened:
+                    self._flattened -= 1
+                    continue
+                if closing:
+                    return
+                continue
+            self._atom(depth)
+
+    def _atom(self, depth: int) -> None:
+        kind, text = self.tokens[self.pos]
+        self.pos += 1
+        if kind == "text":
+            self.out.raw(text)
+        elif kind == "space":
+            self.out.space()
+        elif kind == "cmd":
+            self._command(text[1:], depth)
+        elif kind == "lbrace":
+            self._group(depth)
+        elif kind == "sup":
+            self._superscript(depth)
+        elif kind == "sub":
+            self._subscript(depth)
+        elif kind == "op":
+            self._operator(text)
+        elif kind == "esc":
+            self._escape(text[1])
+        elif kind == "math":
+            return
         else:
-            phrase = f"to the power of {exponent}"
-        return f"{base} {phrase}"
+            self.out.raw("'" if text == "`" else text)
 
-    return pattern.sub(replacer, text)
+    def _group(self, depth: int) -> None:
+        """Speak a ``{...}`` group; the opening brace is already consumed."""
+        if depth >= _MAX_DEPTH:
+            self._flattened += 1
+            return
+        self._sequence(depth + 1, closing=True)
 
+    def _argument(self, depth: int, single_char: bool = False) -> None:
+        """Speak one macro argument: a braced group, a command or a word."""
+        self._skip_spaces()
+        if self.pos >= len(self.tokens):
+            return
+        kind = self.tokens[self.pos][0]
+        if kind == "lbrace":
+            self.pos += 1
+            self._group(depth)
+        elif kind == "text":
+            # \frac12 is \frac{1}{2}: take one character, leave the rest for the next argument.
+            head = self._take_head(single_char)
+            if head:
+                self.out.raw(head)
+        elif kind == "cmd" and depth < _MAX_DEPTH:
+            self._atom(depth)
 
-def _replace_math_operators(text: str) -> str:
-    text = re.sub(r"(?<=[A-Za-z0-9\)])\s*\+\s*(?=[A-Za-z0-9\(])", " plus ", text)
-    text = re.sub(r"(?<=[A-Za-z0-9\)])\s*=\s*(?=[A-Za-z0-9\(])", " equals ", text)
-    text = re.sub(r"(?<=[A-Za-z0-9\)])\s*-\s*(?=[A-Za-z0-9\(])", " minus ", text)
-    return text
+    def _command(self, name: str, depth: int) -> None:
+        handler = _COMMANDS.get(name)
+        if handler is not None:
+            handler(self, name, depth)
+        elif name in _WORDS:
+            self.out.word(_WORDS[name])
+        elif name in _SILENT:
+            self.out.space()
+        elif name[0] == "n":
+            # A literal "\n" escape, possibly glued to the next word: "first line\nThe next".
+            self.out.space()
+            if len(name) > 1:
+                self.out.raw(name[1:])
+        else:
+            self.out.word(name)
+
+    def _frac(self, name: str, depth: int) -> None:
+        self._argument(depth + 1, single_char=True)
+        self.out.word("over")
+        self._argument(depth + 1, single_char=True)
 
+    def _sqrt(self, name: str, depth: int) -> None:
+        index = self._optional_argument()
+        if index in ("", "2"):
+            self.out.word("square root of")
+        elif index == "3":
+            self.out.word("cube root of")
+        else:
+            self.out.word(f"the {index}th root of")
+        self._argument(depth + 1)
 
-def _normalize_whitespace(text: str) -> str:
-    return re.sub(r"\s+", " ", text).strip()
+    def _passthrough(self, name: str, depth: int) -> None:
+        self._argument(depth + 1)
 
+    def _drop_argument(self, name: str, depth: int) -> None:
+        self._read_group_text()
 
-def _extract_anchors(text: str) -> list[SemanticAnchor]:
-    anchors: list[SemanticAnchor] = []
-    sentence_pattern = re.compile(r"[^.!?]+[.!?]?")
+    def _accent(self, name: str, depth: int) -> None:
+        before, after = _ACCENTS[name]
+        self.out.word(before)
+        self._argument(depth + 1)
+        self.out.word(after)
 
-    for sentence_match in sentence_pattern.finditer(text):
-        sentence = sentence_match.group().strip()
-        if not sentence:
-            continue
+    def _big_operator(self, name: str, depth: int) -> None:
+        spoken, lower_word = _BIG_OPERATORS[name]
+        self.out.word(spoken)
+        for _ in range(2):
+            nxt = self._peek_non_space()
+            if nxt is None or self.tokens[nxt][0] not in ("sub", "sup"):
+                break
+            self.pos = nxt + 1
+            self.out.word(lower_word if self.tokens[nxt][0] == "sub" else "to")
+            self._argument(depth + 1)
+        self.out.word("of")
 
-        lower = sentence.lower()
-        anchor_type, label = _classify_anchor(lower)
-        if anchor_type is None:
-            continue
+    def _begin(self, name: str, depth: int) -> None:
+        environment = self._read_group_text().rstrip("*")
+        self.out.word(_ENVIRONMENTS.get(environment, ""))
+        self.out.space()
 
-        anchors.append(
-            SemanticAnchor(
-                anchor_id=f"anchor_{len(anchors) + 1}",
-                anchor_type=anchor_type,
-                span_start=sentence_match.start(),
-                span_end=sentence_match.end(),
-                label=label,
-                text=sentence,
-            )
+    def _end(self, name: str, depth: int) -> None:
+        self._read_group_text()
+        self.out.space()
+
+    def _superscript(self, depth: int) -> None:
+        exponent = self._peek_simple_argument()
+        if exponent in ("2", "3"):
+            self._consume_simple_argument()
+            self.out.word("squared" if exponent == "2" else "cubed")
+            return
+        self.out.word("to the power of")
+        self._argument(depth + 1)
+
+    def _subscript(self, depth: int) -> None:
+        if self.pos < len(self.tokens):
+            kind, text = self.tokens[self.pos]
+            head = _HEAD_RE.match(text) if kind == "text" else None
+            if kind in ("lbrace", "cmd") or (head is not None and len(head.group()) <= 2):
+                self.out.word("sub")
+                self._argument(depth + 1)
+                return
+        self.out.raw("_")
+
+    def _operator(self, symbol: str) -> None:
+        last = self.out.last
+        left_ok = last.isalnum() or last == ")"
+        nxt = self._peek_non_space()
+        right_ok = False
+        if nxt is not None:
+            kind, text = self.tokens[nxt]
+            right_ok = kind in ("cmd", "lbrace") or (kind == "text" and (text[0].isalnum() or text[0] == "("))
+        if left_ok and right_ok and not self._is_hyphen(symbol):
+            self.out.word(_OPERATOR_WORDS[symbol])
+        else:
+            self.out.raw(symbol)
+
+    def _is_hyphen(self, symbol: str) -> bool:
+        """``well-known`` is a hyphenated word, not ``well minus known``."""
+        if symbol != "-" or self.pos < 2 or self.pos >= len(self.tokens):
+            return False
+        before_kind, before = self.tokens[self.pos - 2]
+        after_kind, after = self.tokens[self.pos]
+        return (
+            before_kind == "text"
+            and after_kind == "text"
+            and before[-2:].isalpha()
+            and after[:2].isalpha()
         )
 
+    def _escape(self, char: str) -> None:
+        if char in _ESCAPES:
+            self.out.word(_ESCAPES[char])
+        elif char in "{}_":
+            self.out.raw(char)
+        else:
+            # \\ line breaks, \, spacing and \( \) \[ \] math delimiters.
+            self.out.space()
+
+    def _skip_spaces(self) -> None:
+        while self.pos < len(self.tokens) and self.tokens[self.pos][0] == "space":
+            self.pos += 1
+
+    def _peek_non_space(self) -> int | None:
+        index = self.pos
+        while index < len(self.tokens) and self.tokens[index][0] == "space":
+            index += 1
+        return index if index < len(self.tokens) else None
+
+    def _take_head(self, single_char: bool = False) -> str:
+        """Split the leading alphanumeric run (or character) off the current text token."""
+        text = self.tokens[self.pos][1]
+        match = _HEAD_RE.match(text)
+        if match is None:
+            return ""
+        head = match.group()[:1] if single_char else match.group()
+        rest = text[len(head):]
+        if rest:
+            self.tokens[self.pos] = ("text", rest)
+        else:
+            self.pos += 1
+        return head
+
+    def _peek_simple_argument(self) -> str | None:
+        """Return the next argument's text when it is a bare word or ``{word}``."""
+        index = self._peek_non_space()
+        if index is None:
+            return None
+        kind, text = self.tokens[index]
+        if kind == "text":
+            match = _HEAD_RE.match(text)
+            return match.group() if match else None
+        if kind == "lbrace" and index + 2 < len(self.tokens):
+            inner_kind, inner = self.tokens[index + 1]
+            if inner_kind == "text" and self.tokens[index + 2][0] == "rbrace":
+                return inner.strip()
+        return None
+
+    def _consume_simple_argument(self) -> None:
+        """Skip the argument ``_peek_simple_argument`` just looked at."""
+        self._skip_spaces()
+        if self.tokens[self.pos][0] == "lbrace":
+            self.pos += 3
+        else:
+            self._take_head()
+
+    def _optional_argument(self) -> str:
+        """Consume a ``[...]`` argument and return its raw text."""
+        index = self._peek_non_space()
+        if index is None or not self.tokens[index][1].startswith("["):
+            return ""
+        parts: list[str] = []
+        text = self.tokens[index][1][1:]
+        while True:
+            if "]" in text:
+                inside, _, after = text.partition("]")
+                parts.append(inside)
+                if after:
+                    self.tokens[index] = ("text", after)
+                    self.pos = index
+                else:
+                    self.pos = index + 1
+                break
+            parts.append(text)
+            index += 1
+            if index >= len(self.tokens):
+                self.pos = index
+                break
+            text = self.tokens[index][1]
+        return "".join(parts).strip()
+
+    def _read_group_text(self) -> str:
+        """Consume a ``{...}`` argument without speaking it and return its raw text."""
+        self._skip_spaces()
+        if self.pos >= len(self.tokens) or self.tokens[self.pos][0] != "lbrace":
+            return ""
+        self.pos += 1
+        level = 1
+        parts: list[str] = []
+        while self.pos < len(self.tokens):
+            kind, text = self.tokens[self.pos]
+            self.pos += 1
+            if kind == "lbrace":
+                level += 1
+            elif kind == "rbrace":
+                level -= 1
+                if level == 0:
+                    break
+            parts.append(text)
+        return "".join(parts).strip()
+
+
+_CommandHandler = Callable[[_Verbalizer, str, int], None]
+
+_COMMANDS: dict[str, _CommandHandler] = {
+    "frac": _Verbalizer._frac,
+    "dfrac": _Verbalizer._frac,
+    "tfrac": _Verbalizer._frac,
+    "sqrt": _Verbalizer._sqrt,
+    "begin": _Verbalizer._begin,
+    "end": _Verbalizer._end,
+    **{name: _Verbalizer._passthrough for name in _PASSTHROUGH},
+    **{name: _Verbalizer._drop_argument for name in _DROP_ARGUMENT},
+    **{name: _Verbalizer._accent for name in _ACCENTS},
+    **{name: _Verbalizer._big_operator for name in _BIG_OPERATORS},
+}
+
+
+def _extract_anchors(text: str) -> list[AnchorSpan]:
+    """Find anchors in one scan for trigger phrases and math keywords.
+
+    Sentence bounds are only located around hits, so sentences without any
+    trigger or keyword cost nothing beyond the scan itself.
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        source, scanner = lowered, _ANCHOR_SCAN_RE
+    else:
+        # Some characters change length when lowercased; keep offsets exact.
+        source, scanner = text, _ANCHOR_SCAN_NOCASE_RE
+
+    anchors: list[AnchorSpan] = []
+    sentence_start = sentence_end = content_start = content_end = 0
+    text_end = len(source.rstrip())
+    found = 0
+
+    for match in scanner.finditer(source):
+        pos = match.start()
+        if pos >= sentence_end:
+            if found:
+                _append_anchor(anchors, text, sentence_start, sentence_end, found)
+                found = 0
+            # Sentences are "[^.!?]+[.!?]?": start after the last terminator before the hit.
+            last = max(
+                source.rfind(".", sentence_end, pos),
+                source.rfind("!", sentence_end, pos),
+                source.rfind("?", sentence_end, pos),
+            )
+            sentence_start = last + 1 if last >= 0 else sentence_end
+            end_match = _SENTENCE_END_RE.search(source, pos)
+            sentence_end = end_match.end() if end_match else len(source)
+            content_start = _LEADING_SPACE_RE.match(source, sentence_start).end()
+            content_end = min(sentence_end, text_end)
+
+        hit = match.group().lower()
+        bit = _PHRASE_BITS[hit]
+        if bit & _KEYWORD_MASK:
+            # Keywords count only inside the stripped sentence, spaces included.
+            end = match.end()
+            if pos >= content_start and (
+                hit not in _SPACED_KEYWORDS or (end < content_end and source[end] == " ")
+            ):
+                found |= bit
+        elif _is_word_bounded(source, pos, match.end()):
+            found |= bit
+
+    if found:
+        _append_anchor(anchors, text, sentence_start, sentence_end, found)
     return anchors
 
 
-def _classify_anchor(sentence_lower: str) -> tuple[str | None, str]:
-    if any(re.search(pattern, sentence_lower) for pattern in _STUDENT_PATTERNS):
+def _is_word_bounded(source: str, start: int, end: int) -> bool:
+    before = source[start - 1] if start > 0 else " "
+    after = source[end] if end < len(source) else " "
+    return not (before.isalnum() or before == "_" or after.isalnum() or after == "_")
+
+
+def _append_anchor(anchors: list[AnchorSpan], text: str, start: int, end: int, found: int) -> None:
+    classified = _classify_anchor(found)
+    if classified is None:
+        return
+    sentence = text[start:end].strip()
+    if not sentence:
+        return
+    anchor_type, label = classified
+    anchors.append(
+        AnchorSpan(
+            anchor_id=f"anchor_{len(anchors) + 1}",
+            anchor_type=anchor_type,
+            span_start=start,
+            span_end=end,
+            label=label,
+            text=sentence,
+        )
+    )
+
+
+def _classify_anchor(found: int) -> tuple[str, str] | None:
+    if found & _STUDENT_BIT:
         return "student_question", "Student Question"
-    if any(re.search(pattern, sentence_lower) for pattern in _TRICK_PATTERNS):
+    if found & _TRICK_BIT:
         return "prof_trick", "Professor Trick"
-    if _is_math_heavy(sentence_lower):
+    if _is_math_heavy(found):
         return "math_proof", "Math Proof"
-    if any(re.search(pattern, sentence_lower) for pattern in _CONCEPT_PATTERNS):
+    if found & _CONCEPT_BIT:
         return "concept", "Concept"
-    return None, ""
-
-
-def _is_math_heavy(sentence_lower: str) -> bool:
-    math_keywords = (
-        " equals ",
-        " plus ",
-        " minus ",
-        " over ",
-        " square root ",
-        " squared",
-        " cubed",
-        " to the power of ",
-    )
-    score = sum(1 for token in math_keywords if token in sentence_lower)
-    return score >= 2
+    return None
+
 
+def _is_math_heavy(found: int) -> bool:
+    return (found & _KEYWORD_MASK).bit_count() >= 2
@@ -0,0 +1,43 @@
+"""Deferred imports for heavy third-party modules.
+
+``httpx = lazy_import("httpx")`` binds a module object whose code only runs on
+first attribute access, so importing the app does not pay for clients that a
+cold worker may not need yet. ``warm_imports`` forces them, e.g. right after
+startup, so the first student request does not pay either.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import sys
+from types import ModuleType
+
+_lazy_modules: dict[str, ModuleType] = {}
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Return ``name`` from ``sys.modules`` or register a lazily executed module for it."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    _lazy_modules[name] = module
+    return module
+
+
+def warm_imports() -> list[str]:
+    """Execute every still-deferred module; returns the names that were loaded."""
+    loaded = []
+    while _lazy_modules:
+        name, module = _lazy_modules.popitem()
+        if type(module) is not ModuleType:
+            module.__dict__  # any attribute access runs the deferred module body
+            loaded.append(name)
+    return loaded
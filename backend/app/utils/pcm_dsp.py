@@ -0,0 +1,198 @@
+"""Streaming loudness normalization, peak limiting and edge-silence trimming for PCM.
+
+``PcmProcessor`` takes 16-bit little-endian mono PCM in chunks of any size and
+cuts it into fixed ``FRAME_MS`` frames. A partial frame carries over to the
+next chunk. Frames are analysed and scaled with NumPy a chunk at a time; only
+the per-frame gain bookkeeping is scalar. Every frame passes three stages:
+
+* Trimming. Silent frames (RMS below ``silence_dbfs``) before a segment's first
+  voiced frame are dropped, except the last ``pad_ms`` before speech. Silence
+  after speech is held back and released if speech resumes, so pauses inside a
+  segment survive. ``end_segment`` keeps ``pad_ms`` of the held silence and
+  drops the rest.
+* Normalization. The gain tracks ``target_dbfs`` against a running RMS of the
+  voiced frames, within ``max_gain_db`` either way. It ramps across each frame,
+  so a gain change never steps.
+* Limiting. With one frame of lookahead, the limiter lowers the gain before a
+  peak arrives. Peaks therefore stay under ``ceiling_dbfs`` without clipping.
+
+Output trails input by one frame. Only silence is held longer, and only while
+it could still be a trailing edge. Gain and limiter state outlive
+``end_segment``, so consecutive segments of one answer level to the same
+loudness. NumPy (in requirements.txt) is imported lazily, so a cold start does
+not pay for it. If it is missing, the app logs a warning at startup and callers
+stream audio unprocessed (see ``numpy_available``).
+"""
+
+from __future__ import annotations
+
+from collections import deque
+import math
+
+from app.utils.lazy import lazy_import
+
+try:
+    np = lazy_import("numpy")
+except ModuleNotFoundError:  # audio passes through unprocessed
+    np = None
+
+FRAME_MS = 20
+SAMPLE_BYTES = 2
+# Weight of each voiced frame in the running loudness, about 400 ms at 20 ms frames.
+LOUDNESS_WEIGHT = 0.05
+# Voiced frames this far below the running loudness (20 dB) do not update it.
+LOUDNESS_GATE = 0.01
+LIMITER_RELEASE_DB_PER_S = 12.0
+# A pause held longer than this is released; it is not treated as a trailing edge.
+MAX_HELD_SILENCE_S = 10.0
+
+
+def numpy_available() -> bool:
+    return np is not None
+
+
+def db_to_amplitude(db: float) -> float:
+    return 10.0 ** (db / 20.0)
+
+
+class PcmProcessor:
+    def __init__(
+        self,
+        sample_rate: int = 24000,
+        target_dbfs: float = -20.0,
+        ceiling_dbfs: float = -1.0,
+        silence_dbfs: float = -50.0,
+        max_gain_db: float = 12.0,
+        pad_ms: float = 40.0,
+        frame_ms: int = FRAME_MS,
+    ) -> None:
+        if np is None:
+            raise RuntimeError("PcmProcessor requires numpy")
+        self.sample_rate = sample_rate
+        self.frame_samples = max(sample_rate * frame_ms // 1000, 1)
+        self.frame_bytes = self.frame_samples * SAMPLE_BYTES
+        self.target_power = db_to_amplitude(target_dbfs) ** 2
+        self.ceiling = db_to_amplitude(ceiling_dbfs)
+        self.silence_power = db_to_amplitude(silence_dbfs) ** 2
+        self.max_gain = db_to_amplitude(abs(max_gain_db))
+        self.pad_frames = max(round(pad_ms / frame_ms), 0)
+        self.max_held_frames = max(int(MAX_HELD_SILENCE_S * 1000 / frame_ms), self.pad_frames, 1)
+        self.release = db_to_amplitude(LIMITER_RELEASE_DB_PER_S * frame_ms / 1000)
+        self._ramp = np.arange(1, self.frame_samples + 1, dtype=np.float32) / self.frame_samples
+
+        self._remainder = b""
+        self._loudness: float | None = None  # running mean square of voiced frames
+        self._voiced_frames = 0
+        self._gain = 1.0
+        self._limit = 1.0
+        self._voiced = False  # the current segment has had speech
+        self._silence: deque[tuple[np.ndarray, float]] = deque()
+        self._pending: tuple[np.ndarray, float] | None = None
+        self.frames_in = 0
+        self.frames_trimmed = 0
+
+    @property
+    def trimmed_ms(self) -> float:
+        return self.frames_trimmed * self.frame_samples * 1000.0 / self.sample_rate
+
+    @property
+    def gain_db(self) -> float:
+        return 20.0 * math.log10(self._gain * self._limit)
+
+    def process(self, data: bytes) -> bytes:
+        """Feed one chunk and return the processed frames that are ready."""
+        buffer = self._remainder + data if self._remainder else data
+        count = len(buffer) // self.frame_bytes
+        self._remainder = bytes(buffer[count * self.frame_bytes:])
+        if not count:
+            return b""
+        block = np.frombuffer(buffer, dtype="<i2", count=count * self.frame_samples)
+        block = block.reshape(count, self.frame_samples).astype(np.float32) / 32768.0
+        powers = np.einsum("ij,ij->i", block, block) / self.frame_samples
+        peaks = np.abs(block).max(axis=1)
+        out: list[tuple[np.ndarray, float, float]] = []
+        for frame, power, peak in zip(block, powers.tolist(), peaks.tolist()):
+            self._push(frame, power, peak, out)
+        return self._render(out)
+
+    def end_segment(self) -> bytes:
+        """Flush the segment: emit the partial frame and lookahead, trim trailing silence.
+
+        Loudness, gain and limiter state carry over to the next segment.
+        """
+        out: list[tuple[np.ndarray, float, float]] = []
+        tail = self._remainder[: len(self._remainder) - len(self._remainder) % SAMPLE_BYTES]
+        self._remainder = b""
+        if tail:
+            frame = np.frombuffer(tail, dtype="<i2").astype(np.float32) / 32768.0
+            self._push(frame, float(np.dot(frame, frame)) / len(frame), float(np.abs(frame).max()), out)
+        if self._voiced:
+            for _ in range(min(self.pad_frames, len(self._silence))):
+                self._lookahead(*self._silence.popleft(), out)
+        self.frames_trimmed += len(self._silence)
+        self._silence.clear()
+        if self._pending is not None:
+            self._emit(*self._pending, 0.0, out)
+            self._pending = None
+        self._voiced = False
+        return self._render(out)
+
+    def _push(self, frame: np.ndarray, power: float, peak: float, out: list) -> None:
+        self.frames_in += 1
+        if power < self.silence_power:
+            self._silence.append((frame, peak))
+            held = self.max_held_frames if self._voiced else self.pad_frames
+            while len(self._silence) > held:
+                if self._voiced:
+                    self._lookahead(*self._silence.popleft(), out)
+                else:
+                    self._silence.popleft()
+                    self.frames_trimmed += 1
+            return
+
+        if self._loudness is None:
+            self._loudness = power
+        elif power > self._loudness * LOUDNESS_GATE:
+            # A plain mean until the window fills, so the first frames are not skewed by the start value.
+            self._voiced_frames += 1
+            weight = max(1.0 / (self._voiced_frames + 1), LOUDNESS_WEIGHT)
+            self._loudness += weight * (power - self._loudness)
+        self._voiced = True
+        while self._silence:
+            self._lookahead(*self._silence.popleft(), out)
+        self._lookahead(frame, peak, out)
+
+    def _lookahead(self, frame: np.ndarray, peak: float, out: list) -> None:
+        if self._pending is not None:
+            self._emit(*self._pending, peak, out)
+        self._pending = (frame, peak)
+
+    def _emit(self, frame: np.ndarray, peak: float, next_peak: float, out: list) -> None:
+        start_gain = self._gain
+        if self._loudness:
+            wanted = math.sqrt(self.target_power / self._loudness)
+            self._gain = min(max(wanted, 1.0 / self.max_gain), self.max_gain)
+        # The limiter gain at the end of this frame is where the next one starts,
+        # so it must already hold the next frame's peak under the ceiling.
+        loudest = max(peak * max(start_gain, self._gain), next_peak * self._gain)
+        limit = min(1.0, self._limit * self.release, self.ceiling / loudest if loudest > 0 else 1.0)
+        out.append((frame, start_gain * self._limit, self._gain * limit))
+        self._limit = limit
+
+    def _render(self, out: list[tuple[np.ndarray, float, float]]) -> bytes:
+        if not out:
+            return b""
+        frames, starts, ends = zip(*out)
+        if len(frames[-1]) == self.frame_samples:
+            return self._scale(np.stack(frames), starts, ends)
+        # Only the last frame of a segment can be short.
+        head = self._scale(np.stack(frames[:-1]), starts[:-1], ends[:-1]) if len(out) > 1 else b""
+        return head + self._scale(frames[-1][None, :], starts[-1:], ends[-1:])
+
+    def _scale(self, frames: np.ndarray, starts, ends) -> bytes:
+        length = frames.shape[1]
+        ramp = self._ramp if length == self.frame_samples else np.arange(1, length + 1, dtype=np.float32) / length
+        start = np.asarray(starts, dtype=np.float32)[:, None]
+        end = np.asarray(ends, dtype=np.float32)[:, None]
+        scaled = frames * (start + (end - start) * ramp) * 32768.0
+        return np.clip(np.rint(scaled), -32768, 32767).astype("<i2").tobytes()
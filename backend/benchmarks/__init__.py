@@ -0,0 +1 @@
+"""Micro- and end-to-end benchmarks for the backend. Run modules with ``python -m benchmarks.<name>``."""
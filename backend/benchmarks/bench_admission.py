@@ -0,0 +1,117 @@
+"""Interactive ``/ask`` latency during a bulk ``/ask/analyze`` flood, with and without admission control.
+
+Both routes share a simulated upstream that serves ``--upstream-slots``
+requests at a time, FIFO, the way a per-key Gemini quota does. A burst of bulk
+analyze calls arrives first, then interactive questions at a steady rate. The
+requests go through ``AdmissionMiddleware`` on a small FastAPI app. The report
+shows interactive p50/p95 and how many bulk requests were shed with 503.
+
+    python -m benchmarks.bench_admission
+    python -m benchmarks.bench_admission --bulk 200 --bulk-concurrency 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from fastapi import FastAPI
+import httpx
+
+from app.services.admission import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_QUEUE,
+    PRIORITIES,
+    AdmissionClass,
+    AdmissionController,
+    AdmissionMiddleware,
+)
+
+
+def build_app(upstream: asyncio.Semaphore, args: argparse.Namespace, admission: bool) -> FastAPI:
+    app = FastAPI()
+
+    async def call_upstream(seconds: float) -> None:
+        async with upstream:
+            await asyncio.sleep(seconds)
+
+    @app.post("/ask")
+    async def ask() -> dict:
+        await call_upstream(args.ask_ms / 1000.0)
+        return {"answer": "ok"}
+
+    @app.post("/ask/analyze")
+    async def analyze() -> dict:
+        await call_upstream(args.analyze_ms / 1000.0)
+        return {"slides": []}
+
+    if admission:
+        concurrency = {**DEFAULT_CONCURRENCY, "bulk": args.bulk_concurrency}
+        controller = AdmissionController(
+            (AdmissionClass(name, priority, concurrency[name], DEFAULT_QUEUE[name]) for name, priority in PRIORITIES.items()),
+            max_in_flight=96,
+        )
+        app.add_middleware(AdmissionMiddleware, controller=controller)
+    return app
+
+
+async def run(args: argparse.Namespace, admission: bool) -> tuple[list[float], int, int, float]:
+    upstream = asyncio.Semaphore(args.upstream_slots)
+    app = build_app(upstream, args, admission)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120.0) as client:
+
+        async def timed(path: str) -> tuple[float, int]:
+            started = time.perf_counter()
+            response = await client.post(path)
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        bulk = [asyncio.create_task(timed("/ask/analyze")) for _ in range(args.bulk)]
+        await asyncio.sleep(0.01)
+        interactive = []
+        for _ in range(args.asks):
+            interactive.append(asyncio.create_task(timed("/ask")))
+            await asyncio.sleep(args.ask_interval_ms / 1000.0)
+        asks = await asyncio.gather(*interactive)
+        bulk_results = await asyncio.gather(*bulk)
+        elapsed = time.perf_counter() - started
+
+    latencies = [seconds for seconds, status in asks if status == 200]
+    bulk_ok = sum(status == 200 for _, status in bulk_results)
+    shed = sum(status == 503 for _, status in bulk_results)
+    return latencies, bulk_ok, shed, elapsed
+
+
+def _pct(values: list[float], pct: float) -> float:
+    return statistics.quantiles(values, n=100)[pct - 1] * 1000.0 if len(values) > 1 else values[0] * 1000.0
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Admission control under a bulk flood.")
+    parser.add_argument("--bulk", type=int, default=40)
+    parser.add_argument("--asks", type=int, default=40)
+    parser.add_argument("--upstream-slots", type=int, default=4)
+    parser.add_argument("--bulk-concurrency", type=int, default=DEFAULT_CONCURRENCY["bulk"])
+    parser.add_argument("--analyze-ms", type=float, default=200.0)
+    parser.add_argument("--ask-ms", type=float, default=50.0)
+    parser.add_argument("--ask-interval-ms", type=float, default=25.0)
+    args = parser.parse_args()
+
+    print(
+        f"{args.bulk} bulk analyze ({args.analyze_ms:.0f} ms) then {args.asks} asks ({args.ask_ms:.0f} ms) "
+        f"every {args.ask_interval_ms:.0f} ms over {args.upstream_slots} upstream slots"
+    )
+    for admission in (False, True):
+        latencies, bulk_ok, shed, elapsed = await run(args, admission)
+        label = f"admission (bulk={args.bulk_concurrency})" if admission else "no admission"
+        print(
+            f"  {label:22s} /ask p50 {_pct(latencies, 50):7.1f} ms  p95 {_pct(latencies, 95):7.1f} ms  "
+            f"bulk ok {bulk_ok:3d}  shed {shed:3d}  total {elapsed:5.2f} s"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
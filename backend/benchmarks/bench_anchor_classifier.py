@@ -0,0 +1,104 @@
+"""Benchmark for semantic anchor extraction over long teaching scripts.
+
+Compares the one-scan classifier in ``app.utils.latex_parser`` against the
+previous per-sentence, per-pattern ``re.search`` approach that built a
+pydantic ``SemanticAnchor`` for every hit (reproduced below).
+
+    python -m benchmarks.bench_anchor_classifier
+"""
+
+from __future__ import annotations
+
+import re
+import time
+
+from app.models.lightning import SemanticAnchor
+from app.utils.latex_parser import _extract_anchors
+
+SCRIPT_PARAGRAPH = (
+    "A student asked about the radius: x squared plus y squared equals r squared. "
+    "The prof's trick is to always check the units first. "
+    "Core concept: the derivative measures change. "
+    "Then a plus b over c equals the square root of x. "
+    "We move on to the next example without any math at all! "
+    "Why does this matter? Because the key idea repeats. "
+    "So x equals minus three. Then y to the power of minus one. x plus minus y is weird.\n"
+)
+
+PROSE_PARAGRAPH = (
+    "Today we continue where the last lecture left off. "
+    "Recall that a function assigns each input exactly one output. "
+    "We will look at several examples before the break, and then discuss the homework. "
+    "Please keep your notes from last week nearby. "
+    "The key idea for today is continuity.\n"
+)
+
+
+def legacy_extract_anchors(text: str) -> list[SemanticAnchor]:
+    student = (r"\ba student asked\b", r"\bstudent question\b")
+    trick = (r"\bprof(?:essor)?'?s trick\b", r"\bprofessor'?s trick\b")
+    concept = (r"\bcore concept\b", r"\bimportant point\b", r"\bkey idea\b")
+    keywords = (" equals ", " plus ", " minus ", " over ", " square root ", " squared", " cubed", " to the power of ")
+
+    anchors: list[SemanticAnchor] = []
+    for sentence_match in re.compile(r"[^.!?]+[.!?]?").finditer(text):
+        sentence = sentence_match.group().strip()
+        if not sentence:
+            continue
+        lower = sentence.lower()
+        if any(re.search(p, lower) for p in student):
+            anchor_type, label = "student_question", "Student Question"
+        elif any(re.search(p, lower) for p in trick):
+            anchor_type, label = "prof_trick", "Professor Trick"
+        elif sum(1 for k in keywords if k in lower) >= 2:
+            anchor_type, label = "math_proof", "Math Proof"
+        elif any(re.search(p, lower) for p in concept):
+            anchor_type, label = "concept", "Concept"
+        else:
+            continue
+        anchors.append(
+            SemanticAnchor(
+                anchor_id=f"anchor_{len(anchors) + 1}",
+                anchor_type=anchor_type,
+                span_start=sentence_match.start(),
+                span_end=sentence_match.end(),
+                label=label,
+                text=sentence,
+            )
+        )
+    return anchors
+
+
+def _time(fn, text: str, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0
+
+
+def main() -> None:
+    for title, paragraph in (("Anchor-dense script", SCRIPT_PARAGRAPH), ("Mostly prose script", PROSE_PARAGRAPH)):
+        print(title)
+        _report(paragraph)
+        print()
+
+
+def _report(paragraph: str) -> None:
+    print(f"{'paras':>6} {'chars':>9} {'anchors':>8} {'legacy ms':>10} {'one-scan ms':>12} {'speedup':>8} {'same':>5}")
+    for paragraphs in (10, 100, 1000, 5000):
+        text = paragraph * paragraphs
+        legacy = legacy_extract_anchors(text)
+        current = _extract_anchors(text)
+        same = [a.model_dump() for a in legacy] == [c.to_model().model_dump() for c in current]
+        legacy_ms = _time(legacy_extract_anchors, text)
+        new_ms = _time(_extract_anchors, text)
+        print(
+            f"{paragraphs:>6} {len(text):>9} {len(current):>8} {legacy_ms:>10.2f} {new_ms:>12.2f} "
+            f"{legacy_ms / new_ms:>7.1f}x {str(same):>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""FAQ pre-generation: one ``/ask`` call per question, serially, vs ``POST /ask/batch``.
+
+Starts the stand-ins and the app like ``bench_e2e``. ``--questions`` questions
+are generated, and ``--duplicates`` of them repeat an earlier question with
+different case and punctuation, the way FAQ lists do. Each mode gets its own
+question text, so the answer cache never carries over between runs. The report
+gives wall time and questions per second for serial ``/ask`` and for the batch
+endpoint at each ``--concurrency`` level.
+
+    python -m benchmarks.bench_ask_batch
+    python -m benchmarks.bench_ask_batch --questions 200 --concurrency 1 8 32
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import httpx
+
+from benchmarks.bench_e2e import _free_port, _start, _wait_ready
+
+CONTEXT = "Lesson on limits, derivatives and the chain rule."
+
+
+def _questions(count: int, duplicates: int, tag: str) -> list[str]:
+    unique = [f"What does step {n} of the {tag} derivation show?" for n in range(count - duplicates)]
+    return unique + [unique[n % len(unique)].upper().rstrip("?") + "!" for n in range(duplicates)]
+
+
+async def run_serial(client: httpx.AsyncClient, base: str, questions: list[str]) -> float:
+    started = time.perf_counter()
+    for question in questions:
+        response = await client.post(f"{base}/ask", json={"question": question, "context": CONTEXT})
+        response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def run_batch(client: httpx.AsyncClient, base: str, questions: list[str], concurrency: int) -> tuple[float, dict]:
+    started = time.perf_counter()
+    summary: dict = {}
+    payload = {"questions": questions, "context": CONTEXT, "concurrency": concurrency}
+    async with client.stream("POST", f"{base}/ask/batch", json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line:
+                summary = json.loads(line)
+    return time.perf_counter() - started, summary
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Serial /ask vs /ask/batch for FAQ pre-generation.")
+    parser.add_argument("--questions", type=int, default=60)
+    parser.add_argument("--duplicates", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--gemini-latency-ms", type=float, default=300.0)
+    args = parser.parse_args()
+
+    stand_in_port, app_port = _free_port(), _free_port()
+    stand_in = f"http://127.0.0.1:{stand_in_port}"
+    env = {
+        **os.environ,
+        "SMALLEST_API_KEY": "bench",
+        "GEMINI_API_KEY": "bench",
+        "LOG_LEVEL": "WARNING",
+        "GEMINI_MODEL_URL": f"{stand_in}/v1beta/models/gemini-2.5-flash",
+        "ASK_BATCH_CONCURRENCY": str(max(args.concurrency)),
+        "GEMINI_MAX_CONCURRENCY": str(max(args.concurrency)),
+        "ADMISSION_CONCURRENCY": json.dumps({"interactive": 64, "bulk": 64}),
+    }
+    processes = [
+        _start([
+            "-m", "benchmarks.stand_ins", "--port", str(stand_in_port),
+            "--gemini-latency-ms", str(args.gemini_latency_ms), "--gemini-jitter-ms", "0",
+        ], env),
+        _start(["-m", "uvicorn", "app.main:app", "--port", str(app_port), "--log-level", "warning"], env),
+    ]
+    base = f"http://127.0.0.1:{app_port}"
+    try:
+        await _wait_ready(f"{stand_in}/healthz")
+        await _wait_ready(f"{base}/health")
+        print(
+            f"{args.questions} questions ({args.duplicates} duplicates), "
+            f"Gemini {args.gemini_latency_ms:.0f} ms per answer"
+        )
+        async with httpx.AsyncClient(timeout=600.0) as client:
+            elapsed = await run_serial(client, base, _questions(args.questions, args.duplicates, "serial"))
+            print(f"  {'serial /ask':22s} {elapsed:6.2f} s  {args.questions / elapsed:6.1f} questions/s")
+            for concurrency in args.concurrency:
+                questions = _questions(args.questions, args.duplicates, f"batch-{concurrency}")
+                elapsed, summary = await run_batch(client, base, questions, concurrency)
+                print(
+                    f"  {f'/ask/batch x{concurrency}':22s} {elapsed:6.2f} s  {args.questions / elapsed:6.1f} questions/s"
+                    f"  unique {summary['unique']}  failed {summary['failed']}"
+                )
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,50 @@
+"""Benchmark for bulk teaching-script preprocessing.
+
+Parses a synthetic 200-lesson course three ways: one summary at a time, as a
+cold batch (process pool), and as a warm batch served from the parse cache.
+
+    python -m benchmarks.bench_batch_parse
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+from app.services import lightning_service
+from app.utils.latex_parser import latex_to_teaching_script
+
+LESSON_PARAGRAPH = (
+    "A student asked about the radius: $x^2 + y^2 = r^2$. "
+    "The prof's trick is to always check the units first. "
+    "Core concept: \\frac{d}{dx} \\left( \\frac{a+b}{c} \\right) = \\sqrt{x}. "
+    "\\begin{itemize} \\item \\textbf{Key idea}: $\\sum_{i=1}^{n} i = \\frac{n(n+1)}{2}$ \\end{itemize}\n"
+)
+
+
+def build_course(lessons: int = 200, paragraphs: int = 60) -> list[str]:
+    return [f"Lesson {n}. " + LESSON_PARAGRAPH * paragraphs for n in range(lessons)]
+
+
+async def main() -> None:
+    course = build_course()
+    chars = sum(len(lesson) for lesson in course)
+    print(f"{len(course)} lessons, {chars / 1e6:.2f} MB of LaTeX, {lightning_service.PARSE_POOL_WORKERS} workers")
+
+    start = time.perf_counter()
+    sequential = [latex_to_teaching_script(lesson) for lesson in course]
+    print(f"sequential:  {time.perf_counter() - start:7.3f} s")
+
+    start = time.perf_counter()
+    cold, _ = await lightning_service.parse_teaching_scripts(course)
+    print(f"batch cold:  {time.perf_counter() - start:7.3f} s")
+
+    start = time.perf_counter()
+    warm, cached = await lightning_service.parse_teaching_scripts(course)
+    print(f"batch warm:  {time.perf_counter() - start:7.3f} s ({cached} cached)")
+
+    assert [s.text for s in sequential] == [s.text for s in cold] == [s.text for s in warm]
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
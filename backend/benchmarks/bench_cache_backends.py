@@ -0,0 +1,100 @@
+"""Microbenchmark for the shared cache backends.
+
+Measures get/set latency of a small JSON answer and a 1 MB PCM clip on the
+in-process LRU, the SQLite file and the Redis-protocol client (against the
+RESP stand-in, or a real server with ``--redis-url``), then checks how many
+entries written by one worker process are visible to the others, as uvicorn
+workers would see them.
+
+    python -m benchmarks.bench_cache_backends
+    python -m benchmarks.bench_cache_backends --redis-url redis://127.0.0.1:6379/0
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import tempfile
+import time
+
+from app.utils.cache_backends import CacheBackend, MemoryBackend, RedisBackend, SQLiteBackend
+from benchmarks.stand_ins import serve_resp
+
+ANSWER = json.dumps({"answer": "The derivative is the slope of the tangent line. " * 40}).encode()
+PCM = bytes(1024 * 1024)
+
+
+async def time_backend(backend: CacheBackend, value: bytes, n: int) -> tuple[float, float]:
+    start = time.perf_counter()
+    for i in range(n):
+        await backend.set(f"k{i}", value)
+    set_us = (time.perf_counter() - start) / n * 1e6
+    start = time.perf_counter()
+    for i in range(n):
+        assert await backend.get(f"k{i}") is not None
+    get_us = (time.perf_counter() - start) / n * 1e6
+    return set_us, get_us
+
+
+def _worker(kind: str, target: str, worker: int, workers: int, keys: int) -> int:
+    async def run() -> int:
+        backend = MemoryBackend() if kind == "memory" else SQLiteBackend(target)
+        for i in range(keys):
+            await backend.set(f"w{worker}-{i}", ANSWER)
+        await asyncio.sleep(0.5)  # let the other workers finish writing
+        seen = 0
+        for other in range(workers):
+            for i in range(keys):
+                seen += await backend.get(f"w{other}-{i}") is not None
+        await backend.close()
+        return seen
+
+    return asyncio.run(run())
+
+
+def cross_process_hit_ratio(kind: str, target: str, workers: int = 4, keys: int = 50) -> float:
+    with ProcessPoolExecutor(workers) as pool:
+        seen = pool.map(_worker, [kind] * workers, [target] * workers, range(workers), [workers] * workers, [keys] * workers)
+        return sum(seen) / (workers * workers * keys)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Shared cache backend benchmark.")
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+
+    server = None
+    redis_url = args.redis_url
+    if redis_url is None:
+        server = await serve_resp()
+        redis_url = f"redis://127.0.0.1:{server.sockets[0].getsockname()[1]}/0"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_path = os.path.join(tmp, "cache.sqlite3")
+        backends = {
+            "memory": MemoryBackend(max_entries=4096, max_bytes=1 << 31),
+            "sqlite": SQLiteBackend(sqlite_path, max_entries=4096, max_bytes=1 << 31),
+            "redis": RedisBackend(redis_url),
+        }
+        for name, backend in backends.items():
+            small_set, small_get = await time_backend(backend, ANSWER, 500)
+            pcm_set, pcm_get = await time_backend(backend, PCM, 20)
+            print(
+                f"{name:7s} 2 KB set {small_set:8.1f} us  get {small_get:8.1f} us   "
+                f"1 MB set {pcm_set:8.1f} us  get {pcm_get:8.1f} us"
+            )
+            await backend.close()
+
+        for kind, target in (("memory", ""), ("sqlite", os.path.join(tmp, "shared.sqlite3"))):
+            print(f"{kind:7s} entries visible across 4 worker processes: {cross_process_hit_ratio(kind, target):.0%}")
+
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
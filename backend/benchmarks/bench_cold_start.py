@@ -0,0 +1,150 @@
+"""Cold-start profile of the app: import-time breakdown and time to first response.
+
+Runs ``python -X importtime -c "import app.main"`` in a fresh interpreter and
+reports the slowest modules by self and cumulative time plus a per-package
+rollup. It then starts uvicorn once per ``STARTUP_MODE``, pointed at the
+zero-latency Gemini stand-in. For each mode it measures the time from process
+start to the first ``/health`` response, then the first and second ``/ask``.
+
+    python -m benchmarks.bench_cold_start
+    python -m benchmarks.bench_cold_start --top 30 --modes lazy
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections import defaultdict
+from dataclasses import dataclass
+import os
+from pathlib import Path
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+ENV = {**os.environ, "SMALLEST_API_KEY": "bench", "GEMINI_API_KEY": "bench", "LOG_LEVEL": "WARNING"}
+
+
+@dataclass
+class ImportRecord:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def import_profile(target: str = "app.main") -> tuple[list[ImportRecord], float]:
+    """Return the ``-X importtime`` records for importing ``target`` and the wall time in seconds."""
+    code = f"import time; t = time.perf_counter(); import {target}; print(time.perf_counter() - t)"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_ROOT, env=ENV, capture_output=True, text=True, check=True,
+    )
+    records = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        records.append(ImportRecord(
+            module=name.strip(),
+            self_us=int(self_us),
+            cumulative_us=int(cumulative_us),
+            depth=(len(name) - len(name.lstrip())) // 2,
+        ))
+    return records, float(result.stdout.strip().splitlines()[-1])
+
+
+def rollup(records: list[ImportRecord]) -> list[tuple[str, int]]:
+    totals: dict[str, int] = defaultdict(int)
+    for record in records:
+        package = record.module.split(".")[0]
+        if package == "app":
+            package = ".".join(record.module.split(".")[:2])
+        totals[package] += record.self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(client: httpx.Client, path: str, started: float, timeout_s: float = 30.0) -> None:
+    while True:
+        try:
+            client.get(path).raise_for_status()
+            return
+        except httpx.TransportError:
+            if time.perf_counter() - started > timeout_s:
+                raise
+            time.sleep(0.005)
+
+
+def cold_start(mode: str, stand_in: str) -> tuple[float, float, float]:
+    """Return seconds to first /health, then the latency of the first and second /ask."""
+    port = _free_port()
+    env = {**ENV, "STARTUP_MODE": mode, "GEMINI_MODEL_URL": f"{stand_in}/v1beta/models/gemini-2.5-flash"}
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_ROOT, env=env,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30.0) as client:
+            _wait_for(client, "/health", started)
+            ready = time.perf_counter() - started
+            asks = []
+            for question in ("What is a derivative?", "What is an integral?"):
+                request_started = time.perf_counter()
+                client.post("/ask", json={"question": question}).raise_for_status()
+                asks.append(time.perf_counter() - request_started)
+            return ready, asks[0], asks[1]
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="App cold-start profile.")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--modes", nargs="+", default=["eager", "lazy"])
+    args = parser.parse_args()
+
+    records, wall_s = import_profile()
+    print(f"import app.main: {wall_s * 1000:.1f} ms wall, {len(records)} modules")
+    print(f"\nslowest by self time (top {args.top}):")
+    for record in sorted(records, key=lambda r: r.self_us, reverse=True)[: args.top]:
+        print(f"  {record.self_us / 1000:8.1f} ms  {record.module}")
+    print(f"\nslowest by cumulative time (top {args.top}):")
+    for record in sorted(records, key=lambda r: r.cumulative_us, reverse=True)[: args.top]:
+        print(f"  {record.cumulative_us / 1000:8.1f} ms  {'  ' * record.depth}{record.module}")
+    print(f"\nself time by package (top {args.top}):")
+    for package, self_us in rollup(records)[: args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  {package}")
+
+    stand_in_port = _free_port()
+    stand_in = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stand_ins", "--port", str(stand_in_port),
+         "--gemini-latency-ms", "0", "--gemini-jitter-ms", "0"],
+        cwd=BACKEND_ROOT, env=ENV,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{stand_in_port}") as client:
+            _wait_for(client, "/healthz", time.perf_counter())
+        print("\nuvicorn start to first /health, then first and second /ask:")
+        for mode in args.modes:
+            ready, first_ask, second_ask = cold_start(mode, f"http://127.0.0.1:{stand_in_port}")
+            print(
+                f"  STARTUP_MODE={mode:6s} ready {ready * 1000:8.1f} ms  "
+                f"first /ask {first_ask * 1000:7.1f} ms  second /ask {second_ask * 1000:7.1f} ms"
+            )
+    finally:
+        stand_in.terminate()
+        stand_in.wait(timeout=10)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""End-to-end load benchmark of the real backend against local stand-ins.
+
+Starts ``benchmarks.stand_ins`` and the FastAPI app (uvicorn) as separate
+processes, points the app at the stand-ins through its settings, drives each
+scenario at the requested concurrency and writes a JSON report:
+
+    python -m benchmarks.bench_e2e --concurrency 16 --requests 200
+    python -m benchmarks.bench_e2e --scenarios qa lesson --output before.json
+
+Scenarios: ``qa`` (POST /ask), ``slides`` (POST /ask/analyze), ``lesson``
+(POST /lightning/speak/stream) and ``live_stt`` (WS /pulse/live). Latency is
+request start to last byte, TTFB is request start to first body byte (first
+transcript message for live STT), and memory is the app process RSS.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+from dataclasses import asdict, dataclass, field
+import json
+import os
+from pathlib import Path
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Awaitable, Callable
+
+import httpx
+import websockets
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+SCENARIOS = ("qa", "slides", "lesson", "live_stt")
+
+LESSON_SUMMARY = (
+    "A student asked about the radius: $x^2 + y^2 = r^2$. "
+    "The prof's trick is to always check the units first. "
+    "Core concept: \\frac{d}{dx} x^2 = 2x. " * 4
+)
+SLIDE_IMAGE = base64.b64encode(bytes(2048)).decode("ascii")
+PCM_FRAME = bytes(3200)  # 100 ms of 16 kHz linear16 mono
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    requests: int
+    concurrency: int
+    errors: int = 0
+    wall_s: float = 0.0
+    throughput_rps: float = 0.0
+    latency_ms: dict[str, float] = field(default_factory=dict)
+    ttfb_ms: dict[str, float] = field(default_factory=dict)
+    rss_mb: dict[str, float | None] = field(default_factory=dict)
+    error_samples: list[str] = field(default_factory=list)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_mb(pid: int) -> float | None:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        return None
+    return None
+
+
+def _summary(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pct(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 2)
+
+    return {
+        "p50": pct(0.50),
+        "p95": pct(0.95),
+        "p99": pct(0.99),
+        "max": round(ordered[-1], 2),
+        "mean": round(statistics.fmean(ordered), 2),
+    }
+
+
+async def _wait_ready(url: str, timeout_s: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout_s}s")
+
+
+# Each scenario call returns (latency_s, ttfb_s) or raises.
+Call = Callable[[httpx.AsyncClient, str], Awaitable[tuple[float, float | None]]]
+
+
+async def call_qa(client: httpx.AsyncClient, base: str) -> tuple[float, float | None]:
+    start = time.perf_counter()
+    response = await client.post(f"{base}/ask", json={"question": "What does a derivative measure?"})
+    response.raise_for_status()
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+async def call_slides(client: httpx.AsyncClient, base: str) -> tuple[float, float | None]:
+    start = time.perf_counter()
+    response = await client.post(f"{base}/ask/analyze", json={"images": [SLIDE_IMAGE] * 6})
+    response.raise_for_status()
+    assert len(response.json()) == 6
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+async def call_lesson(client: httpx.AsyncClient, base: str) -> tuple[float, float | None]:
+    start = time.perf_counter()
+    ttfb = None
+    async with client.stream("POST", f"{base}/lightning/speak/stream", json={"latex_summary": LESSON_SUMMARY}) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            if chunk and ttfb is None:
+                ttfb = time.perf_counter() - start
+    return time.perf_counter() - start, ttfb
+
+
+async def call_live_stt(client: httpx.AsyncClient, base: str, frames: int = 50) -> tuple[float, float | None]:
+    start = time.perf_counter()
+    ttfb = None
+    async with websockets.connect(base.replace("http", "ws", 1) + "/pulse/live") as ws:
+        session = json.loads(await ws.recv())
+        assert session["type"] == "session"
+
+        async def send_audio() -> None:
+            for _ in range(frames):
+                await ws.send(PCM_FRAME)
+                await asyncio.sleep(0.01)
+            await ws.send(json.dumps({"type": "end"}))
+
+        sender = asyncio.create_task(send_audio())
+        try:
+            async for message in ws:
+                event = json.loads(message)
+                if "transcript" in event and ttfb is None:
+                    ttfb = time.perf_counter() - start
+                if event.get("is_last"):
+                    break
+        finally:
+            sender.cancel()
+    return time.perf_counter() - start, ttfb
+
+
+CALLS: dict[str, Call] = {
+    "qa": call_qa,
+    "slides": call_slides,
+    "lesson": call_lesson,
+    "live_stt": call_live_stt,
+}
+
+
+async def run_scenario(name: str, base: str, requests: int, concurrency: int, app_pid: int) -> ScenarioResult:
+    result = ScenarioResult(name=name, requests=requests, concurrency=concurrency)
+    latencies: list[float] = []
+    ttfbs: list[float] = []
+    call = CALLS[name]
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+
+    rss_start = _rss_mb(app_pid)
+    rss_peak = rss_start
+    sampling = True
+
+    async def sample_rss() -> None:
+        nonlocal rss_peak
+        while sampling:
+            rss = _rss_mb(app_pid)
+            if rss is not None and (rss_peak is None or rss > rss_peak):
+                rss_peak = rss
+            await asyncio.sleep(0.05)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=120.0, limits=limits) as client:
+
+        async def worker() -> None:
+            while not queue.empty():
+                queue.get_nowait()
+                try:
+                    latency, ttfb = await call(client, base)
+                except Exception as exc:
+                    result.errors += 1
+                    if len(result.error_samples) < 5:
+                        result.error_samples.append(f"{type(exc).__name__}: {exc}")
+                    continue
+                latencies.append(latency * 1000.0)
+                if ttfb is not None:
+                    ttfbs.append(ttfb * 1000.0)
+
+        sampler = asyncio.create_task(sample_rss())
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        result.wall_s = round(time.perf_counter() - start, 3)
+        sampling = False
+        await sampler
+
+    result.throughput_rps = round(len(latencies) / result.wall_s, 2) if result.wall_s else 0.0
+    result.latency_ms = _summary(latencies)
+    result.ttfb_ms = _summary(ttfbs)
+    rss_end = _rss_mb(app_pid)
+    result.rss_mb = {
+        label: round(value, 1) if value is not None else None
+        for label, value in (("start", rss_start), ("peak", rss_peak), ("end", rss_end))
+    }
+    return result
+
+
+def _start(args: list[str], env: dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], cwd=BACKEND_ROOT, env=env)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end backend benchmark against local stand-ins.")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--gemini-latency-ms", type=float, default=300.0)
+    parser.add_argument("--lightning-chunk-ms", type=float, default=20.0)
+    parser.add_argument(
+        "--app-env", action="append", default=[], metavar="KEY=VALUE",
+        help="Extra settings for the app process, e.g. GEMINI_MAX_CONCURRENCY=16",
+    )
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    stand_in_port, app_port = _free_port(), _free_port()
+    stand_in = f"http://127.0.0.1:{stand_in_port}"
+    env = {
+        **os.environ,
+        "SMALLEST_API_KEY": "bench",
+        "GEMINI_API_KEY": "bench",
+        "GEMINI_MODEL_URL": f"{stand_in}/v1beta/models/gemini-2.5-flash",
+        "LIGHTNING_API_URL": f"{stand_in}/lightning/stream",
+        "PULSE_API_URL": f"{stand_in}/pulse/get_text",
+        "PULSE_WS_URL": f"ws://127.0.0.1:{stand_in_port}/pulse/get_text",
+        "GEMINI_VISION_RATE_PER_S": "0",
+    }
+    env.update(item.split("=", 1) for item in args.app_env)
+
+    processes = [
+        _start([
+            "-m", "benchmarks.stand_ins", "--port", str(stand_in_port),
+            "--gemini-latency-ms", str(args.gemini_latency_ms),
+            "--lightning-chunk-ms", str(args.lightning_chunk_ms),
+        ], env),
+        _start(["-m", "uvicorn", "app.main:app", "--port", str(app_port), "--log-level", "warning"], env),
+    ]
+    app_pid = processes[1].pid
+    base = f"http://127.0.0.1:{app_port}"
+    try:
+        await _wait_ready(f"{stand_in}/healthz")
+        await _wait_ready(f"{base}/health")
+        results = []
+        for name in args.scenarios:
+            result = await run_scenario(name, base, args.requests, args.concurrency, app_pid)
+            results.append(result)
+            print(
+                f"{name:9s} {result.throughput_rps:8.2f} req/s  errors {result.errors:3d}  "
+                f"p50 {result.latency_ms.get('p50', 0):8.1f}  p95 {result.latency_ms.get('p95', 0):8.1f}  "
+                f"p99 {result.latency_ms.get('p99', 0):8.1f} ms  ttfb p50 {result.ttfb_ms.get('p50', 0):8.1f} ms  "
+                f"rss peak {result.rss_mb.get('peak')} MB"
+            )
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    output = args.output or BACKEND_ROOT / "benchmarks" / "results" / f"e2e-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "gemini_latency_ms": args.gemini_latency_ms,
+            "lightning_chunk_ms": args.lightning_chunk_ms,
+            "app_env": args.app_env,
+        },
+        "scenarios": [asdict(result) for result in results],
+    }
+    output.write_text(json.dumps(report, indent=2))
+    print(f"wrote {output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""Scaling benchmark for latex_to_teaching_script.
+
+Compares the single-pass tokenizer against the previous multi-pass regex
+pipeline (reproduced below as ``legacy_verbalize``) over growing lecture
+summaries and growing fraction nesting depth. Besides time per character it
+reports how many LaTeX commands each pipeline leaves unconverted: the legacy
+loops stay linear only because they give up after 10 passes.
+
+    python -m benchmarks.bench_latex_parser
+"""
+
+from __future__ import annotations
+
+import re
+import time
+
+from app.utils.latex_parser import _verbalize
+
+LESSON_PARAGRAPH = (
+    "A student asked about the radius: x^2 + y^2 = r^2. "
+    "The prof's trick is to check \\frac{a+b}{c} against \\sqrt{x^{n+1}} first. "
+    "Core concept: \\sum_{i=1}^{n} i = \\frac{n(n+1)}{2}, which is 50\\% of n^2 + n. "
+    "Then \\int_0^1 x^3 dx = \\frac{1}{4} and \\alpha \\leq \\beta.\\n"
+)
+
+
+def legacy_verbalize(text: str) -> str:
+    """The pre-tokenizer pipeline: one regex pass per rewrite, frac/sqrt looped up to 10 times."""
+    text = text.replace("\\n", " ").replace("\\%", " percent").replace("\\$", " dollar").replace("`", "'").strip()
+    frac = re.compile(r"\\frac\{([^{}]+)\}\{([^{}]+)\}")
+    for _ in range(10):
+        text, changed = frac.subn(r"\1 over \2", text)
+        if changed == 0:
+            break
+    sqrt = re.compile(r"\\sqrt\{([^{}]+)\}")
+    for _ in range(10):
+        text, changed = sqrt.subn(r"square root of \1", text)
+        if changed == 0:
+            break
+
+    def exponent(match: re.Match[str]) -> str:
+        value = (match.group("braced") or match.group("plain") or "").strip()
+        phrase = {"2": "squared", "3": "cubed"}.get(value, f"to the power of {value}")
+        return f"{match.group('base')} {phrase}"
+
+    text = re.sub(
+        r"(?P<base>[A-Za-z0-9\)\]])\s*\^\s*(?:\{(?P<braced>[^{}]+)\}|(?P<plain>[A-Za-z0-9]+))",
+        exponent,
+        text,
+    )
+    text = re.sub(r"(?<=[A-Za-z0-9\)])\s*\+\s*(?=[A-Za-z0-9\(])", " plus ", text)
+    text = re.sub(r"(?<=[A-Za-z0-9\)])\s*=\s*(?=[A-Za-z0-9\(])", " equals ", text)
+    text = re.sub(r"(?<=[A-Za-z0-9\)])\s*-\s*(?=[A-Za-z0-9\(])", " minus ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def nested_fraction(depth: int) -> str:
+    expr = "x"
+    for level in range(depth):
+        expr = f"\\frac{{{expr}}}{{y_{level} + 1}}"
+    return f"Consider {expr}. "
+
+
+def _time(fn, text: str, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0
+
+
+def _leftover(spoken: str) -> int:
+    """Count LaTeX commands that survived into the spoken script."""
+    return spoken.count("\\")
+
+
+def _report(title: str, label: str, inputs: list[tuple[int, str]]) -> None:
+    print(title)
+    print(
+        f"{label:>8} {'chars':>9} {'legacy ms':>10} {'tokenizer ms':>13} "
+        f"{'legacy ns/char':>15} {'tokenizer ns/char':>18} {'legacy leftover':>16} {'tokenizer leftover':>19}"
+    )
+    for size, text in inputs:
+        legacy_ms = _time(legacy_verbalize, text)
+        new_ms = _time(_verbalize, text)
+        chars = len(text)
+        print(
+            f"{size:>8} {chars:>9} {legacy_ms:>10.2f} {new_ms:>13.2f} "
+            f"{legacy_ms * 1e6 / chars:>15.1f} {new_ms * 1e6 / chars:>18.1f} "
+            f"{_leftover(legacy_verbalize(text)):>16} {_leftover(_verbalize(text)):>19}"
+        )
+    print()
+
+
+def main() -> None:
+    _report(
+        "Lecture summary length (paragraphs)",
+        "paras",
+        [(n, LESSON_PARAGRAPH * n) for n in (10, 100, 1000, 5000)],
+    )
+    # The legacy loops only unwrap one brace level per pass and stop after 10,
+    # so deep nests both cost more per level and are left half-converted.
+    _report(
+        "Fraction nesting depth (repeated 200 times)",
+        "depth",
+        [(d, nested_fraction(d) * 200) for d in (2, 8, 32, 128)],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Throughput and latency of the Lightning PCM post-processing stage.
+
+Synthesizes ``--segments`` speech-like segments of ``--seconds`` each. Each one
+is a syllable-rate modulated harmonic tone at a different level between -32 and
+-8 dBFS, with 300-800 ms of silence at both ends, the way Lightning pads its
+output. The segments are fed through one ``PcmProcessor`` in ``--chunk-ms``
+chunks, as the streaming path does. The report gives the realtime factor, the
+processing time per chunk, the silence trimmed, and the spread of segment
+loudness before and after. The added latency is fixed at one frame plus any
+partial frame waiting for the next chunk.
+
+    python -m benchmarks.bench_pcm_dsp
+    python -m benchmarks.bench_pcm_dsp --segments 40 --seconds 8 --chunk-ms 20 100 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from app.utils.pcm_dsp import FRAME_MS, PcmProcessor
+from benchmarks.bench_e2e import _summary
+
+SAMPLE_RATE = 24000
+
+
+def _segment(rng: np.random.Generator, level_dbfs: float, seconds: float) -> tuple[bytes, float]:
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    pitch = 110 + 40 * rng.random()
+    voice = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t + rng.random() * 6), 0, None) ** 0.5
+    speech = voice * syllables
+    speech *= 10 ** (level_dbfs / 20) / np.sqrt(np.mean(speech**2))
+    lead, trail = (np.zeros(int(SAMPLE_RATE * rng.uniform(0.3, 0.8))) for _ in range(2))
+    pcm = np.clip(np.rint(np.concatenate([lead, speech, trail]) * 32768), -32768, 32767).astype("<i2")
+    return pcm.tobytes(), len(speech) / SAMPLE_RATE
+
+
+def _voiced_dbfs(pcm: bytes) -> float:
+    samples = np.frombuffer(pcm, dtype="<i2").astype(np.float64) / 32768
+    frames = samples[: len(samples) // 480 * 480].reshape(-1, 480)
+    power = np.mean(frames**2, axis=1)
+    return float(10 * np.log10(np.mean(power[power > 1e-5])))
+
+
+def run(segments: list[bytes], chunk_ms: int) -> dict:
+    processor = PcmProcessor(sample_rate=SAMPLE_RATE)
+    chunk_bytes = SAMPLE_RATE * 2 * chunk_ms // 1000
+    chunk_us: list[float] = []
+    outputs: list[bytes] = []
+    started = time.perf_counter()
+    for segment in segments:
+        out = []
+        for offset in range(0, len(segment), chunk_bytes):
+            chunk_started = time.perf_counter()
+            out.append(processor.process(segment[offset:offset + chunk_bytes]))
+            chunk_us.append((time.perf_counter() - chunk_started) * 1e6)
+        out.append(processor.end_segment())
+        outputs.append(b"".join(out))
+    elapsed = time.perf_counter() - started
+    audio_s = sum(len(segment) for segment in segments) / (SAMPLE_RATE * 2)
+    return {
+        "realtime": audio_s / elapsed,
+        "mb_per_s": sum(len(segment) for segment in segments) / elapsed / 1e6,
+        "chunk_us": _summary(chunk_us),
+        "trimmed_s": processor.trimmed_ms / 1000,
+        "outputs": outputs,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Lightning PCM post-processing throughput.")
+    parser.add_argument("--segments", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=6.0)
+    parser.add_argument("--chunk-ms", type=int, nargs="+", default=[20, 100, 500])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    levels = np.linspace(-32, -8, args.segments)
+    rng.shuffle(levels)
+    generated = [_segment(rng, level, args.seconds) for level in levels]
+    segments = [pcm for pcm, _ in generated]
+    audio_s = sum(len(pcm) for pcm in segments) / (SAMPLE_RATE * 2)
+    speech_s = sum(seconds for _, seconds in generated)
+
+    before = [_voiced_dbfs(pcm) for pcm in segments]
+    print(
+        f"{args.segments} segments, {audio_s:.1f} s of audio ({audio_s - speech_s:.1f} s edge silence), "
+        f"{SAMPLE_RATE} Hz, {FRAME_MS} ms frames"
+    )
+    for chunk_ms in args.chunk_ms:
+        result = run(segments, chunk_ms)
+        after = [_voiced_dbfs(pcm) for pcm in result["outputs"]]
+        print(
+            f"  chunk {chunk_ms:4d} ms  {result['realtime']:8.0f}x realtime  {result['mb_per_s']:6.1f} MB/s"
+            f"  per chunk {result['chunk_us']} us"
+        )
+        print(
+            f"  {'':15s}trimmed {result['trimmed_s']:.1f} s  "
+            f"loudness spread {np.std(before):.1f} dB -> {np.std(after):.1f} dB"
+        )
+    print(f"  added latency: {FRAME_MS} ms lookahead plus any partial frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Serialization and compression cost of a 100-slide ``/ask/analyze`` response.
+
+Compares the encoders a ``list[SlideContext]`` body can go through, then
+drives the real route (with slide analysis stubbed out) through the app's
+middleware stack for each ``Accept-Encoding`` and reports time and wire bytes.
+
+    python -m benchmarks.bench_responses
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("SMALLEST_API_KEY", "bench")
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+import httpx  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.models.base import SlideContext  # noqa: E402
+import app.routes.ask as ask_routes  # noqa: E402
+from app.utils import compression  # noqa: E402
+
+WORDS = (
+    "the derivative limit tangent slope function integral area curve rate change velocity "
+    "acceleration theorem proof lemma matrix vector eigenvalue basis span"
+).split()
+
+
+def make_deck(slides: int = 100) -> list[SlideContext]:
+    rng = random.Random(1)
+
+    def text(n: int) -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(n))
+
+    return [SlideContext(slide_number=i + 1, description=text(120), text_content=text(250)) for i in range(slides)]
+
+
+def time_us(fn, n: int = 200) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+async def time_route(encoding: str, n: int = 100) -> tuple[float, int, str | None]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = {"Accept-Encoding": encoding}
+        response = await client.post("/ask/analyze", json={"images": ["x"]}, headers=headers)
+        start = time.perf_counter()
+        for _ in range(n):
+            response = await client.post("/ask/analyze", json={"images": ["x"]}, headers=headers)
+        elapsed = (time.perf_counter() - start) / n * 1e3
+        return elapsed, response.num_bytes_downloaded, response.headers.get("content-encoding")
+
+
+async def main() -> None:
+    deck = make_deck()
+    adapter = TypeAdapter(list[SlideContext])
+    body = adapter.dump_json(deck)
+    print(f"100-slide deck: {len(body)} bytes of JSON")
+    print(f"  jsonable_encoder + json.dumps:    {time_us(lambda: json.dumps(jsonable_encoder(deck)).encode()):8.1f} us")
+    print(f"  response_model validate + dump:   {time_us(lambda: adapter.dump_json(adapter.validate_python(deck))):8.1f} us")
+    print(f"  dump_json only (route now):       {time_us(lambda: adapter.dump_json(deck)):8.1f} us")
+    for encoding in ("gzip", "br") if compression.brotli is not None else ("gzip",):
+        compressed = compression.compress(body, encoding)
+        print(
+            f"  {encoding:4s} compress:                    "
+            f"{time_us(lambda: compression.compress(body, encoding), 20):8.1f} us  -> {len(compressed)} bytes"
+        )
+
+    async def analyze(images: list[str]) -> list[SlideContext]:
+        return deck
+
+    ask_routes.analyze_slides = analyze
+    print("\nPOST /ask/analyze through the middleware stack (client decode included):")
+    for encoding in ("identity", "gzip", "br"):
+        elapsed, wire, used = await time_route(encoding)
+        print(f"  Accept-Encoding {encoding:8s} {elapsed:6.2f} ms  {wire:7d} bytes on the wire  ({used or 'identity'})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+"""Microbenchmark for settings access on the request path.
+
+Compares building a fresh ``Settings()`` (re-reading ``.env`` and validating
+every field, as ``get_settings`` used to) with the cached snapshot, both as a
+bare call and as the ``Depends(get_settings)`` overhead of ``GET /health``.
+
+    python -m benchmarks.bench_settings
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+
+os.environ.setdefault("SMALLEST_API_KEY", "bench")
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+
+import httpx  # noqa: E402
+
+from app.config import Settings, get_settings  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+def time_calls(fn, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+async def time_requests(n: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/health")
+        start = time.perf_counter()
+        for _ in range(n):
+            await client.get("/health")
+        return (time.perf_counter() - start) / n * 1e6
+
+
+async def main() -> None:
+    print(f"Settings() per call:      {time_calls(Settings, 2_000):9.2f} us")
+    print(f"get_settings() cached:    {time_calls(get_settings, 200_000):9.2f} us")
+
+    app.dependency_overrides[get_settings] = lambda: Settings()
+    before = await time_requests(1_000)
+    app.dependency_overrides.clear()
+    after = await time_requests(1_000)
+    print(f"GET /health, rebuilt:     {before:9.2f} us")
+    print(f"GET /health, cached:      {after:9.2f} us")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
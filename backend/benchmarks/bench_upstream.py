@@ -0,0 +1,105 @@
+"""Benchmark of the upstream layer against a fake, quota-limited upstream.
+
+The fake upstream admits ``QUOTA_PER_S`` requests per second (429 with
+``Retry-After`` beyond that) and answers 5% of requests slowly. Q&A calls
+arrive at a rate below and above that quota, once sent as a single bare
+attempt each and once through ``Upstream`` with retries, a client-side
+token bucket and hedging.
+
+    python -m benchmarks.bench_upstream
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+
+from app.services.upstream import TokenBucket, Upstream, UpstreamPolicy
+
+QUOTA_PER_S = 20.0
+REQUESTS = 200
+ARRIVAL_RATES = (10.0, 24.0)
+FAST_S = 0.03
+SLOW_S = 0.8
+SLOW_RATIO = 0.05
+
+
+def fake_upstream(seed: int) -> httpx.MockTransport:
+    quota = TokenBucket(QUOTA_PER_S, burst=5)
+    rng = random.Random(seed)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if quota._take() > 0:
+            return httpx.Response(429, headers={"Retry-After": "0.2"})
+        await asyncio.sleep(SLOW_S if rng.random() < SLOW_RATIO else FAST_S)
+        return httpx.Response(200, json={"answer": "ok"})
+
+    return httpx.MockTransport(handler)
+
+
+async def run(label: str, upstream: Upstream | None, arrivals_per_s: float, seed: int) -> None:
+    client = httpx.AsyncClient(transport=fake_upstream(seed))
+    arrivals = random.Random(seed)
+    latencies: list[float] = []
+    errors = 0
+
+    async def attempt(timeout: float) -> dict:
+        response = await client.post("https://gemini.test/", timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    async def one() -> None:
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            if upstream is None:
+                await attempt(30.0)
+            else:
+                await upstream.call(attempt, hedge=True)
+        except httpx.HTTPStatusError:
+            errors += 1
+            return
+        latencies.append((time.perf_counter() - start) * 1000.0)
+
+    start = time.perf_counter()
+    calls = []
+    for _ in range(REQUESTS):
+        calls.append(asyncio.create_task(one()))
+        await asyncio.sleep(arrivals.expovariate(arrivals_per_s))
+    await asyncio.gather(*calls)
+    elapsed = time.perf_counter() - start
+    await client.aclose()
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    print(
+        f"  {label:10s} errors {errors / REQUESTS:6.1%}  "
+        f"p50 {quantiles[49]:7.1f} ms  p95 {quantiles[94]:7.1f} ms  p99 {quantiles[98]:7.1f} ms  "
+        f"wall {elapsed:5.2f} s"
+    )
+
+
+async def main() -> None:
+    for rate in ARRIVAL_RATES:
+        print(f"{REQUESTS} calls at ~{rate:.0f}/s, upstream quota {QUOTA_PER_S:.0f}/s")
+        await run("bare", None, rate, seed=1)
+        resilient = Upstream(
+            UpstreamPolicy(
+                "bench",
+                max_attempts=4,
+                base_delay_s=0.1,
+                max_concurrency=32,
+                rate_per_s=QUOTA_PER_S,
+                burst=5,
+                hedge_after_s=0.15,
+            )
+        )
+        await run("resilient", resilient, rate, seed=1)
+        print(f"  {resilient.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
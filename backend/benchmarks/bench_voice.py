@@ -0,0 +1,173 @@
+"""Question-to-first-audio latency: three browser round trips vs the fused ``/voice/ask`` socket.
+
+Starts the stand-ins and the app like ``bench_e2e``. The client "speaks" for
+``--speech-ms`` in real time, 100 ms frames at a time. It then sends ``--tail-ms``
+of trailing silence, the pause a voice-activity detector waits for before it
+decides the student is done. The question is asked in one of three ways:
+
+* ``hops``: after speech ends, upload the recording to ``/pulse/transcribe``,
+  send the text to ``/ask``, then stream the answer from ``/lightning/stream``.
+* ``fused``: stream the audio over ``WS /voice/ask`` while speaking, then send
+  ``end``.
+* ``speculative``: the same socket with ``"speculative": true``, so the answer
+  starts once the live transcript has been stable for ``VOICE_SPECULATION_STABLE_MS``.
+
+The Pulse stand-in dictates ``QUESTION`` word by word, so the live transcript
+settles when the speech does. The report gives end of speech (the start of the
+tail) to first PCM byte, and end of speech to last byte, plus the app's
+speculation hit rate.
+
+    python -m benchmarks.bench_voice
+    python -m benchmarks.bench_voice --runs 20 --gemini-latency-ms 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import httpx
+import websockets
+
+from benchmarks.bench_e2e import PCM_FRAME, _free_port, _start, _summary, _wait_ready
+
+QUESTION = "what is the derivative of x squared at three"
+QUESTION_CONTEXT = "Lesson on derivatives and tangent lines."
+
+
+async def _speak(send, speech_ms: float, run: int) -> None:
+    # Vary the audio per run so the transcription cache never answers.
+    frame = bytes([run % 256]) + PCM_FRAME[1:]
+    for _ in range(max(int(speech_ms // 100), 1)):
+        await send(frame)
+        await asyncio.sleep(0.1)
+
+
+async def _silence(send, tail_ms: float) -> None:
+    for _ in range(int(tail_ms // 100)):
+        await send(bytes(len(PCM_FRAME)))
+        await asyncio.sleep(0.1)
+
+
+async def ask_hops(
+    client: httpx.AsyncClient, base: str, speech_ms: float, tail_ms: float, run: int
+) -> tuple[float, float]:
+    recording = bytearray()
+
+    async def record(frame: bytes) -> None:
+        recording.extend(frame)
+
+    await _speak(record, speech_ms, run)
+    speech_end = time.perf_counter()
+    await _silence(record, tail_ms)
+    transcript = await client.post(
+        f"{base}/pulse/transcribe", files={"audio": ("question.wav", bytes(recording), "audio/wav")}
+    )
+    transcript.raise_for_status()
+    # Real questions differ; keep the answer cache out of the comparison.
+    question = f"{transcript.json()['transcription']} (question {run})"
+    answer = await client.post(f"{base}/ask", json={"question": question, "context": QUESTION_CONTEXT})
+    answer.raise_for_status()
+    first_audio = None
+    payload = {"latex_summary": answer.json()["answer"], "metadata": {"run": run}}
+    async with client.stream("POST", f"{base}/lightning/stream", json=payload) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            if chunk and first_audio is None:
+                first_audio = time.perf_counter() - speech_end
+    return first_audio, time.perf_counter() - speech_end
+
+
+async def ask_fused(base: str, speech_ms: float, tail_ms: float, run: int, speculative: bool) -> tuple[float, float]:
+    async with websockets.connect(base.replace("http", "ws", 1) + "/voice/ask", max_size=None) as ws:
+        await ws.send(json.dumps({"type": "start", "context": QUESTION_CONTEXT, "speculative": speculative}))
+        await _speak(ws.send, speech_ms, run)
+        speech_end = time.perf_counter()
+        first_audio = None
+
+        async def finish() -> None:
+            await _silence(ws.send, tail_ms)
+            await ws.send(json.dumps({"type": "end"}))
+
+        # Audio may start before the tail is over, so keep reading while it is sent.
+        finishing = asyncio.create_task(finish())
+        async for message in ws:
+            if isinstance(message, bytes):
+                if first_audio is None:
+                    first_audio = time.perf_counter() - speech_end
+                continue
+            event = json.loads(message)
+            if event["type"] == "error":
+                raise RuntimeError(event["message"])
+            if event["type"] == "done":
+                await finishing
+                return first_audio, time.perf_counter() - speech_end
+    raise RuntimeError("socket closed before done")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Spoken question latency, three hops vs /voice/ask.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--speech-ms", type=float, default=2500.0)
+    parser.add_argument("--tail-ms", type=float, default=600.0)
+    parser.add_argument("--gemini-latency-ms", type=float, default=300.0)
+    parser.add_argument("--pulse-latency-ms", type=float, default=200.0)
+    args = parser.parse_args()
+
+    stand_in_port, app_port = _free_port(), _free_port()
+    stand_in = f"http://127.0.0.1:{stand_in_port}"
+    env = {
+        **os.environ,
+        "SMALLEST_API_KEY": "bench",
+        "GEMINI_API_KEY": "bench",
+        "LOG_LEVEL": "WARNING",
+        "GEMINI_MODEL_URL": f"{stand_in}/v1beta/models/gemini-2.5-flash",
+        "LIGHTNING_API_URL": f"{stand_in}/lightning/stream",
+        "PULSE_API_URL": f"{stand_in}/pulse/get_text",
+        "PULSE_WS_URL": f"ws://127.0.0.1:{stand_in_port}/pulse/get_text",
+    }
+    processes = [
+        _start([
+            "-m", "benchmarks.stand_ins", "--port", str(stand_in_port),
+            "--gemini-latency-ms", str(args.gemini_latency_ms), "--gemini-jitter-ms", "0",
+            "--pulse-latency-ms", str(args.pulse_latency_ms), "--pulse-question", QUESTION,
+        ], env),
+        _start(["-m", "uvicorn", "app.main:app", "--port", str(app_port), "--log-level", "warning"], env),
+    ]
+    base = f"http://127.0.0.1:{app_port}"
+    try:
+        await _wait_ready(f"{stand_in}/healthz")
+        await _wait_ready(f"{base}/health")
+        print(
+            f"{args.runs} questions, {args.speech_ms:.0f} ms of speech + {args.tail_ms:.0f} ms tail, "
+            f"Gemini {args.gemini_latency_ms:.0f} ms "
+            f"per chunk, Pulse batch {args.pulse_latency_ms:.0f} ms"
+        )
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            for name in ("hops", "fused", "speculative"):
+                first, total = [], []
+                for run in range(args.runs):
+                    if name == "hops":
+                        first_s, total_s = await ask_hops(client, base, args.speech_ms, args.tail_ms, run)
+                    else:
+                        first_s, total_s = await ask_fused(base, args.speech_ms, args.tail_ms, run, name == "speculative")
+                    first.append(first_s * 1000.0)
+                    total.append(total_s * 1000.0)
+                first_summary, total_summary = _summary(first), _summary(total)
+                print(
+                    f"  {name:11s} speech end -> first audio p50 {first_summary['p50']:7.1f} ms  "
+                    f"p95 {first_summary['p95']:7.1f} ms   -> last audio p50 {total_summary['p50']:7.1f} ms"
+                )
+            print(f"  speculation: {(await client.get(f'{base}/voice/speculation')).json()}")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,227 @@
+"""Local stand-ins for Gemini, Lightning, Pulse and Redis used by the benchmarks.
+
+Each fake speaks just enough of the real wire format for the backend's
+clients: Gemini ``generateContent`` / ``streamGenerateContent`` JSON and SSE,
+Lightning SSE audio events, the Pulse batch endpoint and WebSocket, and the
+RESP commands ``RedisBackend`` sends (GET, SET [PX], DEL, PING).
+
+    python -m benchmarks.stand_ins --port 9100 --gemini-latency-ms 300
+    python -m benchmarks.stand_ins --port 9100 --redis-port 6390
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import re
+import time
+
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+
+_SLIDE_MARKER_RE = re.compile(r"--- Slide (\d+) ---")
+
+ANSWER_TEXT = (
+    "The derivative measures how fast a function changes. "
+    "Think of it as the slope of the tangent line at a point. "
+    "For x squared the derivative is two x, so the slope doubles as x doubles."
+)
+
+
+def create_stand_in_app(
+    gemini_latency_ms: float = 300.0,
+    gemini_jitter_ms: float = 100.0,
+    lightning_chunks: int = 20,
+    lightning_chunk_ms: float = 20.0,
+    lightning_chunk_bytes: int = 4800,
+    pulse_latency_ms: float = 200.0,
+    pulse_final_every_bytes: int = 32000,
+    pulse_question: str | None = None,
+    pulse_word_bytes: int = 8000,
+) -> FastAPI:
+    app = FastAPI()
+    pcm_chunk = base64.b64encode(bytes(lightning_chunk_bytes)).decode("ascii")
+
+    async def gemini_delay() -> None:
+        await asyncio.sleep(max(0.0, random.gauss(gemini_latency_ms, gemini_jitter_ms)) / 1000.0)
+
+    @app.get("/healthz")
+    async def healthz() -> dict:
+        return {"ok": True}
+
+    @app.post("/v1beta/models/{model_action}")
+    async def gemini(model_action: str, request: Request):
+        body = await request.json()
+        texts = [
+            part.get("text", "")
+            for content in body.get("contents", [])
+            for part in content.get("parts", [])
+        ]
+        if model_action.endswith(":streamGenerateContent"):
+            async def events():
+                for sentence in re.split(r"(?<=\.) ", ANSWER_TEXT):
+                    await gemini_delay()
+                    chunk = {"candidates": [{"content": {"parts": [{"text": sentence + " "}]}}]}
+                    yield f"data: {json.dumps(chunk)}\r\n\r\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await gemini_delay()
+        slides = [int(n) for text in texts for n in _SLIDE_MARKER_RE.findall(text)]
+        if slides:
+            text = json.dumps([
+                {"slide_number": n, "description": f"Diagram for slide {n}", "text_content": f"Slide {n} text"}
+                for n in slides
+            ])
+        elif body.get("generationConfig", {}).get("response_mime_type") == "application/json":
+            text = json.dumps({"answer": ANSWER_TEXT, "suggested_slide": 1})
+        else:
+            text = ANSWER_TEXT
+        return JSONResponse({
+            "candidates": [{"content": {"parts": [{"text": text}]}}],
+            "usageMetadata": {"promptTokenCount": sum(len(t) for t in texts) // 4, "candidatesTokenCount": len(text) // 4},
+        })
+
+    @app.post("/lightning/stream")
+    async def lightning(request: Request):
+        await request.body()
+
+        async def events():
+            for _ in range(lightning_chunks):
+                await asyncio.sleep(lightning_chunk_ms / 1000.0)
+                yield f"event: audio\ndata: {json.dumps({'audio': pcm_chunk})}\n\n"
+            yield "event: done\ndata: {}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/pulse/get_text")
+    async def pulse_batch(request: Request) -> dict:
+        audio = await request.body()
+        await asyncio.sleep(pulse_latency_ms / 1000.0)
+        return {"transcription": f"Transcribed {len(audio)} bytes. " + ANSWER_TEXT}
+
+    @app.websocket("/pulse/get_text")
+    async def pulse_live(websocket: WebSocket) -> None:
+        await websocket.accept()
+        received = 0
+        since_final = 0
+        segment = 0
+        try:
+            while True:
+                message = await websocket.receive()
+                if message.get("type") == "websocket.disconnect":
+                    return
+                if message.get("bytes") and pulse_question:
+                    # Dictation mode: the question appears one word per pulse_word_bytes, then holds steady.
+                    received += len(message["bytes"])
+                    words = pulse_question.split()[: max(received // pulse_word_bytes, 1)]
+                    await websocket.send_text(json.dumps({"transcript": " ".join(words), "is_final": False, "is_last": False}))
+                elif message.get("bytes"):
+                    received += len(message["bytes"])
+                    since_final += len(message["bytes"])
+                    final = since_final >= pulse_final_every_bytes
+                    if final:
+                        since_final = 0
+                        segment += 1
+                    await websocket.send_text(json.dumps({
+                        "transcript": f"segment {segment} after {received} bytes",
+                        "is_final": final,
+                        "is_last": False,
+                    }))
+                elif message.get("text") and json.loads(message["text"]).get("type") == "end":
+                    await websocket.send_text(json.dumps({
+                        "transcript": pulse_question or f"closing segment after {received} bytes",
+                        "is_final": True,
+                        "is_last": True,
+                    }))
+                    await websocket.close()
+                    return
+        except WebSocketDisconnect:
+            return
+
+    return app
+
+
+async def serve_resp(host: str = "127.0.0.1", port: int = 0) -> asyncio.Server:
+    """Start an in-memory Redis stand-in; the bound port is ``server.sockets[0].getsockname()[1]``."""
+    store: dict[bytes, tuple[bytes, float | None]] = {}
+
+    async def read_command(reader: asyncio.StreamReader) -> list[bytes] | None:
+        header = await reader.readline()
+        if not header:
+            return None
+        parts = []
+        for _ in range(int(header[1:-2])):
+            length = int((await reader.readline())[1:-2])
+            parts.append((await reader.readexactly(length + 2))[:-2])
+        return parts
+
+    def bulk(value: bytes | None) -> bytes:
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while (command := await read_command(reader)) is not None:
+                name, args = command[0].upper(), command[1:]
+                if name == b"GET":
+                    value, expires_at = store.get(args[0], (None, None))
+                    if expires_at is not None and expires_at < time.monotonic():
+                        store.pop(args[0], None)
+                        value = None
+                    writer.write(bulk(value))
+                elif name == b"SET":
+                    ttl_ms = int(args[3]) if len(args) >= 4 and args[2].upper() == b"PX" else None
+                    store[args[0]] = (args[1], time.monotonic() + ttl_ms / 1000.0 if ttl_ms else None)
+                    writer.write(b"+OK\r\n")
+                elif name == b"DEL":
+                    writer.write(b":%d\r\n" % sum(store.pop(key, None) is not None for key in args))
+                elif name in (b"PING", b"SELECT", b"AUTH"):
+                    writer.write(b"+PONG\r\n" if name == b"PING" else b"+OK\r\n")
+                else:
+                    writer.write(b"-ERR unknown command\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--gemini-latency-ms", type=float, default=300.0)
+    parser.add_argument("--gemini-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--lightning-chunks", type=int, default=20)
+    parser.add_argument("--lightning-chunk-ms", type=float, default=20.0)
+    parser.add_argument("--pulse-latency-ms", type=float, default=200.0)
+    parser.add_argument("--pulse-question", default=None, help="Live transcripts dictate this text word by word")
+    parser.add_argument("--redis-port", type=int, default=None, help="Also serve the RESP stand-in on this port")
+    args = parser.parse_args()
+
+    app = create_stand_in_app(
+        gemini_latency_ms=args.gemini_latency_ms,
+        gemini_jitter_ms=args.gemini_jitter_ms,
+        lightning_chunks=args.lightning_chunks,
+        lightning_chunk_ms=args.lightning_chunk_ms,
+        pulse_latency_ms=args.pulse_latency_ms,
+        pulse_question=args.pulse_question,
+    )
+    server = uvicorn.Server(uvicorn.Config(app, host=args.host, port=args.port, log_level="warning"))
+
+    async def serve() -> None:
+        if args.redis_port is not None:
+            await serve_resp(args.host, args.redis_port)
+        await server.serve()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import asyncio
+
+from fastapi import FastAPI, WebSocket
+import httpx
+import pytest
+import uvicorn
+import websockets
+
+from app.services.admission import AdmissionClass, AdmissionController, AdmissionMiddleware, classify
+
+
+def _controller(max_in_flight: int = 1, bulk_queue: int = 4) -> AdmissionController:
+    return AdmissionController(
+        [AdmissionClass("interactive", 0, 4, 4), AdmissionClass("bulk", 3, 4, bulk_queue)],
+        max_in_flight=max_in_flight,
+    )
+
+
+@pytest.mark.asyncio
+async def test_interactive_waiters_overtake_queued_bulk() -> None:
+    controller = _controller()
+    order: list[str] = []
+    waits = {name: cls._wait.count for name, cls in controller.classes.items()}
+    held = await controller.acquire("bulk")
+
+    async def run(name: str) -> None:
+        cls = await controller.acquire(name)
+        order.append(name)
+        controller.release(cls, 0.01)
+
+    tasks = [asyncio.create_task(run("bulk")), asyncio.create_task(run("bulk"))]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(run("interactive")))
+    await asyncio.sleep(0)
+    controller.release(held, 0.01)
+    await asyncio.gather(*tasks)
+
+    assert order == ["interactive", "bulk", "bulk"]
+    # Immediate admits count as zero waits, so the histogram covers every admitted request.
+    assert controller.classes["bulk"]._wait.count - waits["bulk"] == 3
+    assert controller.classes["interactive"]._wait.count - waits["interactive"] == 1
+    assert controller.in_flight == 0
+    assert all(cls.queued == 0 for cls in controller.classes.values())
+
+
+@pytest.mark.asyncio
+async def test_full_queue_is_shed_with_503_and_retry_after() -> None:
+    controller = _controller(bulk_queue=0)
+    app = FastAPI()
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+    release = asyncio.Event()
+
+    @app.post("/ask/analyze")
+    async def analyze() -> dict:
+        await release.wait()
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health() -> dict:
+        return {"ok": True}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        first = asyncio.create_task(client.post("/ask/analyze"))
+        await asyncio.sleep(0.05)
+        shed = await client.post("/ask/analyze")
+        assert shed.status_code == 503
+        assert int(shed.headers["retry-after"]) >= 1
+        assert (await client.get("/health")).status_code == 200
+        release.set()
+        assert (await first).status_code == 200
+
+    assert controller.classes["bulk"].rejected == 1
+    assert controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_shed_websocket_is_closed_with_1013_over_a_real_connection() -> None:
+    controller = AdmissionController([AdmissionClass("live", 0, 1, 0)], max_in_flight=4)
+    app = FastAPI()
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+    release = asyncio.Event()
+
+    @app.websocket("/pulse/live")
+    async def live(websocket: WebSocket) -> None:
+        await websocket.accept()
+        await release.wait()
+        await websocket.close()
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        async with websockets.connect(f"ws://127.0.0.1:{port}/pulse/live"):
+            # The only live slot is taken, so this handshake completes and is then closed.
+            async with websockets.connect(f"ws://127.0.0.1:{port}/pulse/live") as shed:
+                with pytest.raises(websockets.ConnectionClosed) as closed:
+                    await shed.recv()
+            assert closed.value.rcvd.code == 1013
+            assert "live queue full" in closed.value.rcvd.reason
+            release.set()
+    finally:
+        server.should_exit = True
+        await serving
+
+    assert controller.classes["live"].rejected == 1
+    assert controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_live_notes_subscribers_hold_no_live_slot() -> None:
+    controller = AdmissionController([AdmissionClass("live", 0, 1, 0)], max_in_flight=4)
+    app = FastAPI()
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+    release = asyncio.Event()
+
+    @app.get("/parse/live/{session_id}/events")
+    async def events(session_id: str) -> dict:
+        await release.wait()
+        return {"ok": True}
+
+    @app.get("/parse/live/{session_id}")
+    async def notes(session_id: str) -> dict:
+        return {"ok": True}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        subscribers = [asyncio.create_task(client.get(f"/parse/live/s{n}/events")) for n in range(3)]
+        await asyncio.sleep(0.05)
+        # The one live slot is still free for live traffic.
+        assert (await client.get("/parse/live/s0")).status_code == 200
+        release.set()
+        assert [response.status_code for response in await asyncio.gather(*subscribers)] == [200] * 3
+
+    assert classify("/parse/live/s0/events") is None and classify("/parse/live/s0") == "live"
+    assert controller.classes["live"].rejected == 0
@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+from fastapi import FastAPI
+import httpx
+import pytest
+
+from app.config import Settings, get_settings
+import app.routes.ask as ask_routes
+import app.services.ask_service as ask_service
+
+
+@pytest.mark.asyncio
+async def test_batch_dedupes_questions_and_bounds_concurrency(monkeypatch) -> None:
+    asked: list[str] = []
+    in_flight = peak = 0
+
+    async def answer(question: str, context: str | None = None) -> str:
+        nonlocal in_flight, peak
+        asked.append(question)
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01 if question.startswith("Slow") else 0.001)
+        in_flight -= 1
+        if question == "Broken":
+            raise ValueError("bad question")
+        return f"{context}: {question}"
+
+    monkeypatch.setattr(ask_service, "answer_question", answer)
+    app = FastAPI()
+    app.include_router(ask_routes.router)
+    app.dependency_overrides[get_settings] = lambda: Settings(SMALLEST_API_KEY="test-key", ASK_BATCH_CONCURRENCY=3)
+
+    questions = ["Slow one?", "What is a limit?", "what is  a LIMIT", "Broken", "   "]
+    questions += [f"Question {n}" for n in range(10)]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/ask/batch", json={"questions": questions, "context": "calc", "concurrency": 50})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    *results, summary = lines
+    assert summary["done"] and summary["questions"] == 15 and summary["unique"] == 14
+    assert summary["failed"] == 2 and summary["concurrency"] == 3
+    assert peak == 3
+    assert sorted(index for item in results for index in item["indices"]) == list(range(15))
+    assert len(asked) == 13  # the duplicate and the blank question never reach Gemini
+
+    by_index = {item["indices"][0]: item for item in results}
+    assert by_index[1]["indices"] == [1, 2] and by_index[1]["answer"] == "calc: What is a limit?"
+    assert by_index[3]["status"] == 400 and by_index[4]["status"] == 400
+    # Completion order: the slow first question is not the first line.
+    assert results[0]["indices"] != [0]
@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+from app.utils.cache import AsyncLRUCache
+from app.utils.cache_backends import MemoryBackend, RedisBackend, RedisError, SharedCache, SQLiteBackend
+
+
+def test_cache_evicts_lru_and_expired_and_memoizes() -> None:
+    cache: AsyncLRUCache[int] = AsyncLRUCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    expiring: AsyncLRUCache[int] = AsyncLRUCache(ttl_seconds=-1)
+    expiring.set("x", 1)
+    assert expiring.get("x") is None
+
+    calls: list[str] = []
+    for key in ("d", "d", "e"):
+        cache.get_or_call(key, lambda: calls.append(key) or len(calls))
+    assert calls == ["d", "e"]
+    assert cache.stats() == {"entries": 2, "max_entries": 2, "hits": 1, "misses": 2, "hit_ratio": 0.333}
+
+
+@pytest.mark.asyncio
+async def test_backends_share_ttl_size_eviction_and_binary_values(tmp_path) -> None:
+    from benchmarks.stand_ins import serve_resp
+
+    server = await serve_resp()
+    port = server.sockets[0].getsockname()[1]
+    pcm = bytes(range(256)) * 16
+    try:
+        for backend in (
+            MemoryBackend(max_entries=2),
+            SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_entries=2),
+            RedisBackend(f"redis://127.0.0.1:{port}/0"),
+        ):
+            await backend.set("pcm", pcm)
+            assert await backend.get("pcm") == pcm
+            await backend.set("gone", b"x", ttl_s=0.001)
+            await asyncio.sleep(0.01)
+            assert await backend.get("gone") is None
+            await backend.delete("pcm")
+            assert await backend.get("pcm") is None
+            assert backend.stats()["hits"] == 1
+            await backend.close()
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    lru = MemoryBackend(max_entries=10, max_bytes=10)
+    await lru.set("a", b"12345")
+    await lru.set("b", b"12345")
+    await lru.get("a")
+    await lru.set("c", b"1")
+    assert await lru.get("b") is None
+    assert await lru.get("a") == b"12345"
+    assert lru.stats()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_keeps_connections_after_error_replies_and_drops_them_mid_reply() -> None:
+    from benchmarks.stand_ins import serve_resp
+
+    server = await serve_resp()
+    backend = RedisBackend(f"redis://127.0.0.1:{server.sockets[0].getsockname()[1]}/0")
+    try:
+        with pytest.raises(RedisError):
+            await backend._command("FLUSHALL")
+        # The error reply was read in full, so the same connection serves the next command.
+        assert len(backend._idle) == 1
+        await backend.set("k", b"v")
+        assert await backend.get("k") == b"v"
+        conn = backend._idle[0]
+
+        # Cancelled while waiting for a reply: the socket is closed, never pooled.
+        backend._idle[0].reader = asyncio.StreamReader()
+        get = asyncio.create_task(backend.get("k"))
+        await asyncio.sleep(0.01)
+        get.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await get
+        assert backend._idle == []
+        assert conn.writer.is_closing()
+        assert await backend.get("k") == b"v"
+        await backend.close()
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_is_shared_between_instances_and_failures_degrade(tmp_path) -> None:
+    path = str(tmp_path / "shared.sqlite3")
+    writer, reader = SQLiteBackend(path, max_entries=2), SQLiteBackend(path, max_entries=2)
+    for key in ("a", "b", "c"):
+        await writer.set(key, key.encode())
+    assert await reader.get("a") is None
+    assert await reader.get("c") == b"c"
+    assert writer.stats()["entries"] == 2
+
+    class BrokenBackend(MemoryBackend):
+        async def get(self, key: str) -> bytes | None:
+            raise ConnectionError("cache down")
+
+    cache = SharedCache(BrokenBackend(), "answers")
+    calls = 0
+
+    async def factory() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    key = cache.key("question")
+    results = await asyncio.gather(*(cache.get_or_compute_json(key, factory) for _ in range(3)))
+    assert results == ["answer"] * 3
+    assert calls == 1
+    assert cache.stats()["errors"] == 3
@@ -0,0 +1,46 @@
+import app.services.chat_history as chat_history
+from app.services.chat_history import HistoryCompactor, message_tokens
+
+
+def _turn(n: int) -> list[dict]:
+    return [
+        {"role": "user", "content": f"Question {n}: what does slide {n} say about limits? " + "detail " * 20},
+        {"role": "model", "content": f"Slide {n} defines the limit. " + "It goes on at length. " * 10},
+    ]
+
+
+def test_history_stays_within_budget_and_keeps_recent_turns_verbatim() -> None:
+    compactor = HistoryCompactor(budget_tokens=600, keep_messages=4, summary_tokens=150)
+    history: list[dict] = []
+    for n in range(40):
+        history += _turn(n)
+        compacted = compactor.compact(history, session_id="s")
+        assert compacted.tokens <= 600
+        assert compacted.recent == history[len(history) - len(compacted.recent):]
+        assert len(compacted.recent) >= 2
+
+    assert compacted.summary.startswith(chat_history.SUMMARY_HEADER)
+    assert "- Student: Question 3:" not in compacted.summary  # oldest lines dropped
+    assert "- Assistant: Slide " in compacted.summary
+    assert compacted.folded == len(history) - len(compacted.recent)
+
+
+def test_compacted_prefix_is_reused_until_the_tail_overflows(monkeypatch) -> None:
+    folds: list[int] = []
+    compactor = HistoryCompactor(budget_tokens=600, keep_messages=2, summary_tokens=150)
+    fold = compactor._fold
+    monkeypatch.setattr(compactor, "_fold", lambda prefix, messages, upto: folds.append(upto) or fold(prefix, messages, upto))
+
+    history: list[dict] = []
+    results = []
+    for n in range(12):
+        history += _turn(n)
+        results.append(compactor.compact(history).result)
+    assert results[0] == "verbatim"
+    assert results.count("compacted") == len(folds) < results.count("reused")
+    assert folds == sorted(folds)
+
+    # Editing an earlier message invalidates the cached prefix.
+    edited = [{"role": "user", "content": history[0]["content"]}, {"role": "model", "content": "changed"}, *history[2:]]
+    assert compactor.compact(edited).result == "compacted"
+    assert folds[-1] > 0 and sum(map(message_tokens, history)) > 600
@@ -0,0 +1,53 @@
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+import httpx
+import pytest
+
+from app.utils.compression import CompressionMiddleware, negotiate_encoding
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/slides")
+    async def slides() -> list[dict]:
+        return [{"slide_number": i, "text_content": "tangent line " * 20} for i in range(50)]
+
+    @app.get("/small")
+    async def small() -> dict:
+        return {"ok": True}
+
+    @app.get("/audio")
+    async def audio() -> StreamingResponse:
+        async def pcm():
+            for _ in range(4):
+                yield bytes(4800)
+
+        return StreamingResponse(pcm(), media_type="audio/pcm")
+
+    return app
+
+
+@pytest.mark.asyncio
+async def test_large_json_is_compressed_and_audio_and_small_bodies_are_not() -> None:
+    transport = httpx.ASGITransport(app=_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        slides = await client.get("/slides", headers={"Accept-Encoding": "gzip"})
+        assert slides.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in slides.headers["vary"]
+        assert int(slides.headers["content-length"]) < len(slides.content) // 4
+        assert slides.json()[49]["slide_number"] == 49
+
+        small = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in small.headers
+
+        audio = await client.get("/audio", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in audio.headers
+        assert audio.content == bytes(4800 * 4)
+
+        refused = await client.get("/slides", headers={"Accept-Encoding": "gzip;q=0, identity"})
+        assert "content-encoding" not in refused.headers
+
+    assert negotiate_encoding("deflate, gzip;q=0.5") == "gzip"
+    assert negotiate_encoding("*;q=0") is None
@@ -0,0 +1,92 @@
+import logging
+import os
+import signal
+import time
+
+import pytest
+from pydantic import ValidationError
+
+from app import config
+
+
+def test_settings_are_cached_and_swapped_on_reload(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("SMALLEST_API_KEY", "first")
+    monkeypatch.setenv("GEMINI_API_KEY", "gemini")
+    monkeypatch.setattr(config, "_settings", None)
+
+    first = config.get_settings()
+    assert config.get_settings() is first
+    with pytest.raises(ValidationError):
+        first.SMALLEST_API_KEY = "mutated"
+
+    monkeypatch.setenv("SMALLEST_API_KEY", "second")
+    assert config.get_settings().SMALLEST_API_KEY == "first"
+    reloaded = config.reload_settings()
+    assert config.get_settings() is reloaded
+    assert reloaded.SMALLEST_API_KEY == "second"
+    # Holders of the old snapshot keep a consistent view.
+    assert first.SMALLEST_API_KEY == "first"
+
+    monkeypatch.delenv("GEMINI_API_KEY")
+    with pytest.raises(ValidationError):
+        config.reload_settings()
+    assert config.get_settings() is reloaded
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGHUP"), reason="SIGHUP is POSIX-only")
+def test_sighup_during_a_reload_does_not_deadlock(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("SMALLEST_API_KEY", "before")
+    monkeypatch.setenv("GEMINI_API_KEY", "gemini")
+    monkeypatch.setattr(config, "_settings", None)
+    monkeypatch.setattr(config, "_watcher", None)
+    previous = signal.getsignal(signal.SIGHUP)
+    try:
+        config.install_settings_reload()
+        monkeypatch.setenv("SMALLEST_API_KEY", "after")
+        # The signal lands while this thread holds the reload lock, as during a reload.
+        with config._reload_lock:
+            os.kill(os.getpid(), signal.SIGHUP)
+            time.sleep(0.05)
+        deadline = time.monotonic() + 2.0
+        while config.get_settings().SMALLEST_API_KEY != "after" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert config.get_settings().SMALLEST_API_KEY == "after"
+    finally:
+        signal.signal(signal.SIGHUP, previous)
+
+
+@pytest.mark.asyncio
+async def test_reload_reaches_admission_upstreams_and_log_level(monkeypatch: pytest.MonkeyPatch) -> None:
+    from app.services import upstream
+    from app.services.admission import build_admission_controller
+
+    monkeypatch.setenv("SMALLEST_API_KEY", "key")
+    monkeypatch.setenv("GEMINI_API_KEY", "gemini")
+    monkeypatch.setenv("ADMISSION_CONCURRENCY", '{"bulk": 1}')
+    monkeypatch.setenv("LIGHTNING_MAX_CONCURRENCY", "2")
+    monkeypatch.setattr(config, "_settings", None)
+    monkeypatch.setattr(upstream, "_upstreams", {})
+    monkeypatch.setattr(upstream, "_upstreams_settings", None)
+    root = logging.getLogger()
+    monkeypatch.setattr(root, "level", root.level)
+
+    controller = build_admission_controller(config.get_settings())
+    lightning = upstream.get_upstream("lightning")
+    held = await controller.acquire("bulk")
+    assert lightning.policy.max_concurrency == 2
+
+    monkeypatch.setenv("ADMISSION_CONCURRENCY", '{"bulk": 2}')
+    monkeypatch.setenv("LIGHTNING_MAX_CONCURRENCY", "5")
+    monkeypatch.setenv("UPSTREAM_BREAKER_FAILURES", "9")
+    monkeypatch.setenv("LOG_LEVEL", "WARNING")
+    assert config._reload_logged()
+
+    # The second bulk request fits only under the reloaded limit.
+    second = await controller.acquire("bulk")
+    assert controller.classes["bulk"].max_concurrency == 2
+    controller.release(held, 0.0)
+    controller.release(second, 0.0)
+    # Same upstream object, so breaker state and counters survive the reload.
+    assert upstream.get_upstream("lightning") is lightning
+    assert lightning.policy.max_concurrency == 5 and lightning.breaker._failure_threshold == 9
+    assert root.level == logging.WARNING
@@ -0,0 +1,76 @@
+import asyncio
+
+from fastapi import FastAPI
+import httpx
+import pytest
+
+from app.models.base import SlideContext
+import app.routes.jobs as job_routes
+from app.services.jobs import JobManager
+
+
+@pytest.mark.asyncio
+async def test_failed_job_resumes_from_checkpoints_on_retry() -> None:
+    manager = JobManager(max_concurrent=1)
+    calls: list[int] = []
+    fail_at = {2}
+
+    async def run(job) -> None:
+        for key in range(4):
+            if key in job.checkpoints:
+                continue
+            calls.append(key)
+            if key in fail_at:
+                fail_at.clear()
+                raise ValueError("batch 2 failed")
+            await job.checkpoint(key, [f"slide {key}"])
+
+    job = manager.submit("analyze", run, {"images": ["a", "b"]}, total=4)
+    await job._task
+    assert job.status == "failed"
+    assert job.results == ["slide 0", "slide 1"]
+
+    manager.retry(job.job_id)
+    await job._task
+    assert job.status == "succeeded"
+    assert job.attempts == 2
+    assert calls == [0, 1, 2, 2, 3]
+    assert manager.submit("analyze", run, {"images": ["a", "b"]}) is job
+    assert job.results == ["slide 0", "slide 1", "slide 2", "slide 3"]
+
+
+@pytest.mark.asyncio
+async def test_analysis_job_streams_batches_over_sse(monkeypatch) -> None:
+    release = asyncio.Event()
+
+    async def batches(images, skip=()):
+        for start in range(0, len(images), 2):
+            if start:
+                await release.wait()
+            yield start, [SlideContext(slide_number=start + 1, description="d", text_content="t")]
+
+    monkeypatch.setattr(job_routes, "analyze_slide_batches", batches)
+    monkeypatch.setattr(job_routes, "get_job_manager", lambda manager=JobManager(): manager)
+
+    app = FastAPI()
+    app.include_router(job_routes.router)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        submitted = await client.post("/jobs/analyze", json={"images": ["a", "b", "c", "d"]})
+        assert submitted.status_code == 202
+        job_id = submitted.json()["job_id"]
+        await asyncio.sleep(0.01)
+        polled = (await client.get(f"/jobs/{job_id}")).json()
+        assert polled["status"] == "running" and polled["completed"] == 1 and polled["total"] == 2
+
+        release.set()
+        events = []
+        async with client.stream("GET", f"/jobs/{job_id}/events") as response:
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    events.append(line[len("event: "):])
+        assert events[-1] == "done"
+        final = (await client.get(f"/jobs/{job_id}")).json()
+        assert final["status"] == "succeeded"
+        assert [s["slide_number"] for s in final["results"]] == [1, 3]
+        assert (await client.get("/jobs/missing")).status_code == 404
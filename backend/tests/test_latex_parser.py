@@ -0,0 +1,92 @@
+from app.utils.latex_parser import IncrementalScriptParser, _extract_anchors, latex_to_teaching_script
+
+
+def test_nested_fractions_and_roots_are_fully_verbalized() -> None:
+    source = "\\frac{\\frac{1}{2}}{\\sqrt{\\frac{a}{b}}} = x^{n+1} and \\sqrt[3]{8}"
+
+    text = latex_to_teaching_script(source).text
+
+    assert text == "1 over 2 over square root of a over b equals x to the power of n plus 1 and cube root of 8"
+
+
+def test_big_operators_greek_letters_and_environments() -> None:
+    source = (
+        "\\begin{theorem} \\sum_{i=1}^{n} i = \\frac{n(n+1)}{2} \\end{theorem} "
+        "and \\lim_{x \\to 0} \\frac{\\sin x}{x} = 1 for \\alpha \\leq \\beta."
+    )
+
+    text = latex_to_teaching_script(source).text
+
+    assert text.startswith("Theorem. the sum from i equals 1 to n of i equals n(n plus 1) over 2")
+    assert "the limit as x goes to 0 of sine x over x equals 1" in text
+    assert text.endswith("alpha is less than or equal to beta.")
+
+
+def test_prose_escapes_and_hyphens_survive() -> None:
+    source = "Growth is 50\\% this year\\nThe well-known result: x_1 - y costs \\$5."
+
+    text = latex_to_teaching_script(source).text
+
+    assert text == "Growth is 50 percent this year The well-known result: x sub 1 minus y costs dollar 5."
+
+
+def test_deep_nesting_does_not_recurse_without_bound() -> None:
+    source = "x"
+    for _ in range(1000):
+        source = f"\\frac{{{source}}}{{y}}"
+
+    text = latex_to_teaching_script(source).text
+
+    assert "\\" not in text
+    assert text.count("over") == 1000
+
+
+def test_anchor_scan_matches_sentence_spans_and_priorities() -> None:
+    source = (
+        "Intro sentence. A Student asked why x^2 + y^2 = r^2? "
+        "Megastudent question is not a trigger. The key idea: a + b = c."
+    )
+
+    result = latex_to_teaching_script(source)
+    anchors = [(a.anchor_type, a.text) for a in result.anchors]
+
+    assert anchors == [
+        ("student_question", "A Student asked why x squared plus y squared equals r squared?"),
+        ("math_proof", "The key idea: a plus b equals c."),
+    ]
+    first = result.anchors[0]
+    assert result.text[first.span_start:first.span_end].strip() == first.text
+    assert first.to_model().anchor_id == "anchor_1"
+
+    # Adjacent keywords share a space; each still counts.
+    adjacent = "So x equals minus three. Then y to the power of minus one. x plus minus y is weird."
+    assert [(a.anchor_type, a.text) for a in _extract_anchors(adjacent)] == [
+        ("math_proof", "So x equals minus three."),
+        ("math_proof", "Then y to the power of minus one."),
+        ("math_proof", "x plus minus y is weird."),
+    ]
+
+
+def test_incremental_parser_matches_whole_document_across_chunk_boundaries() -> None:
+    source = (
+        "A student asked: x^2 + y^2 = r^2. Note $a. b$ and \\text{Dr. Who} stay together. "
+        "Core concept: \\frac{a+b}{c}!\n\nWhy 3.14? Because \\sum_{i=1}^{n} i = \\frac{n(n+1)}{2}."
+    )
+    whole = latex_to_teaching_script(source)
+
+    for size in (1, 3, 7, 50):
+        parser = IncrementalScriptParser()
+        sentences = []
+        for start in range(0, len(source), size):
+            sentences.extend(parser.feed(source[start:start + size]))
+        sentences.extend(parser.close())
+
+        script = " ".join(sentence.text for sentence in sentences)
+        anchors = [anchor for sentence in sentences for anchor in sentence.anchors]
+        assert script == whole.text
+        assert [(a.anchor_type, a.span_start, a.span_end, a.text) for a in anchors] == [
+            (a.anchor_type, a.span_start, a.span_end, a.text) for a in whole.anchors
+        ]
+        assert [a.anchor_id for a in anchors] == [f"anchor_{i + 1}" for i in range(len(anchors))]
+        assert all(script[a.span_start:a.span_end].strip() == a.text for a in anchors)
+    assert sentences[1].text == "Note a. b and Dr. Who stay together."
@@ -0,0 +1,101 @@
+import json
+
+from fastapi import FastAPI
+import httpx
+import pytest
+
+from app.config import Settings
+import app.routes.lessons as lesson_routes
+import app.services.lesson_artifacts as artifacts
+from app.services.jobs import JobManager
+
+SEGMENTS = [
+    {"text": "Derivatives measure change.", "slide_number": 1},
+    {"text": "The slope is 2x, and that is the key idea.", "slide_number": 2},
+    {"text": "At three it is six.", "slide_number": 2},
+]
+
+
+def _fake_lightning(spoken: list[str], fail_on: set[str] = frozenset()):
+    async def stream(request, settings):
+        spoken.append(request.latex_summary)
+        if request.latex_summary in fail_on:
+            raise RuntimeError("upstream down")
+        # 100 ms of audio per segment at 24 kHz, filled with the segment's first byte.
+        yield request.latex_summary.encode()[:1] * 4800
+
+    return stream
+
+
+@pytest.mark.asyncio
+async def test_failed_lesson_build_resumes_from_synthesized_segments(tmp_path, monkeypatch) -> None:
+    settings = Settings(SMALLEST_API_KEY="test-key", LESSON_ARTIFACT_DIR=str(tmp_path))
+    spoken: list[str] = []
+    monkeypatch.setattr(artifacts, "stream_lightning", _fake_lightning(spoken, {SEGMENTS[2]["text"]}))
+    manager = JobManager(max_concurrent=1)
+    lesson = artifacts.lesson_id(SEGMENTS, None, settings)
+
+    async def run(job) -> None:
+        await artifacts.build_lesson(job, lesson, SEGMENTS, None, settings)
+
+    job = manager.submit("lesson", run, {"lesson_id": lesson}, total=3)
+    await job._task
+    assert job.status == "failed"
+    assert artifacts.load_index(lesson, settings) is None
+
+    monkeypatch.setattr(artifacts, "stream_lightning", _fake_lightning(spoken))
+    manager.retry(job.job_id)
+    await job._task
+    assert job.status == "succeeded"
+    assert spoken == [SEGMENTS[0]["text"], SEGMENTS[1]["text"], SEGMENTS[2]["text"], SEGMENTS[2]["text"]]
+
+    index = json.loads(artifacts.load_index(lesson, settings))
+    assert index["duration_ms"] == 300
+    assert [(s["byte_start"], s["byte_end"]) for s in index["segments"]] == [(44, 4844), (4844, 9644), (9644, 14444)]
+    assert index["slides"] == [
+        {"slide_number": 1, "segment": 0, "start_ms": 0, "byte_start": 44},
+        {"slide_number": 2, "segment": 1, "start_ms": 100, "byte_start": 4844},
+    ]
+    assert [(a["anchor_type"], a["segment"]) for a in index["anchors"]] == [("concept", 1)]
+    assert 4844 <= index["anchors"][0]["byte"] < 9644
+    assert artifacts.audio_path(lesson, settings).stat().st_size == index["bytes"] == 14444
+    assert not (tmp_path / f"{lesson}.parts").exists()
+
+
+@pytest.mark.asyncio
+async def test_lesson_audio_is_served_with_ranges_and_etags(tmp_path, monkeypatch) -> None:
+    settings = Settings(SMALLEST_API_KEY="test-key", LESSON_ARTIFACT_DIR=str(tmp_path))
+    spoken: list[str] = []
+    manager = JobManager()
+    monkeypatch.setattr(artifacts, "stream_lightning", _fake_lightning(spoken))
+    monkeypatch.setattr(lesson_routes, "get_settings", lambda: settings)
+    monkeypatch.setattr(lesson_routes, "get_job_manager", lambda: manager)
+
+    app = FastAPI()
+    app.include_router(lesson_routes.router)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        submitted = await client.post("/lessons", json={"segments": SEGMENTS})
+        assert submitted.status_code == 202
+        built = submitted.json()
+        await manager.get(built["job"]["job_id"])._task
+
+        again = await client.post("/lessons", json={"segments": SEGMENTS})
+        assert again.status_code == 200 and again.json()["ready"]
+        assert len(spoken) == 3
+
+        index = (await client.get(built["index_url"])).json()
+        slide = index["slides"][1]
+        ranged = await client.get(built["audio_url"], headers={"Range": f"bytes={slide['byte_start']}-{slide['byte_start'] + 9}"})
+        assert ranged.status_code == 206
+        assert ranged.content == b"T" * 10
+        assert ranged.headers["content-range"] == f"bytes 4844-4853/{index['bytes']}"
+
+        full = await client.get(built["audio_url"])
+        assert full.content[:4] == b"RIFF" and len(full.content) == index["bytes"]
+        assert "immutable" in full.headers["cache-control"]
+        cached = await client.get(built["audio_url"], headers={"If-None-Match": full.headers["etag"]})
+        assert cached.status_code == 304
+
+        assert (await client.get("/lessons/../../etc/audio")).status_code == 404
+        assert (await client.get(f"/lessons/{'0' * 32}/audio")).status_code == 404
@@ -0,0 +1,140 @@
+import asyncio
+import json
+
+import pytest
+
+from fastapi import FastAPI
+import httpx
+
+import app.routes.parse as parse_routes
+from app.services import live_notes
+from app.services.live_notes import LiveNotesSession
+
+
+class _RecordingFormatter:
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, str]] = []
+
+    async def __call__(self, new_text: str, overlap_text: str) -> str:
+        self.calls.append((new_text, overlap_text))
+        await asyncio.sleep(0)
+        return f"- {new_text}"
+
+
+@pytest.mark.asyncio
+async def test_live_notes_formats_only_new_segments_with_overlap() -> None:
+    formatter = _RecordingFormatter()
+    session = LiveNotesSession("s1", batch_chars=40, overlap_segments=1, formatter=formatter)
+
+    session.add_final("First finalized segment.")
+    await session.flush()
+    session.add_final("Second one here.")
+    session.add_final("Third one here.")
+    await session.close()
+
+    assert formatter.calls == [
+        ("First finalized segment.", ""),
+        ("Second one here. Third one here.", "First finalized segment."),
+    ]
+    assert session.document == "- First finalized segment.\n\n- Second one here. Third one here."
+    assert session.snapshot()["pending_segments"] == 0
+    assert session.closed
+
+
+@pytest.mark.asyncio
+async def test_live_notes_waits_for_batch_and_notifies_subscribers() -> None:
+    formatter = _RecordingFormatter()
+    session = LiveNotesSession("s2", batch_chars=1000, formatter=formatter)
+
+    session.add_final("short")
+    await asyncio.sleep(0)
+    assert formatter.calls == []
+
+    waiter = asyncio.create_task(session.wait_for_update(0, timeout=1.0))
+    await asyncio.sleep(0)
+    await session.flush()
+    assert await waiter is True
+    assert session.version == 1
+
+
+@pytest.mark.asyncio
+async def test_live_notes_caps_each_batch_after_a_backlog() -> None:
+    formatter = _RecordingFormatter()
+    session = LiveNotesSession("s3", batch_chars=20, overlap_segments=1, formatter=formatter)
+
+    # Six segments land before the formatter gets to run once.
+    for i in range(6):
+        session.add_final(f"Segment number {i}.")
+    await session.close()
+
+    assert [new for new, _ in formatter.calls] == [
+        "Segment number 0. Segment number 1.",
+        "Segment number 2. Segment number 3.",
+        "Segment number 4. Segment number 5.",
+    ]
+    assert formatter.calls[1][1] == "Segment number 1."
+
+
+class _FlakyFormatter(_RecordingFormatter):
+    def __init__(self, failures: int) -> None:
+        super().__init__()
+        self.failures = failures
+
+    async def __call__(self, new_text: str, overlap_text: str) -> str:
+        self.calls.append((new_text, overlap_text))
+        if len(self.calls) <= self.failures:
+            raise RuntimeError("gemini unavailable")
+        return f"- {new_text}"
+
+
+@pytest.mark.asyncio
+async def test_live_notes_backs_off_then_keeps_raw_text_when_formatting_fails() -> None:
+    formatter = _FlakyFormatter(failures=2)
+    session = LiveNotesSession("s4", batch_chars=5, formatter=formatter, retry_base_s=0.01)
+    session.add_final("Retried after a failure.")
+    await session.flush()
+    assert formatter.calls == [("Retried after a failure.", "")] * 3
+    assert session.document == "- Retried after a failure."
+
+    # A formatter that never recovers stops after the retries and keeps the transcript.
+    formatter = _FlakyFormatter(failures=100)
+    session = LiveNotesSession("s5", batch_chars=5, formatter=formatter, retry_base_s=0.01)
+    session.add_final("Never formatted.")
+    session.add_final("Still moves on.")
+    await session.flush()
+    assert len(formatter.calls) == 2 * (live_notes.MAX_RETRIES + 1)
+    assert session.document == "Never formatted.\n\nStill moves on."
+    assert session.pending_segments == 0
+
+
+@pytest.mark.asyncio
+async def test_live_notes_events_send_only_new_sections_after_the_first(monkeypatch) -> None:
+    session = LiveNotesSession("s6", batch_chars=1, formatter=_RecordingFormatter())
+    session.sections = ["- Already formatted."]
+    session.version = 1
+    monkeypatch.setitem(live_notes._sessions, "s6", session)
+
+    async def feed() -> None:
+        await asyncio.sleep(0.01)
+        session.add_final("Second section.")
+        await session.flush()
+        session.add_final("Third section.")
+        await session.close()
+
+    app = FastAPI()
+    app.include_router(parse_routes.router)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        feeding = asyncio.create_task(feed())
+        events = []
+        async with client.stream("GET", "/parse/live/s6/events") as response:
+            async for line in response.aiter_lines():
+                if line.startswith("data: "):
+                    events.append(json.loads(line[len("data: "):]))
+        await feeding
+
+    assert events[0]["formatted"] == "- Already formatted."
+    updates = [event for event in events[1:] if event["added"]]
+    assert [(u["start"], u["added"]) for u in updates] == [(1, ["- Second section."]), (2, ["- Third section."])]
+    assert all("formatted" not in event for event in events[1:])
+    assert events[-1]["closed"] and events[-1]["sections"] == 3
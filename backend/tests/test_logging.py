@@ -0,0 +1,37 @@
+import io
+import json
+import logging
+
+from app import config
+
+
+def test_records_are_written_as_json_by_the_background_writer() -> None:
+    stream = io.StringIO()
+    config.setup_logging("INFO", "json", stream=stream)
+    try:
+        token = config.request_id_var.set("req-123")
+        try:
+            logging.getLogger("app.test").info("hello %s", "world", extra={"bytes": 42})
+        finally:
+            config.request_id_var.reset(token)
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logging.getLogger("app.test").exception("failed")
+    finally:
+        config.shutdown_logging()
+
+    first, second = (json.loads(line) for line in stream.getvalue().splitlines())
+    assert first["msg"] == "hello world"
+    assert first["request_id"] == "req-123"
+    assert first["bytes"] == 42
+    assert "request_id" not in second
+    assert "ValueError: boom" in second["exc"]
+
+
+def test_rate_limiter_counts_suppressed_events() -> None:
+    limiter = config.LogRateLimiter(per_second=0.001, burst=2)
+    allowed = [limiter.allow() for _ in range(5)]
+    assert allowed == [True, True, False, False, False]
+    assert limiter.take_suppressed() == 3
+    assert limiter.take_suppressed() == 0
@@ -0,0 +1,22 @@
+from app.utils.metrics import Registry, Histogram, Counter, gauge_family
+
+
+def test_registry_renders_histograms_counters_and_collectors() -> None:
+    registry = Registry()
+    latency = registry.register(Histogram("req_seconds", "Request latency.", ("route",), buckets=(0.1, 1.0)))
+    sent = registry.register(Counter("sent_bytes", "Bytes sent.", ("stream",)))
+    registry.add_collector(lambda: [gauge_family("sessions", "Open sessions.", [({"kind": 'a"b'}, 2)])])
+
+    child = latency.labels("/health")
+    for value in (0.05, 0.1, 0.5, 3.0):
+        child.observe(value)
+    sent.labels("lightning").inc(1024)
+
+    text = registry.render()
+    assert '# TYPE req_seconds histogram' in text
+    assert 'req_seconds_bucket{route="/health",le="0.1"} 2' in text
+    assert 'req_seconds_bucket{route="/health",le="1"} 3' in text
+    assert 'req_seconds_bucket{route="/health",le="+Inf"} 4' in text
+    assert 'req_seconds_count{route="/health"} 4' in text
+    assert 'sent_bytes_total{stream="lightning"} 1024' in text
+    assert 'sessions{kind="a\\"b"} 2' in text
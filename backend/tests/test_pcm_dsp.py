@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.config import Settings
+from app.models.lightning import LightningSpeakRequest
+from app.services.lightning_service import stream_lightning
+from app.services.smallest_lightning_client import LightningStreamMetrics
+from app.utils.pcm_dsp import PcmProcessor
+
+RATE = 24000
+
+
+def _tone(dbfs: float, seconds: float) -> np.ndarray:
+    t = np.arange(int(RATE * seconds)) / RATE
+    return np.sqrt(2) * 10 ** (dbfs / 20) * np.sin(2 * np.pi * 220 * t)
+
+
+def _pcm(*parts: np.ndarray) -> bytes:
+    return np.clip(np.rint(np.concatenate(parts) * 32768), -32768, 32767).astype("<i2").tobytes()
+
+
+def _rms_dbfs(pcm: bytes) -> float:
+    samples = np.frombuffer(pcm, dtype="<i2").astype(np.float64) / 32768
+    return 10 * np.log10(np.mean(samples**2))
+
+
+def _run(processor: PcmProcessor, segments: list[bytes], chunk_bytes: int) -> list[bytes]:
+    out = []
+    for segment in segments:
+        parts = [processor.process(segment[i:i + chunk_bytes]) for i in range(0, len(segment), chunk_bytes)]
+        out.append(b"".join(parts) + processor.end_segment())
+    return out
+
+
+def test_processor_trims_edges_levels_segments_and_ignores_chunking() -> None:
+    silence = lambda seconds: np.zeros(int(RATE * seconds))
+    quiet = _pcm(silence(0.5), _tone(-30, 1.0), silence(0.3), _tone(-30, 1.0), silence(0.8))
+    loud = _pcm(silence(0.2), _tone(-8, 1.5), silence(0.6))
+
+    processor = PcmProcessor(sample_rate=RATE, target_dbfs=-20, pad_ms=40)
+    first, second = _run(processor, [quiet, loud], 4800)
+    # Odd chunk sizes split frames and samples, and the output does not change.
+    assert _run(PcmProcessor(sample_rate=RATE, target_dbfs=-20, pad_ms=40), [quiet, loud], 777) == [first, second]
+
+    # 40 ms of padding is kept at each edge, and the pause inside the segment survives.
+    assert len(first) == int(RATE * (0.04 + 1.0 + 0.3 + 1.0 + 0.04)) * 2
+    assert len(second) == int(RATE * (0.04 + 1.5 + 0.04)) * 2
+    assert processor.trimmed_ms == pytest.approx(460 + 760 + 160 + 560)
+
+    # Both segments come out near the target despite a 22 dB difference going in.
+    # Byte offsets RATE..RATE * 2 are 0.5-1.0 s into the output, well inside the speech.
+    assert _rms_dbfs(first[RATE:RATE * 2]) == pytest.approx(-20, abs=1.5)
+    assert _rms_dbfs(second[RATE:RATE * 3]) == pytest.approx(-20, abs=1.5)
+
+
+def test_limiter_holds_sudden_peaks_under_the_ceiling() -> None:
+    processor = PcmProcessor(sample_rate=RATE, target_dbfs=-14, ceiling_dbfs=-1, max_gain_db=12)
+    source = _pcm(_tone(-26, 1.0), _tone(-3, 0.2), _tone(-26, 0.5))
+    out = processor.process(source) + processor.end_segment()
+
+    samples = np.frombuffer(out, dtype="<i2").astype(np.float64) / 32768
+    assert len(out) == len(source)
+    assert np.abs(samples).max() <= 10 ** (-1 / 20) + 1e-3
+
+
+class _PaddedClient:
+    def __init__(self, audio: bytes) -> None:
+        self.audio = audio
+
+    async def stream_tts(self, script_text: str, voice_id: str | None = None, metadata: dict | None = None):
+        metrics = LightningStreamMetrics(request_start_ts=time.perf_counter(), ttfb_ms=1.0)
+
+        async def generator():
+            for offset in range(0, len(self.audio), 4800):
+                await asyncio.sleep(0)
+                yield self.audio[offset:offset + 4800]
+
+        return generator(), metrics
+
+
+@pytest.mark.asyncio
+async def test_stream_processes_fresh_and_replayed_audio_alike() -> None:
+    settings = Settings(SMALLEST_API_KEY="test-key", LIGHTNING_DSP_EDGE_PAD_MS=0)
+    payload = LightningSpeakRequest(latex_summary="Post-processing makes replays match the first stream.")
+    client = _PaddedClient(_pcm(np.zeros(RATE // 2), _tone(-35, 1.0), np.zeros(RATE // 2)))
+
+    fresh = b"".join([chunk async for chunk in stream_lightning(payload, settings, client=client)])
+    replayed = b"".join([chunk async for chunk in stream_lightning(payload, settings, client=client)])
+    assert len(fresh) == RATE * 2
+    assert replayed == fresh
@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+from app.services.prompt_budget import (
+    TRIM_MARKER,
+    Section,
+    TokenEstimator,
+    estimate_tokens,
+    fit_sections,
+    split_to_budget,
+)
+from app.services.upstream import Upstream, UpstreamPolicy
+
+
+def test_fit_sections_trims_lowest_priority_first_and_keeps_required() -> None:
+    instructions = "Answer briefly. " * 50
+    relevant = "Slide 3 defines the derivative as a limit. " * 40
+    other = ["Slide about something unrelated. " * 40, "Another unrelated slide. " * 40]
+    sections = [
+        Section(instructions, required=True),
+        Section(other[0], priority=0),
+        Section(relevant, priority=5),
+        Section(other[1], priority=0),
+    ]
+    budget = estimate_tokens(instructions) + estimate_tokens(relevant) + 300
+
+    fitted = fit_sections(sections, budget, call="test")
+    assert fitted[0] == sections[0]
+    assert fitted[2] == sections[2]
+    assert fitted[1].trimmed and fitted[3].trimmed
+    assert fitted[1].text.endswith(TRIM_MARKER)
+    assert sum(estimate_tokens(section.text) for section in fitted) <= budget
+    # Equal priorities shrink in proportion to their size.
+    assert abs(len(fitted[1].text) / len(other[0]) - len(fitted[3].text) / len(other[1])) < 0.05
+
+    tight = fit_sections(sections, estimate_tokens(instructions) + 100)
+    assert [section.text == "" for section in tight] == [False, True, False, True]
+    assert tight[2].trimmed and tight[0].text == instructions
+
+    tail = fit_sections([Section("first part " * 100 + "latest words", keep="tail")], 40)[0].text
+    assert tail.endswith("latest words") and tail.startswith("[…]")
+
+
+def test_estimator_calibrates_toward_reported_usage_and_splits_long_text() -> None:
+    estimator = TokenEstimator(chars_per_token=4.0, weight=0.5)
+    for _ in range(10):
+        estimator.observe(3000, 1000)
+    assert estimator.chars_per_token == pytest.approx(3.0, abs=0.01)
+    assert estimator.estimate("x" * 300) == 100
+    estimator.observe(10, 1000)
+    assert estimator.chars_per_token >= estimator.bounds[0]
+
+    text = "\n\n".join(f"Paragraph {n}. " + "word " * 150 for n in range(20))
+    pieces = split_to_budget(text, 500)
+    assert len(pieces) > 1
+    assert all(estimate_tokens(piece) <= 500 for piece in pieces)
+    assert all(piece.startswith("Paragraph") for piece in pieces)
+    assert " ".join(" ".join(pieces).split()) == " ".join(text.split())
+
+
+@pytest.mark.asyncio
+async def test_upstream_charges_prompt_tokens_to_the_minute_budget() -> None:
+    upstream = Upstream(UpstreamPolicy("test", tokens_per_min=60_000))
+
+    async def attempt(timeout: float) -> str:
+        return "ok"
+
+    started = time.monotonic()
+    assert await upstream.call(attempt, cost_tokens=59_000) == "ok"
+    assert time.monotonic() - started < 0.05
+    # 1,000 tokens are left and the bucket refills 1,000 per second.
+    await upstream.call(attempt, cost_tokens=1_100)
+    assert time.monotonic() - started >= 0.09
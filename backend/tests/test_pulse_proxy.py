@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services.pulse_realtime import PulseLiveProxy
+
+
+class _FakeBrowser:
+    def __init__(self, messages: list[dict]) -> None:
+        self._messages = list(messages)
+        self.sent: list[str] = []
+
+    async def receive(self) -> dict:
+        if self._messages:
+            return self._messages.pop(0)
+        await asyncio.Event().wait()
+
+    async def send_text(self, text: str) -> None:
+        self.sent.append(text)
+
+
+class _FakePulse:
+    def __init__(self, stall: asyncio.Event | None = None) -> None:
+        self.sent: list = []
+        self.closed = False
+        self._stall = stall
+        self._replies: asyncio.Queue = asyncio.Queue()
+
+    async def send(self, data) -> None:
+        if self._stall is not None:
+            await self._stall.wait()
+        self.sent.append(data)
+        if isinstance(data, str) and json.loads(data).get("type") == "end":
+            await self._replies.put('{"transcript": "hello there", "is_final": true, "is_last": true}')
+
+    async def close(self) -> None:
+        self.closed = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        return await self._replies.get()
+
+
+@pytest.mark.asyncio
+async def test_proxy_coalesces_queued_audio_and_stops_on_is_last() -> None:
+    chunks = [{"type": "websocket.receive", "bytes": b"\x00" * 1000} for _ in range(5)]
+    browser = _FakeBrowser(chunks + [{"type": "websocket.receive", "text": '{"type": "end"}'}])
+    stall = asyncio.Event()
+    pulse = _FakePulse(stall=stall)
+    finals: list[str] = []
+
+    proxy = PulseLiveProxy(browser, pulse, session_id="t1", on_final=finals.append, frame_ms=100)
+    task = asyncio.create_task(proxy.run())
+    for _ in range(10):
+        await asyncio.sleep(0)
+    stall.set()
+    await asyncio.wait_for(task, timeout=1.0)
+
+    audio_frames = [frame for frame in pulse.sent if isinstance(frame, bytes)]
+    assert sum(len(frame) for frame in audio_frames) == 5000
+    assert len(audio_frames) < 5
+    assert json.loads(pulse.sent[-1]) == {"type": "end"}
+    assert finals == ["hello there"]
+    assert pulse.closed
+    assert proxy.metrics.frames_in == 5
+
+
+@pytest.mark.asyncio
+async def test_proxy_drops_oldest_audio_and_reports_backpressure() -> None:
+    chunks = [{"type": "websocket.receive", "bytes": b"\x00" * 32000} for _ in range(4)]
+    browser = _FakeBrowser(chunks)
+    pulse = _FakePulse(stall=asyncio.Event())
+
+    proxy = PulseLiveProxy(browser, pulse, session_id="t2", max_queue_frames=2, lag_warn_ms=500)
+    task = asyncio.create_task(proxy.run())
+    for _ in range(10):
+        await asyncio.sleep(0)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert proxy.metrics.dropped_frames >= 1
+    assert proxy.metrics.max_queue_depth <= 2
+    events = [json.loads(text) for text in browser.sent]
+    assert any(event.get("type") == "backpressure" for event in events)
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from app.config import Settings
+from app.models.base import SlideContext
+import app.services.ask_service as ask_service
+from app.services.question_index import QuestionIndex
+
+
+@pytest.mark.asyncio
+async def test_burst_of_rephrasings_shares_one_answer() -> None:
+    index = QuestionIndex(threshold=0.85)
+    calls: list[str] = []
+    release = asyncio.Event()
+
+    def answer(query: str):
+        async def run() -> dict:
+            calls.append(query)
+            await release.wait()
+            return {"answer": f"About: {query}", "suggested_slide": 4}
+
+        return run
+
+    burst = ["What's a derivative?", "what is the derivative", "Can you explain what a derivative is?"]
+    tasks = [asyncio.create_task(index.get_or_answer("deck", q, 3, answer(q))) for q in burst]
+    await asyncio.sleep(0)
+    release.set()
+    first, *rest = await asyncio.gather(*tasks)
+    assert calls == ["What's a derivative?"]
+    assert "reused" not in first
+    assert all(r == {**first, "reused": True} for r in rest)
+
+    # Answered entries are reused too; different symbols, decks or short follow-ups are not.
+    assert (await index.get_or_answer("deck", "what is a derivative", 0, answer("x")))["reused"]
+    await index.get_or_answer("deck", "what is the derivative of x squared", 3, answer("x squared"))
+    await index.get_or_answer("deck", "what is the derivative of y squared", 3, answer("y squared"))
+    await index.get_or_answer("other deck", "what is a derivative", 3, answer("other deck"))
+    await index.get_or_answer("deck", "why?", 3, answer("why?"))
+    assert calls[1:] == ["x squared", "y squared", "other deck", "why?"]
+
+    stats = index.stats()
+    assert (stats["joined"], stats["hit"], stats["miss"], stats["skipped"]) == (2, 1, 4, 1)
+    assert stats["hit_ratio"] == 0.429
+
+
+@pytest.mark.asyncio
+async def test_slide_relative_fallback_and_expired_answers_are_not_reused() -> None:
+    index = QuestionIndex(threshold=0.85, ttl_s=60.0)
+    calls: list[int] = []
+
+    async def answer() -> dict:
+        calls.append(len(calls))
+        return {"answer": "ok", "suggested_slide": None}
+
+    await index.get_or_answer("deck", "what does this slide mean", 1, answer)
+    await index.get_or_answer("deck", "what does this slide mean", 2, answer)
+    assert (await index.get_or_answer("deck", "What does this slide mean?", 2, answer))["reused"]
+    assert len(calls) == 2
+
+    await index.get_or_answer("deck", "summarize the main theorem", 1, answer, reusable=lambda r: False)
+    await index.get_or_answer("deck", "summarize the main theorem", 1, answer)
+    assert len(calls) == 4
+
+    for entry in index._decks["deck"].entries:
+        entry.created_at -= 61.0
+    await index.get_or_answer("deck", "summarize the main theorem", 1, answer)
+    assert len(calls) == 5
+
+
+@pytest.mark.asyncio
+async def test_follow_ups_with_history_are_never_shared_across_sessions(monkeypatch) -> None:
+    monkeypatch.setattr(ask_service, "get_settings", lambda: Settings(SMALLEST_API_KEY="test-key"))
+    index = QuestionIndex()
+    monkeypatch.setattr(ask_service, "get_question_index", lambda: index)
+    calls: list[str | None] = []
+
+    async def chat(query, context, current_slide, history, session_id) -> dict:
+        calls.append(session_id)
+        await asyncio.sleep(0.01)
+        return {"answer": f"{session_id}: {history[-1]['content'] if history else query}", "suggested_slide": None}
+
+    monkeypatch.setattr(ask_service, "_chat_with_gemini", chat)
+    deck = [SlideContext(slide_number=1, description="Limits", text_content="Three limit laws")]
+    follow_up = "what about the second one?"
+    histories = {
+        "a": [{"role": "user", "content": "list the limit laws"}],
+        "b": [{"role": "user", "content": "list the derivative rules"}],
+    }
+    answers = await asyncio.gather(*(
+        ask_service.chat_with_slides(follow_up, deck, 1, history, session_id)
+        for session_id, history in histories.items()
+    ))
+    assert calls == ["a", "b"]
+    assert [a["answer"] for a in answers] == ["a: list the limit laws", "b: list the derivative rules"]
+    assert not any(a.get("reused") for a in answers)
+
+    # Opening questions without history are still shared.
+    await ask_service.chat_with_slides("what are the limit laws", deck, 1, [], "a")
+    assert (await ask_service.chat_with_slides("what are the limit laws?", deck, 1, [], "b"))["reused"]
+    assert calls == ["a", "b", "a"]
+
@@ -0,0 +1,31 @@
+import json
+import os
+from pathlib import Path
+import subprocess
+import sys
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+
+# `import app.main` measures 0.35-0.6 s on one vCPU, most of it fastapi and pydantic.
+COLD_START_BUDGET_S = 1.5
+DEFERRED_MODULES = ("httpx", "sqlite3", "concurrent.futures.process", "numpy")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+loaded = {name: type(sys.modules[name]).__name__ == "module" for name in %r if name in sys.modules}
+print(json.dumps({"elapsed": elapsed, "loaded": loaded}))
+""" % (DEFERRED_MODULES,)
+
+
+def test_app_import_defers_heavy_modules_within_cold_start_budget() -> None:
+    env = {**os.environ, "SMALLEST_API_KEY": "test", "GEMINI_API_KEY": "test", "LOG_LEVEL": "WARNING"}
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE], cwd=BACKEND_ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert not any(probe["loaded"].values()), probe["loaded"]
+    assert probe["elapsed"] < COLD_START_BUDGET_S
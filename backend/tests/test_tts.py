@@ -7,7 +7,12 @@ import pytest
 
 from app.config import Settings
 from app.models.lightning import LightningSpeakRequest
-from app.services.lightning_service import stream_lightning
+from app.services.lightning_service import (
+    parse_teaching_script,
+    parse_teaching_scripts,
+    stream_lightning,
+    stream_lightning_chunks,
+)
 from app.services.smallest_lightning_client import (
     LightningClientError,
     LightningStreamMetrics,
@@ -63,7 +68,7 @@ class _FakeErrorClient:
 async def test_stream_emits_raw_audio_and_logs_metrics(caplog: pytest.LogCaptureFixture) -> None:
     caplog.set_level(logging.INFO, logger="app.services.lightning_service")
 
-    settings = Settings(SMALLEST_API_KEY="test-key")
+    settings = Settings(SMALLEST_API_KEY="test-key", LIGHTNING_DSP_ENABLED=False)
     payload = LightningSpeakRequest(
         latex_summary="A student asked: x^2 + y^2 = r^2. The professor's trick is check units first."
     )
@@ -95,3 +100,59 @@ def test_extract_audio_from_upstream_sse_event_data() -> None:
     decoded = client._extract_audio_from_event_data(str(payload).replace("'", '"'))
     assert decoded == pcm
 
+
+
+class _RecordingClient:
+    def __init__(self) -> None:
+        self.requests: list[str] = []
+
+    async def stream_tts(self, script_text: str, voice_id: str | None = None, metadata: dict | None = None):
+        _ = voice_id, metadata
+        self.requests.append(script_text)
+        metrics = LightningStreamMetrics(request_start_ts=time.perf_counter())
+
+        async def generator():
+            await asyncio.sleep(0)
+            yield script_text.encode()
+
+        return generator(), metrics
+
+
+@pytest.mark.asyncio
+async def test_chunked_stream_sends_first_sentence_before_source_finishes() -> None:
+    settings = Settings(SMALLEST_API_KEY="test-key", LIGHTNING_DSP_ENABLED=False)
+    client = _RecordingClient()
+    release = asyncio.Event()
+
+    async def answer_chunks():
+        yield "The answer is \\frac{a}{"
+        yield "b}. It follows"
+        await release.wait()
+        yield " from x^2 = 4. Done."
+
+    stream = stream_lightning_chunks(answer_chunks(), settings=settings, client=client)
+    first = await stream.__anext__()
+    assert first == b"The answer is a over b."
+
+    release.set()
+    rest = [chunk async for chunk in stream]
+    assert client.requests[0] == "The answer is a over b."
+    assert " ".join(client.requests) == "The answer is a over b. It follows from x squared equals 4. Done."
+    assert b"".join([first, *rest]).decode() == "".join(client.requests)
+
+
+@pytest.mark.asyncio
+async def test_batch_parse_dedupes_and_reuses_cached_scripts() -> None:
+    first = "A student asked about x^2. Core concept: \\frac{a}{b}."
+    second = "The prof's trick is \\sqrt{y}."
+
+    scripts, cached = await parse_teaching_scripts([first, second, first])
+    assert cached == 0
+    assert scripts[0] is scripts[2]
+    assert scripts[0].text == latex_to_teaching_script(first).text
+    assert "square root of y" in scripts[1].text.lower()
+
+    again, cached = await parse_teaching_scripts([second, first])
+    assert cached == 2
+    assert again[0] is scripts[1]
+    assert parse_teaching_script(first) is scripts[0]
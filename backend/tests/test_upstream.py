@@ -0,0 +1,138 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.services.upstream import (
+    CircuitOpenError,
+    DeadlineExceeded,
+    Upstream,
+    UpstreamPolicy,
+    deadline_scope,
+    parse_retry_after,
+)
+
+
+def _attempt(transport: httpx.MockTransport):
+    async def attempt(timeout: float) -> int:
+        async with httpx.AsyncClient(transport=transport, timeout=timeout) as client:
+            response = await client.get("https://upstream.test/")
+            response.raise_for_status()
+            return response.status_code
+
+    return attempt
+
+
+@pytest.mark.asyncio
+async def test_retries_honor_retry_after_and_breaker_opens() -> None:
+    statuses = iter([429, 200])
+    seen: list[float] = []
+
+    def throttled(request: httpx.Request) -> httpx.Response:
+        seen.append(time.monotonic())
+        status = next(statuses)
+        return httpx.Response(status, headers={"Retry-After": "0.05"} if status == 429 else {})
+
+    upstream = Upstream(UpstreamPolicy("test", max_attempts=3, base_delay_s=0.001))
+    assert await upstream.call(_attempt(httpx.MockTransport(throttled))) == 200
+    assert upstream.retries == 1
+    assert seen[1] - seen[0] >= 0.05
+
+    def broken(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(503)
+
+    upstream = Upstream(UpstreamPolicy("test", max_attempts=2, base_delay_s=0.001, failure_threshold=2))
+    with pytest.raises(httpx.HTTPStatusError):
+        await upstream.call(_attempt(httpx.MockTransport(broken)))
+    assert upstream.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        await upstream.call(_attempt(httpx.MockTransport(broken)))
+
+    # Client errors are not retried and do not count against the breaker.
+    upstream = Upstream(UpstreamPolicy("test", failure_threshold=1))
+    with pytest.raises(httpx.HTTPStatusError):
+        await upstream.call(_attempt(httpx.MockTransport(lambda request: httpx.Response(400))))
+    assert upstream.retries == 0 and upstream.breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_and_deadlines_do_not_wedge_the_breaker() -> None:
+    upstream = Upstream(UpstreamPolicy("test", max_attempts=1, failure_threshold=1, reset_timeout_s=0.01))
+
+    async def broken(timeout: float) -> None:
+        raise httpx.ConnectError("down")
+
+    async def hang(timeout: float) -> None:
+        await asyncio.sleep(10)
+
+    async def ok(timeout: float) -> str:
+        return "ok"
+
+    with pytest.raises(httpx.ConnectError):
+        await upstream.call(broken)
+    assert upstream.breaker.state == "open"
+
+    # The half-open probe is cancelled: the breaker reopens instead of rejecting forever.
+    await asyncio.sleep(0.02)
+    probe = asyncio.ensure_future(upstream.call(hang))
+    await asyncio.sleep(0)
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+    assert upstream.breaker.state == "open"
+    await asyncio.sleep(0.02)
+    assert await upstream.call(ok) == "ok"
+
+    # A deadline is neither a success nor a failure, and it frees the probe slot.
+    with pytest.raises(httpx.ConnectError):
+        await upstream.call(broken)
+    await asyncio.sleep(0.02)
+    with deadline_scope(0.01):
+        with pytest.raises(DeadlineExceeded):
+            await upstream.call(hang)
+    assert upstream.breaker.state == "half_open"
+    assert await upstream.call(ok) == "ok"
+    assert upstream.breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_hedging_and_deadlines() -> None:
+    delays = iter([1.0, 0.0])
+
+    async def attempt(timeout: float) -> str:
+        delay = next(delays)
+        await asyncio.sleep(delay)
+        return f"slept {delay}"
+
+    upstream = Upstream(UpstreamPolicy("test", hedge_after_s=0.02))
+    start = time.monotonic()
+    assert await upstream.call(attempt, hedge=True) == "slept 0.0"
+    assert time.monotonic() - start < 0.5
+    assert upstream.hedges == 1
+
+    async def slow(timeout: float) -> None:
+        await asyncio.sleep(1.0)
+
+    with deadline_scope(0.05):
+        with pytest.raises(DeadlineExceeded):
+            await Upstream(UpstreamPolicy("test")).call(slow)
+
+    # An attempt that times out on its own inside a longer deadline is retried, not final.
+    calls = 0
+
+    async def times_out_once(timeout: float) -> str:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.wait_for(asyncio.sleep(1.0), 0.01)
+        return "second try"
+
+    with deadline_scope(5.0):
+        upstream = Upstream(UpstreamPolicy("test", base_delay_s=0.0))
+        assert await upstream.call(times_out_once) == "second try"
+    assert calls == 2
+
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
@@ -0,0 +1,141 @@
+import asyncio
+import json
+
+import pytest
+
+from app.config import Settings
+from app.services.voice_pipeline import VoiceAskSession
+
+
+class _FakeBrowser:
+    def __init__(self, messages: list[dict]) -> None:
+        self._messages = list(messages)
+        self.sent: list = []
+
+    async def receive(self) -> dict:
+        while self._messages:
+            message = self._messages.pop(0)
+            if "sleep" not in message:
+                return message
+            await asyncio.sleep(message["sleep"])
+        await asyncio.Event().wait()
+
+    async def send_text(self, text: str) -> None:
+        self.sent.append(json.loads(text))
+
+    async def send_bytes(self, data: bytes) -> None:
+        self.sent.append(data)
+
+
+class _FakePulse:
+    def __init__(self, partials: list[str] | None = None, final: str = "what is a derivative") -> None:
+        self.sent: list = []
+        self.closed = False
+        self._partials = list(partials or ["what is a"])
+        self._final = final
+        self._replies: asyncio.Queue = asyncio.Queue()
+
+    async def send(self, data) -> None:
+        self.sent.append(data)
+        if isinstance(data, bytes):
+            partial = self._partials.pop(0) if len(self._partials) > 1 else self._partials[0]
+            await self._replies.put(json.dumps({"transcript": partial, "is_final": False}))
+        elif json.loads(data).get("type") == "end":
+            await self._replies.put(json.dumps({"transcript": self._final, "is_final": True, "is_last": True}))
+
+    async def close(self) -> None:
+        self.closed = True
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        return await self._replies.get()
+
+
+@pytest.mark.asyncio
+async def test_voice_ask_streams_transcript_answer_and_audio() -> None:
+    browser = _FakeBrowser([
+        {"type": "websocket.receive", "text": '{"type": "start", "context": "calculus", "voice_id": "emily"}'},
+        {"type": "websocket.receive", "bytes": b"\x00" * 3200},
+        {"type": "websocket.receive", "bytes": b"\x00" * 3200},
+        {"type": "websocket.receive", "text": '{"type": "end"}'},
+    ])
+    pulse = _FakePulse()
+    asked: list = []
+
+    async def connect():
+        return pulse
+
+    async def answer(question: str, context: str | None):
+        asked.append((question, context))
+        for delta in ("A derivative ", "is a slope."):
+            yield delta
+
+    async def speak(chunks, settings, voice_id=None):
+        async for text in chunks:
+            yield text.encode()
+
+    session = VoiceAskSession(browser, Settings(SMALLEST_API_KEY="test-key"), pulse_connect=connect, answer_stream=answer, speak=speak)
+    await asyncio.wait_for(session.run(), timeout=1.0)
+
+    assert asked == [("what is a derivative", "calculus")]
+    assert sum(len(frame) for frame in pulse.sent if isinstance(frame, bytes)) == 6400
+    assert pulse.closed
+    events = [event["type"] if isinstance(event, dict) else "pcm" for event in browser.sent]
+    assert events[0] == "transcript" and "question" in events
+    assert events.index("answer") < events.index("pcm") < events.index("done") == len(events) - 1
+    done = browser.sent[-1]
+    assert done["answer"] == "A derivative is a slope."
+    assert done["audio_bytes"] == len("A derivative is a slope.")
+    assert done["timings"]["speech_end_to_first_audio_ms"] is not None
+    assert done["speculation"]["attempts"] == 0
+
+
+async def _speculative_turn(partials: list[str], final: str, pause_between: bool) -> tuple[list[str], dict]:
+    audio = {"type": "websocket.receive", "bytes": b"\x00" * 3200}
+    messages = [{"type": "websocket.receive", "text": '{"type": "start", "speculative": true}'}, audio]
+    for _ in partials[1:]:
+        messages += [{"sleep": 0.05}, audio] if pause_between else [audio]
+    messages += [{"sleep": 0.05}, {"type": "websocket.receive", "text": '{"type": "end"}'}]
+    browser = _FakeBrowser(messages)
+    pulse = _FakePulse(partials, final)
+    asked: list[str] = []
+
+    async def connect():
+        return pulse
+
+    async def answer(question: str, context: str | None):
+        asked.append(question)
+        yield f"Answer to {question}."
+
+    async def speak(chunks, settings, voice_id=None):
+        async for text in chunks:
+            yield text.encode()
+
+    settings = Settings(SMALLEST_API_KEY="test-key", VOICE_SPECULATION_STABLE_MS=10)
+    session = VoiceAskSession(browser, settings, pulse_connect=connect, answer_stream=answer, speak=speak)
+    await asyncio.wait_for(session.run(), timeout=1.0)
+    return asked, browser.sent[-1]
+
+
+@pytest.mark.asyncio
+async def test_speculative_answer_is_used_when_the_final_transcript_matches() -> None:
+    asked, done = await _speculative_turn(["what is a derivative"], "What is a derivative?", pause_between=False)
+
+    assert asked == ["what is a derivative"]
+    assert done["speculation"]["outcome"] == "hit"
+    assert done["speculation"]["saved_ms"] > 0
+    assert done["answer"] == "Answer to what is a derivative."
+
+
+@pytest.mark.asyncio
+async def test_speculative_answer_is_discarded_when_the_student_keeps_talking() -> None:
+    partials = ["what is a derivative", "what is a derivative of x squared"]
+    asked, done = await _speculative_turn(partials, "what is a derivative of x squared", pause_between=True)
+
+    assert asked[0] == "what is a derivative"
+    assert asked[-1] == "what is a derivative of x squared"
+    assert done["answer"] == "Answer to what is a derivative of x squared."
+    assert done["speculation"]["outcome"] == "hit"
+    assert done["speculation"]["attempts"] == 2